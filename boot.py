@@ -5,6 +5,11 @@ import time
 import usb_midi
 import neopixel
 
+try:
+    from secrets import secrets
+except ImportError:
+    secrets = {}
+
 buttonpins = (board.BUTTON_DOWN, board.BUTTON_UP)
 buttons = []
 for buttonpin in buttonpins:
@@ -29,6 +34,11 @@ if not buttons_pressed:
     # Disable devices only if button is not pressed.
     usb_midi.disable()
     storage.disable_usb_drive()
+    if secrets.get("asset_upload"):
+        # The host can't write to the drive now, so the clock can: images
+        # uploaded over MQTT are written to it (lib/asset_upload.py). Opt-in:
+        # it lets the running code write anywhere on the drive.
+        storage.remount("/", readonly=False)
     usb_cdc.enable(console=False, data=False)
     usb_hid.disable()
 
@@ -4,7 +4,6 @@
 
 import gc
 import json
-import os
 import time
 from collections import namedtuple
 
@@ -14,22 +13,77 @@ import displayio
 import microcontroller
 import neopixel
 import rtc
+import storage
 
 from microcontroller import watchdog as wd
+from micropython import const
 from watchdog import WatchDogMode
 import adafruit_connection_manager
-import adafruit_logging
 from adafruit_esp32spi import adafruit_esp32spi_wifimanager
 import adafruit_minimqtt.adafruit_minimqtt as MQTT
+from display_profiles import DisplayProfile, DisplayProfiles
+from flight_log import DEBUG, INFO, FlightRecorder
+from frame_presenter import FramePresenter
+from asset_index import AssetIndex
+from asset_upload import AssetReceiver
+from crash_log import CHECKPOINT, CrashLog
+from buffered_socket import BufferedSocketPool
+from gc_policy import GCPolicy
+from message_queue import COALESCED, DROPPED, MessageQueue
+from message_state import MessageState
+from render_cache import RenderCache
+from seconds_bar import SecondsBar
+from sprite_cache import SpriteCache
+from sprite_stream import BI_RGB, SpriteStream
 from mini_matrixportal import MatrixPortal
+from mqtt_poller import MQTTPoller
+from numeric_payload import parse_float, parse_int
 from secrets import secrets
+from time_payload import parse_binary, parse_text
+from time_sync import TimeSync
 
 ENABLE_DOG = True
+# Memory profiler mode: sample the heap around every interval callback and
+# MQTT handler and report the bytes allocated by each one in the status.
+MEM_PROFILE = False
 MSG_TIME_IDX = 0
 MSG_TXT_IDX = 1
 
+# Logging (lib/flight_log.py): lines are only formatted for levels that are on,
+# printed from INFO up, and the last FLIGHT_RECORDER_LINES are kept in RAM. They
+# go out on <prefix>/log when anything is published to <prefix>/dump_log, and to
+# the serial console before a reset. Debug lines on hot paths (every message,
+# every publish) are under _LOG_DEBUG: compiled out while it is 0.
+_LOG_DEBUG = const(0)
+FLIGHT_RECORDER_LINES = 48
+flight_recorder = FlightRecorder(FLIGHT_RECORDER_LINES, print_level=INFO)
+log = flight_recorder.logger("clock")
+
 dog_is_enabled = False
-matrixportal = MatrixPortal(debug=True)
+
+# Matrix bit depth per use (see lib/display_profiles.py). The clock face gets by
+# with 4 levels per color and leaves the CPU more time; animations get 32.
+# /img switches to display_profile_img and back; /profile changes either one.
+DISPLAY_PROFILES = {
+    "clock": DisplayProfile(bit_depth=2),
+    "animation": DisplayProfile(bit_depth=5),
+    "full": DisplayProfile(bit_depth=6),
+}
+display_profile_idle = "clock"
+display_profile_img = "animation"
+
+# Panel geometry. Defaults to a single 64x32 panel; chained panels are set up
+# in secrets.py (see secrets.py.sample).
+matrixportal = MatrixPortal(
+    width=secrets.get("matrix_width") or 64,
+    height=secrets.get("matrix_height") or 32,
+    tile=secrets.get("matrix_tile") or 1,
+    serpentine=secrets.get("matrix_serpentine", True),
+    bit_depth=DISPLAY_PROFILES[display_profile_idle].bit_depth,
+    debug=True,
+    logger=flight_recorder.logger("matrix"),
+)
+display_profiles = DisplayProfiles(matrixportal, DISPLAY_PROFILES, display_profile_idle)
 print("Connecting to WiFi...")
 wifi = adafruit_esp32spi_wifimanager.ESPSPI_WiFiManager(
     matrixportal._esp, secrets, None
@@ -68,14 +122,31 @@ def no_dog():
 # ------- Real Time Clock  ------- #
 
 global_rtc = rtc.RTC()
+# Follows /aio/local_time between updates, calibrating the RTC for drift and
+# correcting what's left a second at a time instead of stepping the clock on
+# every update.
+time_sync = TimeSync(global_rtc)
 
 # --------------- Text ----------------- #
 TIME_FONT = "time_font.bdf"
 
+# The layout was drawn for a 64x32 panel. Taller chains keep the same
+# proportions, wider ones center the same content.
+TIME_Y = matrixportal.display.height * 8 // 32
+TXT_Y = matrixportal.display.height * 25 // 32
+# Sprite sheets in bmps/ are stacks of 32 pixel high frames.
+IMG_FRAME_HEIGHT = 32
+# /img names are looked up here; the directory is only listed at boot, and
+# images uploaded over MQTT are added as they arrive.
+ASSET_DIR = secrets.get("asset_dir") or "bmps"
+assets = AssetIndex(ASSET_DIR, IMG_FRAME_HEIGHT, flight_recorder.logger("assets"))
+# Small palette sheets are played from RAM; the last few shown are kept there.
+sprite_cache = SpriteCache()
+
 # hour (ID = MSG_TIME_IDX)
 matrixportal.add_text(
     text_font=TIME_FONT,
-    text_position=(0, 8),
+    text_position=(0, TIME_Y),
     text_color=0xFFFFFF,
 )
 matrixportal.preload_font(b"0123456789:", TIME_FONT)
@@ -83,12 +154,13 @@ matrixportal.set_text(" ", MSG_TIME_IDX)
 
 # status/messages (ID = MSG_TXT_IDX)
 matrixportal.add_text(
-    text_position=(0, 25),
+    text_position=(0, TXT_Y),
 )
 matrixportal.set_text(" ", MSG_TXT_IDX)
 
 SECS_COLOR = 0x404040
 SECS_WIDTH = 4
+SECS_STYLE = "bar"  # "bar", "dot" or "fill" (see lib/seconds_bar.py)
 
 # The seconds indicator is repainted every second by display_main(). It used
 # to be a freshly constructed adafruit_display_shapes.Line object each time,
@@ -96,7 +168,8 @@ SECS_WIDTH = 4
 # allocator doesn't compact the heap, so that constant churn slowly fragments
 # it over days of uptime -- this is why the clock used to visibly slow down
 # the longer it stayed powered on. Painting into one pre-allocated bitmap
-# avoids allocating anything on the once-a-second hot path.
+# avoids allocating anything on the once-a-second hot path, and SecondsBar
+# only writes the columns that change so displayio refreshes just those.
 seconds_bitmap = displayio.Bitmap(matrixportal.display.width, 1, 2)
 seconds_palette = displayio.Palette(2)
 seconds_palette[0] = 0x000000
@@ -105,22 +178,25 @@ seconds_palette[1] = SECS_COLOR
 seconds_line = displayio.TileGrid(seconds_bitmap, pixel_shader=seconds_palette, x=0, y=1)
 seconds_index = len(matrixportal.splash)
 matrixportal.splash.append(seconds_line)
+seconds_bar = SecondsBar(
+    seconds_bitmap,
+    style=SECS_STYLE,
+    bar_width=SECS_WIDTH,
+    scale=max(1, matrixportal.display.width // 64),
+)
 
 
-def _set_seconds_indicator(x0, x1):
-    """Repaint the seconds bar in place, between columns x0 (incl) and x1 (excl)."""
-    seconds_bitmap.fill(0)
-    x0 = max(0, min(x0, seconds_bitmap.width))
-    x1 = max(0, min(x1, seconds_bitmap.width))
-    for x in range(x0, x1):
-        seconds_bitmap[x, 0] = 1
-
-
-def _set_text_center(val, index, text_color=None):
+def _text_width(val, index):
     pixels_used = 0
     for chararcter in val:
         glyph = matrixportal._text[index]._font.get_glyph(ord(chararcter))
         pixels_used += glyph.shift_x
+    return pixels_used
+
+
+def _set_text_center(val, index, text_color=None, pixels_used=None):
+    if pixels_used is None:
+        pixels_used = _text_width(val, index)
     if pixels_used >= matrixportal.display.width:
         new_x = 0
     else:
@@ -135,42 +211,42 @@ def _set_text_center(val, index, text_color=None):
     )
 
 
+# roycbiv: https://en.m.wikipedia.org/wiki/ROYGBIV
+WEEK_DAY_COLORS = (
+    0xFF0000,  # Mon: red
+    0xFF4500,  # Tue: orange
+    0xFFFF00,  # Wed: yellow
+    0x00FF00,  # Thu: green
+    0x0000FF,  # Fri: blue
+    0x595DFF,  # Sat: indigo
+    0x9F51FF,  # Sun: violet
+)
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+# What was last drawn on each line, so it's only reformatted and re-measured
+# when the day/temperature or the hour/minute actually change.
+date_cache = RenderCache()
+time_cache = RenderCache()
+
+
 def display_date_and_temp():
     global outside_temp
 
-    # roycbiv: https://en.m.wikipedia.org/wiki/ROYGBIV
     now = global_rtc.datetime
-    week_days = [
-        ("Mon", 0xFF0000),  # red
-        ("Tue", 0xFF4500),  # orange
-        ("Wed", 0xFFFF00),  # yellow
-        ("Thu", 0x00FF00),  # green
-        ("Fri", 0x0000FF),  # blue
-        ("Sat", 0x595DFF),  # indigo
-        ("Sun", 0x9F51FF),  # violet
-    ]
-    months = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-
-    # info = f"{week_days[now.tm_wday][0]}|{months[now.tm_mon-1]}{now.tm_mday:02}"
-    info = f"{now.tm_mday}/{months[now.tm_mon-1]}"
-
-    if outside_temp is not None:
-        info += f" {outside_temp}F"
-    matrixportal._text_color[MSG_TXT_IDX] = week_days[now.tm_wday][1]
-    _set_text_center(info, MSG_TXT_IDX)
+    day = now.tm_mon * 32 + now.tm_mday
+    if not date_cache.lookup(day, outside_temp):
+        info = f"{now.tm_mday}/{MONTHS[now.tm_mon-1]}"
+        if outside_temp is not None:
+            info += f" {outside_temp}F"
+        date_cache.store(
+            day,
+            outside_temp,
+            info,
+            _text_width(info, MSG_TXT_IDX),
+            WEEK_DAY_COLORS[now.tm_wday],
+        )
+    matrixportal._text_color[MSG_TXT_IDX] = date_cache.color
+    _set_text_center(date_cache.text, MSG_TXT_IDX, pixels_used=date_cache.width)
 
 
 def _pretty_hour(hour):
@@ -189,7 +265,7 @@ def display_main():
     global display_needs_refresh, cached_mins, counters
 
     now = global_rtc.datetime
-    _set_seconds_indicator(now.tm_sec, now.tm_sec + SECS_WIDTH)
+    seconds_bar.update(now.tm_sec)
     if "local_time" not in counters:
         _set_text_center(str(int(time.monotonic())), MSG_TIME_IDX)
         return
@@ -197,7 +273,10 @@ def display_main():
     if cached_mins == now.tm_min and not display_needs_refresh:
         return
 
-    _set_text_center(f"{_pretty_hour(now.tm_hour)}:{now.tm_min:02}", MSG_TIME_IDX)
+    if not time_cache.lookup(now.tm_hour, now.tm_min):
+        hh_mm = f"{_pretty_hour(now.tm_hour)}:{now.tm_min:02}"
+        time_cache.store(now.tm_hour, now.tm_min, hh_mm, _text_width(hh_mm, MSG_TIME_IDX))
+    _set_text_center(time_cache.text, MSG_TIME_IDX, pixels_used=time_cache.width)
 
     if not msg_state:
         display_date_and_temp()
@@ -207,21 +286,26 @@ def display_main():
 
 
 def one_sec_tick():
-    global msg_state, display_needs_refresh, img_state
+    global display_needs_refresh, img_state
 
     if dog_is_enabled:
         wd.feed()
+    crash_log.heap(gc.mem_free())
+
+    time_sync.tick()
+    # Hand cached sprites back if something else needs the memory
+    if sprite_cache.trim(keep=img_state.get("path")):
+        _inc_counter("sprite_cache_trim")
 
     # Manage timeouts
-    if msg_state:
-        curr_timeout = msg_state.get("timeout")
-        if isinstance(curr_timeout, int):
-            if curr_timeout <= 0:
-                matrixportal.set_text(val=" ", index=MSG_TXT_IDX, scrolling=False)
-                display_needs_refresh = True
-                msg_state.clear()
-            else:
-                msg_state["timeout"] = curr_timeout - 1
+    if msg_state and msg_state.timeout is not None:
+        if msg_state.timeout <= 0:
+            matrixportal.set_text(val=" ", index=MSG_TXT_IDX, scrolling=False)
+            display_needs_refresh = True
+            msg_state.reset()
+        else:
+            msg_state.timeout -= 1
+    _advance_msg()
 
     if img_state:
         curr_timeout = img_state.get("timeout")
@@ -262,6 +346,95 @@ def _inc_counter(name):
     counters[name] = curr_value + 1
 
 
+# ------- Memory profiler  ------- #
+
+# Call sites that run over and over while the clock is just sitting there.
+# Once the clock is up, these should not allocate at all: anything they leave
+# behind is what fragments the heap over days of uptime.
+MEM_PROFILE_STEADY = ("1sec", "img_frame")
+MEM_PROFILE_CALLS = 0
+MEM_PROFILE_BYTES = 1
+MEM_PROFILE_MAX = 2
+MEM_PROFILE_GCS = 3
+
+# call site -> [calls, bytes allocated, max bytes in one call, calls
+# interrupted by a collection]. Reset in place after every status report.
+mem_profile = {}
+mem_free_min = None
+mem_largest_block = None
+mem_largest_block_min = None
+
+
+def _profiled(site, fun, *args):
+    """Call ``fun(*args)`` and add what it allocated to ``mem_profile[site]``.
+    Only for MEM_PROFILE: without it, call sites call ``fun`` directly, which
+    doesn't pack an args tuple on every call."""
+    global mem_free_min
+
+    before = gc.mem_alloc()
+    try:
+        return fun(*args)
+    finally:
+        used = gc.mem_alloc() - before
+        free = gc.mem_free()
+        if mem_free_min is None or free < mem_free_min:
+            mem_free_min = free
+        stats = mem_profile.get(site)
+        if stats is None:
+            stats = [0, 0, 0, 0]
+            mem_profile[site] = stats
+        stats[MEM_PROFILE_CALLS] += 1
+        if used < 0:
+            # A collection ran in the middle of the call, so the delta
+            # says nothing about what it allocated. Just count it.
+            stats[MEM_PROFILE_GCS] += 1
+        else:
+            stats[MEM_PROFILE_BYTES] += used
+            stats[MEM_PROFILE_MAX] = max(stats[MEM_PROFILE_MAX], used)
+
+
+def _largest_free_block():
+    """Binary search for the biggest bytearray the heap can hand out right
+    now. There is no API for it, and a fragmented heap can have plenty of
+    mem_free() while still failing a large allocation."""
+    low, high = 0, gc.mem_free()
+    while low < high:
+        size = (low + high + 1) // 2
+        try:
+            block = bytearray(size)
+            del block
+            low = size
+        except MemoryError:
+            high = size - 1
+    return low
+
+
+def _mem_profile_report():
+    """Snapshot the profile for the status payload, check the steady-state
+    sites for allocations and start a new sampling window."""
+    global mem_largest_block, mem_largest_block_min
+
+    mem_largest_block = _largest_free_block()
+    if mem_largest_block_min is None or mem_largest_block < mem_largest_block_min:
+        mem_largest_block_min = mem_largest_block
+
+    report = {}
+    leaking = {}
+    for site, stats in mem_profile.items():
+        report[site] = list(stats)
+        if site in MEM_PROFILE_STEADY and stats[MEM_PROFILE_BYTES]:
+            leaking[site] = stats[MEM_PROFILE_BYTES] // max(stats[MEM_PROFILE_CALLS], 1)
+        for i in range(len(stats)):
+            stats[i] = 0
+
+    if leaking:
+        _inc_counter("mem_alert")
+        alert = {"alert": "steady_state_alloc", "bytes_per_call": leaking}
+        client.publish(mqtt_pub_alert, json.dumps(alert), qos=MQTT_QOS)
+        log.warning("mem alert: %s: %s", mqtt_pub_alert, alert)
+    return report
+
+
 # ------------- MQTT Topic Setup ------------- #
 
 
@@ -272,17 +445,25 @@ def _parse_ping(_topic, _message):
 
 
 def _parse_brightness(topic, message):
-    print("_parse_brightness: {0} {1} {2}".format(len(message), topic, message))
-    set_brightness(message)
+    # Raw payload: a number is read straight from the bytes, only words
+    # like "on" or "off" get decoded.
+    if _LOG_DEBUG:
+        log.debug("_parse_brightness: %d %s %s", len(message), topic, message)
+    try:
+        value = parse_float(message)
+    except ValueError:
+        value = str(message, "utf-8")
+    set_brightness(value)
     _inc_counter("brightness")
 
 
 def _parse_neopixel(_topic, message):
+    # Raw payload
     global pixels
     try:
-        value = int(message, 0)
+        value = parse_int(message)
     except ValueError as e:
-        print(f"bad neo value: {e}")
+        log.warning("bad neo value: %s", e)
         return
     pixels[0] = ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
     _inc_counter("neo")
@@ -299,7 +480,7 @@ def _parse_blinkrate(_topic, message):
         else:
             value = float(message)
     except ValueError as e:
-        print(f"bad blink value given {message}: {e}")
+        log.warning("bad blink value given %s: %s", message, e)
         return
 
     if value:
@@ -319,23 +500,24 @@ def _parse_blinkrate(_topic, message):
 def _parse_localtime_message(topic, message):
     # /aio/local_time : 2021-01-15 23:07:36.339 015 5 -0500 EST
     try:
-        print(f"Local time mqtt: {message}")
-        times = message.split(" ")
-        the_date = times[0]
-        the_time = times[1]
-        year_day = int(times[2])
-        week_day = int(times[3])
-        is_dst = None  # no way to know yet
-        year, month, mday = [int(x) for x in the_date.split("-")]
-        the_time = the_time.split(".")[0]
-        hours, minutes, seconds = [int(x) for x in the_time.split(":")]
-        now = time.struct_time(
-            (year, month, mday, hours, minutes, seconds, week_day, year_day, is_dst)
-        )
-        global_rtc.datetime = now
+        if _LOG_DEBUG:
+            log.debug("Local time mqtt: %s", message)
+        now, millis = parse_text(message)
+        time_sync.update(time.struct_time(now), millis)
         _inc_counter("local_time")
     except Exception as e:
-        print(f"Error in _parse_localtime_message -", e)
+        log.error("Error in _parse_localtime_message - %s", e)
+        _inc_counter("local_time_failed")
+
+
+def _parse_localtime_binary(topic, message):
+    # /aio/local_time_bin : >IhH epoch seconds, UTC offset minutes, millis
+    try:
+        seconds, millis = parse_binary(message)
+        time_sync.update_epoch(seconds, millis)
+        _inc_counter("local_time")
+    except (ValueError, OverflowError) as e:
+        log.error("Error in _parse_localtime_binary - %s", e)
         _inc_counter("local_time_failed")
 
 
@@ -343,79 +525,107 @@ outside_temp = None
 
 
 def _parse_temperature_outside(topic, message):
+    # Raw payload
     global outside_temp
-    outside_temp = int(message)
+    outside_temp = parse_int(message, 10)
     _inc_counter("outside_temp")
 
 
-msg_state = {}
+# Messages that arrive while another one is up wait in msg_queue. The one on
+# screen stays for at least MSG_MIN_DWELL seconds and, if it scrolls, until it
+# has gone across once; then the next one (highest priority first) takes over.
+MSG_QUEUE_SIZE = 4
+MSG_MIN_DWELL = 3
+
+# Filled in place from the queue, so a message does not cost a new dict.
+msg_state = MessageState()
+msg_queue = MessageQueue(MSG_QUEUE_SIZE, flight_recorder.logger("msg"))
+msg_shown_at = 0
+msg_scrolled = False
 
 
 def _parse_msg_message(topic, message):
     global display_needs_refresh
-    global msg_state
 
-    print(f"msg_message: {message}")
+    log.info("msg_message: %s", message)
     _inc_counter("msg_message")
-    try:
-        msg_state = json.loads(message)
-    except ValueError:
-        msg_state = {"msg": message, "timeout": 20}
+    incoming = msg_queue.parse(message)
+
+    if not incoming:
+        # An empty message clears the display and everything still waiting.
+        msg_queue.release(incoming)
+        msg_queue.clear()
+        if msg_state:
+            matrixportal.set_text(val=" ", index=MSG_TXT_IDX, scrolling=False)
+        msg_state.reset()
+        display_needs_refresh = True
+        return
 
-    display_needs_refresh = True
-    if not msg_state.get("msg"):
-        msg_state.clear()
+    if msg_state and incoming.msg == msg_state.msg:
+        # Same text as what is showing: just restart its timeout. No relayout.
+        msg_state.timeout = incoming.timeout
+        msg_queue.release(incoming)
+        _inc_counter("msg_coalesced")
         return
 
-    # timeout
-    timeout = msg_state.get("timeout")
-    if timeout is not None:
-        try:
-            msg_state["timeout"] = int(timeout)
-        except (ValueError, TypeError) as e:
-            print(f"Bad timeout {timeout!r}: {e}")
-            del msg_state["timeout"]
-
-    # A bad color must not blow up the whole mqtt loop (and force a
-    # disconnect/reconnect) -- fall back to whatever color is already set.
-    color = msg_state.get("text_color") or msg_state.get("color")
-    if color:
-        try:
-            msg_state["text_color"] = matrixportal.html_color_convert(color)
-        except (ValueError, TypeError) as e:
-            print(f"Bad text_color {color!r}: {e}")
-            msg_state.pop("text_color", None)
-
-    no_scroll = msg_state.get("no_scroll")
-    if no_scroll is not None:
-        scrolling = str(no_scroll).lower() != "true"
-    else:
-        scrolling = True
+    result = msg_queue.push(incoming)
+    if result == COALESCED:
+        _inc_counter("msg_coalesced")
+    elif result == DROPPED:
+        _inc_counter("msg_dropped")
+    _advance_msg()
 
-    x_position = msg_state.get("x")
-    if str(x_position).lower() == "center":
+
+def _advance_msg():
+    """Show the next queued message if the current one had its turn."""
+    if not msg_queue:
+        return
+    if msg_state:
+        if time.monotonic() - msg_shown_at < MSG_MIN_DWELL:
+            return
+        if msg_state.scrolling and not msg_scrolled:
+            return
+    queued = msg_queue.pop()
+    msg_state.copy_from(queued)
+    msg_queue.release(queued)
+    _show_msg()
+
+
+def _on_scroll_done(index):
+    global msg_scrolled
+
+    if index == MSG_TXT_IDX and msg_state:
+        msg_scrolled = True
+        _advance_msg()
+
+
+matrixportal.on_scroll_done = _on_scroll_done
+
+
+def _show_msg():
+    global display_needs_refresh, msg_shown_at, msg_scrolled
+
+    display_needs_refresh = True
+    msg_shown_at = time.monotonic()
+    msg_scrolled = False
+
+    if msg_state.center:
         _set_text_center(
-            val=msg_state.get("msg"),
+            val=msg_state.msg,
             index=MSG_TXT_IDX,
-            text_color=msg_state.get("text_color"),
+            text_color=msg_state.text_color,
         )
         return
 
     text_position = None
-    if x_position is not None:
-        try:
-            text_position = (
-                int(x_position),
-                matrixportal._text_position[MSG_TXT_IDX][1],
-            )
-        except Exception as e:
-            print(f"Failed to parse position {x_position}: {e}")
+    if msg_state.x is not None:
+        text_position = (msg_state.x, matrixportal._text_position[MSG_TXT_IDX][1])
 
     matrixportal.set_text(
-        val=msg_state.get("msg"),
+        val=msg_state.msg,
         index=MSG_TXT_IDX,
-        text_color=msg_state.get("text_color"),
-        scrolling=scrolling,
+        text_color=msg_state.text_color,
+        scrolling=msg_state.scrolling,
         text_position=text_position,
     )
 
@@ -428,7 +638,7 @@ def _parse_img(_topic, message=""):
     global display_needs_refresh, seconds_index
     global img_state, img_index
 
-    print(f"img: {message}")
+    log.info("img: %s", message)
     _inc_counter("img_message")
     try:
         img_params = json.loads(message)
@@ -439,6 +649,9 @@ def _parse_img(_topic, message=""):
         del matrixportal.splash[img_index]
         img_index = None
 
+    img_stream = img_state.get("img_stream")
+    if img_stream:
+        img_stream.close()
     img_file = img_state.get("img_file")
     if img_file:
         img_file.close()
@@ -447,30 +660,59 @@ def _parse_img(_topic, message=""):
 
     if not img_params.get("img"):
         display_needs_refresh = True
+        _select_display_profile()
         return
 
-    for filename in (
-        "bmps/" + img_params["img"] + ".bmp",
-        "bmps/" + img_params["img"],
-        img_params["img"],
-        img_params["img"] + ".bmp",
-    ):
+    asset = assets.lookup(img_params["img"])
+    if asset is None:
+        log.warning("unknown image: %s", img_params["img"])
+        _inc_counter("img_unknown")
+        display_needs_refresh = True
+        _select_display_profile()
+        return
+    frame_height = img_params.get("frame_height")
+    if frame_height is None:
+        frame_height = min(IMG_FRAME_HEIGHT, asset.height)
+    elif type(frame_height) is not int or frame_height <= 0 or asset.height % frame_height:
+        # Frames must tile the sheet: a TileGrid with anything else is garbage or an error.
+        log.warning("bad frame_height for %s: %s", asset.path, frame_height)
+        _inc_counter("img_bad_frame_height")
+        display_needs_refresh = True
+        _select_display_profile()
+        return
+    cached = sprite_cache.get(asset)
+    if cached:
+        log.info("image from RAM: %s", asset.path)
+        img_bitmap, pixel_shader = cached
+        img_state["img_frame_count"] = img_bitmap.height // frame_height
+    elif asset.compression == BI_RGB:
+        log.info("opening image: %s", asset.path)
+        img_file = open(asset.path, "rb")
+        img_state["img_file"] = img_file
+        img_bitmap = displayio.OnDiskBitmap(img_file)
+        img_state["img_frame_count"] = img_bitmap.height // frame_height
+        pixel_shader = getattr(img_bitmap, "pixel_shader", displayio.ColorConverter())
+    else:
+        # RLE: decoded a frame at a time, two frames in RAM (lib/sprite_stream.py)
+        log.info("streaming image: %s", asset.path)
+        img_file = open(asset.path, "rb")
         try:
-            os.stat(filename)
-            break
-        except OSError:
-            pass
-    print(f"opening image: {filename}")
-    img_state["img_file"] = open(filename, "rb")
-    img_bitmap = displayio.OnDiskBitmap(img_state["img_file"])
-    img_state["img_frame_count"] = int(img_bitmap.height / matrixportal.display.height)
+            img_stream = SpriteStream(img_file, frame_height)
+        except Exception:
+            img_file.close()
+            raise
+        img_state["img_stream"] = img_stream
+        img_bitmap = img_stream.bitmap
+        frame_height = img_stream.frame_height
+        pixel_shader = img_stream.pixel_shader
+    img_state["path"] = asset.path
     img_sprite = displayio.TileGrid(
         img_bitmap,
-        pixel_shader=getattr(img_bitmap, "pixel_shader", displayio.ColorConverter()),
+        pixel_shader=pixel_shader,
         tile_width=img_bitmap.width,
-        tile_height=matrixportal.display.height,
+        tile_height=frame_height,
         x=max(matrixportal.display.width - img_bitmap.width, 0) // 2,
-        y=0,
+        y=max(matrixportal.display.height - frame_height, 0) // 2,
     )
     img_index = len(matrixportal.splash)
     matrixportal.splash.append(img_sprite)
@@ -491,7 +733,56 @@ def _parse_img(_topic, message=""):
         matrixportal.set_text(" ", MSG_TXT_IDX)
         if seconds_index is not None:
             # Clear seconds line
-            seconds_bitmap.fill(0)
+            seconds_bar.clear()
+
+    profile = img_params.get("profile")
+    if isinstance(profile, str) and profile in DISPLAY_PROFILES:
+        img_state["profile"] = profile
+    _select_display_profile()
+
+
+def _select_display_profile():
+    """Use the image's profile while one is up, the idle profile otherwise."""
+    if img_state:
+        name = img_state.get("profile") or display_profile_img
+    else:
+        name = display_profile_idle
+    try:
+        changed = display_profiles.select(name)
+    except (MemoryError, ValueError):
+        # Not even the old bit depth could be re-created: dark until a reset.
+        _reset(RESET_DISPLAY, "no display after a failed bit depth switch")
+        return
+    if changed:
+        _inc_counter("profile_switch")
+
+
+def _parse_profile(_topic, message):
+    # {"idle": "clock", "img": "animation"}, or just a name for the idle one.
+    # {"sample": true} measures the refresh's CPU share for the next status: a
+    # display_profiles.SPIN_MS stall, so only when asked for.
+    global display_profile_idle, display_profile_img
+
+    try:
+        value = json.loads(message)
+    except ValueError:
+        value = message
+    if not isinstance(value, dict):
+        value = {"idle": str(value)}
+    if value.pop("sample", False):
+        display_profiles.sample()
+        _inc_counter("profile_sample")
+    for key, name in value.items():
+        if key not in ("idle", "img") or not isinstance(name, str) or name not in DISPLAY_PROFILES:
+            log.warning("bad profile %s: %s", key, name)
+            _inc_counter("profile_failed")
+            continue
+        if key == "idle":
+            display_profile_idle = name
+        else:
+            display_profile_img = name
+    _select_display_profile()
+    _inc_counter("profile")
 
 
 def advance_img():
@@ -500,6 +791,11 @@ def advance_img():
     if not img_state or not matrixportal.display.brightness:
         return
 
+    img_stream = img_state.get("img_stream")
+    if img_stream:
+        matrixportal.splash[img_index][0] = img_stream.advance()
+        return
+
     img_curr_frame = img_state.get("img_curr_frame", 0)
     matrixportal.splash[img_index][0] = img_curr_frame
     img_state["img_curr_frame"] = (img_curr_frame + 1) % img_state["img_frame_count"]
@@ -507,6 +803,46 @@ def advance_img():
 
 mqtt_topic = secrets.get("topic_prefix") or "/matrixportal"
 mqtt_pub_status = f"{mqtt_topic}/status"
+mqtt_pub_alert = f"{mqtt_topic}/alert"
+mqtt_pub_log = f"{mqtt_topic}/log"
+mqtt_pub_crash = f"{mqtt_topic}/crash"
+
+
+def _asset_release(path):
+    # About to be replaced: stop showing it, which closes it
+    if img_state.get("path") == path:
+        _parse_img(None, "")
+
+
+def _asset_installed(path):
+    assets.add(path)
+    sprite_cache.forget(path)
+    _inc_counter("asset_installed")
+
+
+# Images uploaded over MQTT (lib/asset_upload.py). Chunks are written to flash
+# as they come off the socket; the clock answers from the main loop, at most
+# max_rate bytes per second.
+asset_receiver = AssetReceiver(
+    ASSET_DIR,
+    lambda value: client.publish(f"{mqtt_topic}/asset/status", json.dumps(value)),
+    release=_asset_release,
+    installed=_asset_installed,
+    logger=flight_recorder.logger("upload"),
+    # boot.py only makes the drive writable with "asset_upload" in secrets.py.
+    writable=not storage.getmount("/").readonly,
+)
+
+
+def _parse_asset_begin(_topic, message):
+    asset_receiver.begin(message)
+    _inc_counter("asset_begin")
+
+
+def _parse_dump_log(_topic, _message):
+    flight_recorder.dump(_publish_log_line)
+    _inc_counter("dump_log")
+
 
 mqtt_subs = {
     f"{mqtt_topic}/ping": _parse_ping,
@@ -515,10 +851,39 @@ mqtt_subs = {
     f"{mqtt_topic}/blinkrate": _parse_blinkrate,
     f"{mqtt_topic}/msg": _parse_msg_message,
     f"{mqtt_topic}/img": _parse_img,
+    f"{mqtt_topic}/profile": _parse_profile,
     "/aio/local_time": _parse_localtime_message,
+    "/aio/local_time_bin": _parse_localtime_binary,
     "/sensor/temperature_outside": _parse_temperature_outside,
+    f"{mqtt_topic}/asset/begin": _parse_asset_begin,
+    f"{mqtt_topic}/dump_log": _parse_dump_log,
+}
+
+# Topics read off the socket a piece at a time, whatever their size:
+# topic -> (buffer, callback), see MQTT.add_topic_stream.
+mqtt_stream_subs = {
+    f"{mqtt_topic}/asset/data": (asset_receiver.buffer, asset_receiver.on_chunk),
 }
 
+# What the clock was doing before it reset (lib/crash_log.py): the last main loop
+# pass durations, MQTT topics handled and the free heap, kept in NVM and
+# published (retained) on <prefix>/crash after the next boot. Written right
+# before _reset(), and for watchdog resets at uptime milestones: after
+# CRASH_LOG_CHECKPOINT seconds, then doubling up to every 6 hours. Each write is
+# a flash erase/write (NVM is good for about 25k) that stalls the main loop.
+RESET_MQTT_CONNECT = 1
+RESET_MQTT_RECONNECT = 2
+RESET_DISPLAY = 3
+RESET_REASONS = ("checkpoint", "mqtt_connect", "mqtt_reconnect", "display")
+CRASH_LOG_CHECKPOINT = secrets.get("crash_log_checkpoint", 60)
+crash_log = CrashLog(
+    microcontroller.nvm,
+    tuple(mqtt_subs) + tuple(mqtt_stream_subs),
+    RESET_REASONS,
+    checkpoint=CRASH_LOG_CHECKPOINT,
+)
+last_run = crash_log.load()
+
 # ------------- MQTT Functions ------------- #
 
 # Define callback methods which are called when events occur
@@ -526,43 +891,86 @@ mqtt_subs = {
 def connect(client, userdata, flags, rc):
     # This function will be called when the client is connected
     # successfully to the broker.
-    print("Connected to MQTT Broker!", end=" ")
-    print(f"mqtt_msg: {client.mqtt_msg}", end=" ")
-    print(f"Flags: {flags} RC: {rc}")
-    for mqtt_sub in mqtt_subs:
-        print(f"Subscribing to {mqtt_sub}")
-        client.subscribe(mqtt_sub)
+    log.info("Connected to MQTT Broker! mqtt_msg: %s Flags: %s RC: %s", client.mqtt_msg, flags, rc)
+    for mqtt_sub in tuple(mqtt_subs) + tuple(mqtt_stream_subs):
+        log.debug("Subscribing to %s", mqtt_sub)
+        client.subscribe(mqtt_sub, MQTT_QOS)
     _inc_counter("connect")
 
 
 def disconnected(_client, _userdata, rc):
     # This method is called when the client is disconnected
-    print(f"Disconnected from MQTT Broker! RC: {rc}")
+    log.warning("Disconnected from MQTT Broker! RC: %s", rc)
     _inc_counter("disconnected")
 
 
 def subscribe(_client, _userdata, topic, granted_qos):
     # This method is called when the client subscribes to a new feed
-    print(f"Subscribed to {topic} with QOS level {granted_qos}")
+    log.debug("Subscribed to %s with QOS level %s", topic, granted_qos)
     _inc_counter("subscribe")
 
 
 def publish(_client, userdata, topic, pid):
     # This method is called when the client publishes data to a feed
-    print(f"Published to {topic} with PID {pid}")
+    if _LOG_DEBUG:
+        log.debug("Published to %s with PID %d", topic, pid)
     _inc_counter("publish")
 
 
+# Topics whose handlers take the raw payload bytes: binary ones, numeric ones
+# (parsed with lib/numeric_payload.py) and ones that ignore the payload.
+# Everything else is decoded to a str first.
+mqtt_raw_topics = (
+    "/aio/local_time_bin",
+    f"{mqtt_topic}/ping",
+    f"{mqtt_topic}/dump_log",
+    f"{mqtt_topic}/brightness",
+    f"{mqtt_topic}/neopixel",
+    "/sensor/temperature_outside",
+)
+
+
+def payload_rejected(_client, topic, size):
+    # Dropped by the client for being over MQTT_MAX_PAYLOAD
+    log.warning("Dropped %d byte message on %s", size, topic)
+    _inc_counter("mqtt_rejected")
+
+
+def _record_streamed(callback):
+    # Streamed topics don't go through message(): one is recorded in the crash
+    # log once its last piece has been handled, or the handler gave up on it.
+    def on_piece(client, topic, piece, offset, total):
+        result = callback(client, topic, piece, offset, total)
+        if result is False or offset + len(piece) >= total:
+            crash_log.topic(topic)
+        return result
+
+    return on_piece
+
+
 def message(_client, topic, message):
     # This method is called when the subscribed feed has a new value
+    crash_log.topic(topic)
     if topic in mqtt_subs:
-        mqtt_subs[topic](topic, message)
+        if topic not in mqtt_raw_topics:
+            message = str(message, "utf-8")
+        if MEM_PROFILE:
+            _profiled(topic, mqtt_subs[topic], topic, message)
+        else:
+            mqtt_subs[topic](topic, message)
 
 
 # ------------- Network Connection ------------- #
 
 # Initialize MQTT interface with the esp interface
+# Sockets read through a read-ahead buffer (lib/buffered_socket.py): MiniMQTT reads
+# a packet a few bytes at a time, and every read of the bare socket is an SPI round
+# trip to the ESP32. It also lets loop() see the socket is quiet without waiting a
+# read out. "socket_read_ahead": 0 in secrets.py reads the bare socket.
+SOCKET_READ_AHEAD = secrets.get("socket_read_ahead", 256)
 pool = adafruit_connection_manager.get_radio_socketpool(matrixportal._esp)
+if SOCKET_READ_AHEAD:
+    pool = BufferedSocketPool(pool, SOCKET_READ_AHEAD)
 ssl_context = adafruit_connection_manager.get_radio_ssl_context(matrixportal._esp)
 
 # Set up a MiniMQTT Client
@@ -570,12 +978,21 @@ ssl_context = adafruit_connection_manager.get_radio_ssl_context(matrixportal._es
 # backoff (up to ~32s per attempt, 5 attempts by default). That can block long
 # enough to starve the watchdog below. Keep a single attempt here and let
 # _try_reconnect() (which runs from the fed main loop) own the retry policy.
-# socket_timeout=MQTT_LOOP_TIMEOUT: newer MiniMQTT's loop() blocks for the full
-# timeout it's given every call (it's not a quick poll). The main loop below
-# calls client.loop() once per pass and only scrolls text on the passes where
-# it returns, so a 1s (the old default) timeout meant scrolling advanced at
-# 1 pixel/sec. Keep both this and the loop() call below in sync.
-MQTT_LOOP_TIMEOUT = 0.1
+# socket_timeout: newer MiniMQTT's loop() blocks for the full timeout it's
+# given every call (it's not a quick poll), in reads of socket_timeout each.
+# The main loop below calls client.loop() once per pass, through mqtt_poller,
+# which sets both for each pass (lib/mqtt_poller.py); this one is for connect().
+MQTT_SOCKET_TIMEOUT = 0.1
+# max_payload_size: anything bigger than any message we take (a /msg with a
+# long text is a few hundred bytes) is dropped as it's read, instead of being
+# allocated in one piece first. Large uploads need add_topic_stream().
+MQTT_MAX_PAYLOAD = 2048
+# Subscriptions, status and alerts are QoS 1. Up to MQTT_MAX_INFLIGHT publishes
+# wait for their PUBACK at once, collected by client.loop(), so a publish doesn't
+# hold up the main loop for a round trip; a redelivered message (the broker
+# missed our PUBACK) is acknowledged again but not handled twice.
+MQTT_QOS = 1
+MQTT_MAX_INFLIGHT = 4
 client = MQTT.MQTT(
     broker=secrets["broker"],
     port=secrets.get("broker_port") or 1883,
@@ -584,32 +1001,40 @@ client = MQTT.MQTT(
     socket_pool=pool,
     ssl_context=ssl_context,
     connect_retries=1,
-    socket_timeout=MQTT_LOOP_TIMEOUT,
+    socket_timeout=MQTT_SOCKET_TIMEOUT,
+    # Payloads come in as bytes; message() decodes the text ones.
+    use_binary_mode=True,
+    max_payload_size=MQTT_MAX_PAYLOAD,
+    max_inflight=MQTT_MAX_INFLIGHT,
 )
-class _ThrottledMQTTLogHandler(adafruit_logging.StreamHandler):
-    """Passes every MQTT debug line through except the "waiting for
-    messages"/"Loop timed out" pair, which now fires ~10x/sec (once per main
-    loop pass, since MQTT_LOOP_TIMEOUT is small) and drowns out everything
-    else. Throttle just those two to once every few seconds."""
-
-    CHATTY_PREFIXES = ("waiting for messages", "Loop timed out")
-    THROTTLE_SECONDS = 3
-
-    def __init__(self):
-        super().__init__()
-        self._last_chatty = 0
-
-    def emit(self, record):
-        if record.msg.startswith(self.CHATTY_PREFIXES):
-            if record.created - self._last_chatty < self.THROTTLE_SECONDS:
-                return
-            self._last_chatty = record.created
-        super().emit(record)
-
+# MiniMQTT logs into the flight recorder too. Its debug lines (every packet, and
+# a "waiting for messages"/"Loop timed out" pair once per main loop pass) are
+# only made at all with "mqtt_debug": True in secrets.py; even then that pair is
+# let through once every few seconds.
+client.logger = flight_recorder.logger("mqtt", DEBUG if secrets.get("mqtt_debug") else INFO)
+flight_recorder.limit("waiting for messages for %s seconds", 3)
+flight_recorder.limit("Loop timed out after %s seconds", 3)
+
+
+def _publish_log_line(line):
+    # QoS 0: a dump is more lines than MQTT_MAX_INFLIGHT, and it's best effort.
+    client.publish(mqtt_pub_log, line)
+
+
+def _reset(code, reason):
+    """Last words: the crash log to NVM (``code`` is one of RESET_REASONS), the
+    reason and the flight recorder on the serial console and, if still
+    connected, on <prefix>/log; then reset."""
+    crash_log.save(code)
+    log.critical("reset: %s", reason)
+    flight_recorder.dump()
+    try:
+        if client.is_connected():
+            flight_recorder.dump(_publish_log_line)
+    except Exception as e:
+        print(f"could not publish the flight recorder: {e}")
+    microcontroller.reset()
 
-client.logger = adafruit_logging.getLogger("mqtt")
-client.logger.setLevel(adafruit_logging.DEBUG)
-client.logger.addHandler(_ThrottledMQTTLogHandler())
 
 # Connect callback handlers to client
 client.on_connect = connect
@@ -617,15 +1042,26 @@ client.on_disconnect = disconnected
 client.on_subscribe = subscribe
 client.on_publish = publish
 client.on_message = message
+client.on_payload_rejected = payload_rejected
+for mqtt_sub, (buffer, callback) in mqtt_stream_subs.items():
+    client.add_topic_stream(mqtt_sub, buffer, _record_streamed(callback))
 
-print(f"Attempting to MQTT connect to {client.broker}")
+log.info("Attempting to MQTT connect to %s", client.broker)
 try:
     client.connect()
 except Exception as e:
-    print(f"FATAL! Unable to MQTT connect to {client.broker}: {e}")
+    log.critical("FATAL! Unable to MQTT connect to %s: %s", client.broker, e)
     time.sleep(120)
     # bye bye cruel world
-    microcontroller.reset()
+    _reset(RESET_MQTT_CONNECT, "no MQTT connection at boot")
+
+crash_report = {"reset_reason": str(microcontroller.cpu.reset_reason), "last_run": last_run}
+log.info("crash log: %s", crash_report)
+client.publish(mqtt_pub_crash, json.dumps(crash_report), retain=True, qos=MQTT_QOS)
+# Start this run's record: a reset before the first checkpoint would otherwise
+# leave the last run's to be reported again.
+crash_log.save(CHECKPOINT)
+del crash_report, last_run
 
 
 # ------------- Screen elements ------------- #
@@ -658,6 +1094,39 @@ def set_brightness(val):
     # matrixportal.display.auto_brightness = False
     matrixportal.display.brightness = val
     display_needs_refresh = True
+    if not val:
+        _enter_power_save()
+    elif power_save:
+        _leave_power_save()
+
+
+# With the screen off there is nothing to draw: stop the matrix refresh and
+# displayio's framebuffer updates and skip the animation timers, so the main
+# loop only wakes up for the timed jobs. Everything is repainted once when the
+# screen comes back on.
+power_save = False
+
+
+def _enter_power_save():
+    global power_save
+
+    if power_save:
+        return
+    power_save = True
+    matrixportal.matrix.paused = True
+    _inc_counter("power_save")
+
+
+def _leave_power_save():
+    global power_save
+
+    power_save = False
+    if not (img_state and img_state.get("img_only")):
+        display_main()
+    matrixportal.matrix.paused = False
+    # The next presenter.present() paints everything that changed while we
+    # were off in a single refresh.
+    presenter.restart()
 
 
 set_brightness("on")
@@ -675,9 +1144,33 @@ def interval_send_status():
         "ip": wifi.ip_address(),
         "counters": str(counters),
         "mem_free": gc.mem_free(),
+        "gc": gc_policy.stats(),
+        "time_sync": time_sync.stats(),
+        "render_cache": {"date": date_cache.stats(), "time": time_cache.stats()},
+        "display_profiles": display_profiles.stats(),
+        "display": presenter.stats(),
+        "mqtt_poll": mqtt_poller.stats(),
+        "assets": assets.stats(),
+        "sprite_cache": sprite_cache.stats(),
+        "asset_upload": asset_receiver.stats(),
+        "log": flight_recorder.stats(),
+        "mqtt": {
+            "inflight": client.inflight,
+            "inflight_waits": client.inflight_waits,
+            "lost": client.publishes_lost,
+            "duplicates": client.duplicates_dropped,
+        },
     }
-    client.publish(mqtt_pub_status, json.dumps(value))
-    print(f"send_status: {mqtt_pub_status}: {value}")
+    if img_state.get("img_stream"):
+        value["img_stream"] = img_state["img_stream"].stats()
+    if MEM_PROFILE:
+        value["mem_profile"] = _mem_profile_report()
+        value["mem_free_min"] = mem_free_min
+        value["mem_largest_block"] = mem_largest_block
+        value["mem_largest_block_min"] = mem_largest_block_min
+    client.publish(mqtt_pub_status, json.dumps(value), qos=MQTT_QOS)
+    if _LOG_DEBUG:
+        log.debug("send_status: %s: %s", mqtt_pub_status, value)
 
 
 def interval_led_blink():
@@ -685,7 +1178,7 @@ def interval_led_blink():
 
 
 def _try_reconnect(e):
-    print(f"Failed mqtt loop: {e}")
+    log.error("Failed mqtt loop: %s", e)
     _inc_counter("fail_loop")
     time.sleep(3)
     try:
@@ -693,8 +1186,7 @@ def _try_reconnect(e):
         client.connect()
     except Exception as e:
         # bye bye cruel world
-        print(f"FATAL! Failed reconnect: {e}")
-        microcontroller.reset()
+        _reset(RESET_MQTT_RECONNECT, f"FATAL! Failed reconnect: {e}")
 
 
 run_once()
@@ -710,26 +1202,65 @@ TS_INTERVALS = {
     "send_status": TS(10 * 60, interval_send_status),
     LED_BLINK: TS(LED_BLINK_DEFAULT, interval_led_blink),  # may be overridden via mqtt
     "1sec": TS(1, one_sec_tick),
-    "img_frame": TS(0.1, advance_img),
 }
 
 
+# Collections only happen in the idle gaps below (or when memory runs low),
+# so they don't land in the middle of a scroll or an animation frame.
+gc_policy = GCPolicy()
+
+# From here on the display is only refreshed at the end of a loop pass, paced
+# to FRAME_RATE while an animation or a scroll is running (lib/frame_presenter.py).
+# Frames further apart than FRAME_RATE // 2 allows are counted as below_minimum.
+FRAME_RATE = 10
+presenter = FramePresenter(matrixportal, fps=FRAME_RATE, minimum_fps=FRAME_RATE // 2)
+
+# Each pass waits for MQTT until the next frame is due while something moves,
+# briefly while messages are coming in, and until the next timed job otherwise
+# (lib/mqtt_poller.py). "mqtt_poll_fixed" in secrets goes back to fixed 0.1s waits.
+# A buffered socket can tell when it is quiet, so the wait is one long read.
+mqtt_poller = MQTTPoller(
+    client,
+    scale_reads=bool(SOCKET_READ_AHEAD),
+    adaptive=not secrets.get("mqtt_poll_fixed"),
+)
+
 tss = {interval: None for interval in TS_INTERVALS}
+
+
+def _until_next_job():
+    """Seconds until the next of TS_INTERVALS is due."""
+    now = time.monotonic()
+    due = None
+    for ts_interval, ts in TS_INTERVALS.items():
+        last = tss[ts_interval]
+        # The check below is "more than interval seconds ago": wait a hair longer.
+        left = last + ts.interval - now + 0.001 if last else 0
+        due = left if due is None else min(due, left)
+    return max(0, due)
+
+
 t0 = time.monotonic()
 now = t0
 while True:
+    crash_log.pass_done()
+    idle = False
+    moving = not power_save and (bool(img_state) or matrixportal._scrolling_index is not None)
     try:
-        if (
-            not client.loop(timeout=MQTT_LOOP_TIMEOUT)
-            and matrixportal._scrolling_index is None
-            and not img_state
-        ):
-            # Take a little break if nothing really happened
-            time.sleep(0.123)
+        received = mqtt_poller.poll(
+            presenter.until_next_frame() if moving else None, _until_next_job()
+        )
+        idle = not received and not moving
     except Exception as e:
         _try_reconnect(e)
 
-    if not img_state and matrixportal._scrolling_index is not None:
+    gc_policy.poll(idle)
+    if img_state.get("img_stream"):
+        # Decode the next frame now, not when it is due
+        img_state["img_stream"].prefetch()
+    asset_receiver.poll()
+
+    if not power_save and not img_state and matrixportal._scrolling_index is not None:
         # Scroll the text block, but only if there is work
         # There is an explicit in a less frequent interval (one_sec_tick)
         matrixportal.scroll()
@@ -743,19 +1274,37 @@ while True:
             try:
                 if TS_INTERVALS[ts_interval].interval >= 60:
                     lt = time.localtime()
-                    print(
-                        f"{lt.tm_hour}:{lt.tm_min}:{lt.tm_sec} Interval {ts_interval} triggered"
+                    log.info(
+                        "%d:%d:%d Interval %s triggered",
+                        lt.tm_hour,
+                        lt.tm_min,
+                        lt.tm_sec,
+                        ts_interval,
                     )
                 else:
                     # print(".", end="")
                     pass
-                TS_INTERVALS[ts_interval].fun()
+                if MEM_PROFILE:
+                    _profiled(ts_interval, TS_INTERVALS[ts_interval].fun)
+                else:
+                    TS_INTERVALS[ts_interval].fun()
             except (ValueError, RuntimeError) as e:
-                print(f"Error in {ts_interval}, retrying in 10s: {e}")
+                log.error("Error in %s, retrying in 10s: %s", ts_interval, e)
                 tss[ts_interval] = (now - TS_INTERVALS[ts_interval].interval) + 10
                 _inc_counter("fail_runtime")
                 continue
             except Exception as e:
-                print(f"Failed {ts_interval}: {e}")
+                log.error("Failed %s: %s", ts_interval, e)
                 _inc_counter("fail_other")
             tss[ts_interval] = time.monotonic()
+
+    if power_save:
+        continue
+    # Everything changed during this pass goes out in one refresh.
+    presenter.present(bool(img_state) or matrixportal._scrolling_index is not None)
+    if img_state:
+        # The next animation frame, shown by the next refresh
+        if MEM_PROFILE:
+            _profiled("img_frame", advance_img)
+        else:
+            advance_img()
@@ -67,6 +67,7 @@ MQTT_TLS_PORT = const(8883)
 MQTT_PINGREQ = b"\xc0\0"
 MQTT_PINGRESP = const(0xD0)
 MQTT_PUBLISH = const(0x30)
+MQTT_PUBACK = const(0x40)
 MQTT_SUB = const(0x82)
 MQTT_SUBACK = const(0x90)
 MQTT_UNSUB = const(0xA2)
@@ -115,12 +116,21 @@ class MMQTTStateError(MMQTTException):
     """
 
 
+# logging's DEBUG level, and one above all of them
+LOG_DEBUG = const(10)
+LOG_NOTHING = const(60)
+
+
 class NullLogger:
     """Fake logger class that does not do anything"""
 
     def nothing(self, msg: str, *args) -> None:
         """no action"""
 
+    def getEffectiveLevel(self) -> int:  # noqa: N802, logging's name
+        """Above every level: nothing is logged"""
+        return LOG_NOTHING
+
     def __init__(self) -> None:
         for log_level in ["debug", "info", "warning", "error", "critical"]:
             setattr(NullLogger, log_level, self.nothing)
@@ -149,6 +159,17 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         This works with all callbacks but the "on_message" and those added via add_topic_callback();
         for those, to get access to the user_data use the 'user_data' member of the MQTT object
         passed as 1st argument.
+    :param int max_payload_size: Largest PUBLISH payload, in bytes, to read into memory for
+        on_message and topic callbacks. Larger ones are read off the socket in small pieces
+        and dropped, without allocating them, and on_payload_rejected is called. Topics added
+        with add_topic_stream() are not limited. None (the default) means no limit.
+    :param int max_inflight: QoS 1 PUBLISHes that may wait for their PUBACK at once. publish()
+        returns as soon as the message is sent, and only waits for a PUBACK when this many
+        are outstanding; PUBACKs are picked up by loop(). 0 (the default) waits for each
+        PUBACK in publish().
+    :param int recent_pids: How many packet identifiers of received QoS 1 messages to
+        remember. A redelivery (DUP set) of one of them is acknowledged again but not
+        passed on to the callbacks.
 
     """
 
@@ -169,6 +190,9 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         socket_timeout: int = 1,
         connect_retries: int = 5,
         user_data=None,
+        max_payload_size: Optional[int] = None,
+        max_inflight: int = 0,
+        recent_pids: int = 16,
     ) -> None:
         self._connection_manager = get_connection_manager(socket_pool)
         self._socket_pool = socket_pool
@@ -186,6 +210,21 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         self.user_data = user_data
         self._is_connected = False
         self._msg_size_lim = MQTT_MSG_SZ_LIM
+        self._max_payload_size = max_payload_size
+        self.payloads_rejected = 0
+        # topic -> (buffer, callback), see add_topic_stream()
+        self._topic_streams = {}
+        self._skip_buffer = None
+        # pid -> topic of QoS 1 PUBLISHes waiting for their PUBACK
+        self._inflight = {}
+        self._max_inflight = max_inflight
+        self.publishes_lost = 0
+        self.inflight_waits = 0
+        # Ring of pids of QoS 1 messages received (0 is not a valid pid). A list, not
+        # an array("H"): MicroPython's arrays don't support `in` with an int.
+        self._recent_pids = [0] * max(recent_pids, 1)
+        self._recent_pid_index = 0
+        self.duplicates_dropped = 0
         self._pid = 0
         self._last_msg_sent_timestamp: int = 0
         self.logger = NullLogger()
@@ -251,6 +290,7 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         self.on_publish = None
         self.on_subscribe = None
         self.on_unsubscribe = None
+        self.on_payload_rejected = None
 
     def __enter__(self):
         return self
@@ -267,6 +307,19 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         """De-initializes the MQTT client and disconnects from the mqtt broker."""
         self.disconnect()
 
+    @property
+    def socket_timeout(self) -> float:
+        """How long one read waits for data, in seconds. Can be changed while connected."""
+        return self._socket_timeout
+
+    @socket_timeout.setter
+    def socket_timeout(self, socket_timeout: float) -> None:
+        if socket_timeout >= self._recv_timeout:
+            raise ValueError("recv_timeout must be strictly greater than socket_timeout")
+        self._socket_timeout = socket_timeout
+        if self._sock is not None and not self._backwards_compatible_sock:
+            self._sock.settimeout(socket_timeout)
+
     @property
     def mqtt_msg(self) -> Tuple[int, int]:
         """Returns maximum MQTT payload and topic size."""
@@ -375,6 +428,39 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         except KeyError:
             raise KeyError("MQTT topic callback not added with add_topic_callback.") from None
 
+    def add_topic_stream(self, mqtt_topic: str, buffer, callback_method) -> None:
+        """Receives the payloads of a topic in pieces, into a buffer allocated up front,
+        instead of all at once into a new bytearray.
+
+        :param str mqtt_topic: MQTT topic name. Exact match, no wildcards.
+        :param buffer: Writable buffer (e.g. a bytearray) the payload is read into, up to
+            len(buffer) bytes at a time.
+        :param function callback_method: Called for every piece read, in order:
+            ``callback(client, topic, chunk, offset, total)``, where ``chunk`` is a
+            memoryview into ``buffer`` that is only valid during the call, ``offset`` is
+            where it starts in the payload and ``total`` is the payload size. An empty
+            payload gives a single call with an empty chunk. Returning False rejects
+            the rest of the payload: it is read and dropped without further calls.
+
+        Stream topics take precedence over on_message and add_topic_callback(), and are
+        not limited by max_payload_size.
+        """
+        if mqtt_topic is None or buffer is None or callback_method is None:
+            raise ValueError("MQTT topic, buffer and callback method must all be defined.")
+        if not len(buffer):
+            raise ValueError("Stream buffer must not be empty.")
+        self._topic_streams[mqtt_topic] = (buffer, callback_method)
+
+    def remove_topic_stream(self, mqtt_topic: str) -> None:
+        """Removes a stream added with add_topic_stream().
+
+        :param str mqtt_topic: MQTT topic name.
+        """
+        try:
+            del self._topic_streams[mqtt_topic]
+        except KeyError:
+            raise KeyError("MQTT topic stream not added with add_topic_stream().") from None
+
     @property
     def on_message(self):
         """Called when a new message has been received on a subscribed topic.
@@ -441,7 +527,7 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
                     self._reset_reconnect_backoff()
 
             self.logger.debug(
-                f"Attempting to connect to MQTT broker (attempt #{self._reconnect_attempt})"
+                "Attempting to connect to MQTT broker (attempt #%d)", self._reconnect_attempt
             )
 
             try:
@@ -458,12 +544,12 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
                 if isinstance(e, RuntimeError) and e.args == ("pystack exhausted",):
                     raise
                 self._close_socket()
-                self.logger.warning(f"Socket error when connecting: {e}")
+                self.logger.warning("Socket error when connecting: %s", e)
                 last_exception = e
                 backoff = False
             except MMQTTException as e:
                 self._close_socket()
-                self.logger.info(f"MMQT error: {e}")
+                self.logger.info("MMQT error: %s", e)
                 if e.code in [
                     CONNACK_ERROR_INCORECT_USERNAME_PASSWORD,
                     CONNACK_ERROR_UNAUTHORIZED,
@@ -530,7 +616,7 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
 
         if self._reconnect_attempt > 0:
             self.logger.debug(
-                f"Sleeping for {self._reconnect_timeout:.3} seconds due to connect back-off"
+                "Sleeping for %.3f seconds due to connect back-off", self._reconnect_timeout
             )
             time.sleep(self._reconnect_timeout)
 
@@ -572,8 +658,8 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
 
         self._encode_remaining_length(fixed_header, remaining_length)
         self.logger.debug("Sending CONNECT to broker...")
-        self.logger.debug(f"Fixed Header: {fixed_header}")
-        self.logger.debug(f"Variable Header: {var_header}")
+        self.logger.debug("Fixed Header: %s", fixed_header)
+        self.logger.debug("Variable Header: %s", var_header)
         self._send_bytes(fixed_header)
         self._send_bytes(var_header)
         # [MQTT-3.1.3-4]
@@ -596,6 +682,10 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
                 if rc[2] != 0x00:
                     raise MMQTTException(CONNACK_ERRORS[rc[2]], code=rc[2])
                 self._is_connected = True
+                if self._inflight:
+                    # A new session: nothing in flight on the old one will be acknowledged.
+                    self.publishes_lost += len(self._inflight)
+                    self._inflight.clear()
                 result = rc[0] & 1
                 if self.on_connect is not None:
                     self.on_connect(self, self.user_data, result, rc[2])
@@ -638,7 +728,7 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         try:
             self._send_bytes(MQTT_DISCONNECT)
         except (MemoryError, OSError, RuntimeError) as e:
-            self.logger.warning(f"Unable to send DISCONNECT packet: {e}")
+            self.logger.warning("Unable to send DISCONNECT packet: %s", e)
         self._close_socket()
         self._is_connected = False
         self._subscribed_topics = []
@@ -717,6 +807,9 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
 
         remaining_length = 2 + len(msg) + len(topic.encode("utf-8"))
         if qos > 0:
+            if self._max_inflight and len(self._inflight) >= self._max_inflight:
+                self.inflight_waits += 1
+                self._wait_for_pubacks(self._max_inflight - 1)
             # packet identifier where QoS level is 1 or 2. [3.3.2.2]
             remaining_length += 2
             self._pid = self._pid + 1 if self._pid < 0xFFFF else 1
@@ -740,24 +833,38 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         if qos == 0 and self.on_publish is not None:
             self.on_publish(self, self.user_data, topic, self._pid)
         if qos == 1:
-            stamp = ticks_ms()
-            while True:
-                op = self._wait_for_msg()
-                if op == 0x40:
-                    sz = self._sock_exact_recv(1)
-                    assert sz == b"\x02"
-                    rcv_pid_buf = self._sock_exact_recv(2)
-                    rcv_pid = rcv_pid_buf[0] << 0x08 | rcv_pid_buf[1]
-                    if self._pid == rcv_pid:
-                        if self.on_publish is not None:
-                            self.on_publish(self, self.user_data, topic, rcv_pid)
-                        return
-
-                if op is None:
-                    if ticks_diff(ticks_ms(), stamp) / 1000 > self._recv_timeout:
-                        raise MMQTTException(
-                            f"No data received from broker for {self._recv_timeout} seconds."
-                        )
+            # on_publish is called when the PUBACK comes in, see _handle_puback()
+            self._inflight[self._pid] = topic
+            if not self._max_inflight:
+                self._wait_for_pubacks(0)
+
+    @property
+    def inflight(self) -> int:
+        """QoS 1 PUBLISHes sent that have not been acknowledged yet."""
+        return len(self._inflight)
+
+    def _wait_for_pubacks(self, outstanding: int) -> None:
+        """Process incoming packets until at most ``outstanding`` QoS 1 PUBLISHes
+        are waiting for their PUBACK."""
+        stamp = ticks_ms()
+        while len(self._inflight) > outstanding:
+            if self._wait_for_msg() is None:
+                if ticks_diff(ticks_ms(), stamp) / 1000 > self._recv_timeout:
+                    raise MMQTTException(
+                        f"No data received from broker for {self._recv_timeout} seconds."
+                    )
+
+    def _handle_puback(self) -> None:
+        sz = self._sock_exact_recv(1)[0]
+        if sz != 0x02:
+            raise MMQTTException(f"Unexpected PUBACK length: {sz}.")
+        rcv_pid_buf = self._sock_exact_recv(2)
+        rcv_pid = rcv_pid_buf[0] << 0x08 | rcv_pid_buf[1]
+        topic = self._inflight.pop(rcv_pid, None)
+        if topic is None:
+            self.logger.debug("PUBACK for unknown pid %d", rcv_pid)
+        elif self.on_publish is not None:
+            self.on_publish(self, self.user_data, topic, rcv_pid)
 
     def subscribe(  # noqa: PLR0912, PLR0915, Too many branches, Too many statements
         self, topic: Optional[Union[tuple, str, list]], qos: int = 0
@@ -798,12 +905,12 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         packet_length = 2 + (2 * len(topics)) + (1 * len(topics))
         packet_length += sum(len(topic.encode("utf-8")) for topic, qos in topics)
         self._encode_remaining_length(fixed_header, remaining_length=packet_length)
-        self.logger.debug(f"Fixed Header: {fixed_header}")
+        self.logger.debug("Fixed Header: %s", fixed_header)
         self._send_bytes(fixed_header)
         self._pid = self._pid + 1 if self._pid < 0xFFFF else 1
         packet_id_bytes = self._pid.to_bytes(2, "big")
         var_header = packet_id_bytes
-        self.logger.debug(f"Variable Header: {var_header}")
+        self.logger.debug("Variable Header: %s", var_header)
         self._send_bytes(var_header)
         # attaching topic and QOS level to the packet
         payload = b""
@@ -812,8 +919,8 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
             qos_byte = q.to_bytes(1, "big")
             payload += topic_size + t.encode() + qos_byte
         for t, q in topics:
-            self.logger.debug(f"SUBSCRIBING to topic {t} with QoS {q}")
-        self.logger.debug(f"payload: {payload}")
+            self.logger.debug("SUBSCRIBING to topic %s with QoS %d", t, q)
+        self.logger.debug("payload: %s", payload)
         self._send_bytes(payload)
         stamp = ticks_ms()
         self._last_msg_sent_timestamp = stamp
@@ -878,19 +985,19 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         packet_length = 2 + (2 * len(topics))
         packet_length += sum(len(topic.encode("utf-8")) for topic in topics)
         self._encode_remaining_length(fixed_header, remaining_length=packet_length)
-        self.logger.debug(f"Fixed Header: {fixed_header}")
+        self.logger.debug("Fixed Header: %s", fixed_header)
         self._send_bytes(fixed_header)
         self._pid = self._pid + 1 if self._pid < 0xFFFF else 1
         packet_id_bytes = self._pid.to_bytes(2, "big")
         var_header = packet_id_bytes
-        self.logger.debug(f"Variable Header: {var_header}")
+        self.logger.debug("Variable Header: %s", var_header)
         self._send_bytes(var_header)
         payload = b""
         for t in topics:
             topic_size = len(t.encode("utf-8")).to_bytes(2, "big")
             payload += topic_size + t.encode()
         for t in topics:
-            self.logger.debug(f"UNSUBSCRIBING from topic {t}")
+            self.logger.debug("UNSUBSCRIBING from topic %s", t)
         self._send_bytes(payload)
         self._last_msg_sent_timestamp = ticks_ms()
         self.logger.debug("Waiting for UNSUBACK...")
@@ -928,18 +1035,18 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
         """
         self._reconnect_attempt = self._reconnect_attempt + 1
         self._reconnect_timeout = 2**self._reconnect_attempt
-        self.logger.debug(f"Reconnect timeout computed to {self._reconnect_timeout:.2f}")
+        self.logger.debug("Reconnect timeout computed to %.2f", self._reconnect_timeout)
 
         if self._reconnect_timeout > self._reconnect_maximum_backoff:
             self.logger.debug(
-                f"Truncating reconnect timeout to {self._reconnect_maximum_backoff} seconds"
+                "Truncating reconnect timeout to %s seconds", self._reconnect_maximum_backoff
             )
             self._reconnect_timeout = float(self._reconnect_maximum_backoff)
 
         # Add a sub-second jitter.
         # Even truncated timeout should have jitter added to it. This is why it is added here.
         jitter = randint(0, 1000) / 1000
-        self.logger.debug(f"adding jitter {jitter:.2f} to {self._reconnect_timeout:.2f} seconds")
+        self.logger.debug("adding jitter %.2f to %.2f seconds", jitter, self._reconnect_timeout)
         self._reconnect_timeout += jitter
 
     def _reset_reconnect_backoff(self) -> None:
@@ -980,11 +1087,14 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
 
         return ret
 
-    def loop(self, timeout: float = 1.0) -> Optional[list[int]]:
+    def loop(self, timeout: float = 1.0, until_quiet: bool = False) -> Optional[list[int]]:
         """Non-blocking message loop. Use this method to check for incoming messages.
         Returns list of packet types of any messages received or None.
 
         :param float timeout: return after this timeout, in seconds.
+        :param bool until_quiet: return sooner, as soon as a read comes back empty after
+            packets were received: the burst they came in has been handled. With a socket
+            that has ``available()``, as soon as it has nothing, without that read.
 
         """
         if timeout < self._socket_timeout:
@@ -994,7 +1104,10 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
             )
 
         self._connected()
-        self.logger.debug(f"waiting for messages for {timeout} seconds")
+        # Once per pass of the caller's main loop: these cost nothing when debug is off.
+        debug = self._log_debug()
+        if debug:
+            self.logger.debug("waiting for messages for %s seconds", timeout)
 
         stamp = ticks_ms()
         rcs = []
@@ -1009,14 +1122,21 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
                 # ping() itself contains a _wait_for_msg() loop which might have taken a while,
                 # so check here as well.
                 if ticks_diff(ticks_ms(), stamp) / 1000 > timeout:
-                    self.logger.debug(f"Loop timed out after {timeout} seconds")
+                    if debug:
+                        self.logger.debug("Loop timed out after %s seconds", timeout)
                     break
 
+            if until_quiet and rcs and self._sock_available() == 0:
+                # The socket can tell nothing more has come in: no need to wait a read out.
+                break
             rc = self._wait_for_msg()
             if rc is not None:
                 rcs.append(rc)
+            elif until_quiet and rcs:
+                break
             if ticks_diff(ticks_ms(), stamp) / 1000 > timeout:
-                self.logger.debug(f"Loop timed out after {timeout} seconds")
+                if debug:
+                    self.logger.debug("Loop timed out after %s seconds", timeout)
                 break
 
         return rcs if rcs else None
@@ -1048,14 +1168,21 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
             # If we get here, it means that there is nothing to be received
             return None
         pkt_type = res[0] & MQTT_PKT_TYPE_MASK
-        self.logger.debug(f"Got message type: {hex(pkt_type)} pkt: {hex(res[0])}")
+        debug = self._log_debug()
+        if debug:
+            self.logger.debug("Got message type: %#x pkt: %#x", pkt_type, res[0])
         if pkt_type == MQTT_PINGRESP:
-            self.logger.debug("Got PINGRESP")
+            if debug:
+                self.logger.debug("Got PINGRESP")
             sz = self._sock_exact_recv(1)[0]
             if sz != 0x00:
                 raise MMQTTException(f"Unexpected PINGRESP returned from broker: {sz}.")
             return pkt_type
 
+        if pkt_type == MQTT_PUBACK:
+            self._handle_puback()
+            return pkt_type
+
         if pkt_type != MQTT_PUBLISH:
             return pkt_type
 
@@ -1080,10 +1207,31 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
             sz -= 0x02
 
         # read message contents
-        raw_msg = self._sock_exact_recv(sz)
-        msg = raw_msg if self._use_binary_mode else str(raw_msg, "utf-8")
-        self.logger.debug("Receiving PUBLISH \nTopic: %s\nMsg: %s\n", topic, raw_msg)
-        self._handle_on_message(topic, msg)
+        stream = self._topic_streams.get(topic)
+        if res[0] & 0x06 == 0x02 and self._seen_pid(pid, res[0] & 0x08):
+            # Redelivered (the broker didn't get our PUBACK): acknowledge it again, only.
+            if debug:
+                self.logger.debug("Dropping duplicate PUBLISH \nTopic: %s\nPid: %d\n", topic, pid)
+            self._skip_payload(sz)
+            self.duplicates_dropped += 1
+        elif stream is not None:
+            if debug:
+                self.logger.debug("Streaming PUBLISH \nTopic: %s\nSize: %d\n", topic, sz)
+            self._stream_payload(topic, sz, stream[0], stream[1])
+        elif self._max_payload_size is not None and sz > self._max_payload_size:
+            # on_payload_rejected is where this gets reported
+            if debug:
+                self.logger.debug("Dropping %d byte payload on %s", sz, topic)
+            self._skip_payload(sz)
+            self.payloads_rejected += 1
+            if self.on_payload_rejected:
+                self.on_payload_rejected(self, topic, sz)
+        else:
+            raw_msg = self._sock_exact_recv(sz)
+            msg = raw_msg if self._use_binary_mode else str(raw_msg, "utf-8")
+            if debug:
+                self.logger.debug("Receiving PUBLISH \nTopic: %s\nMsg: %s\n", topic, raw_msg)
+            self._handle_on_message(topic, msg)
         if res[0] & 0x06 == 0x02:
             pkt = bytearray(b"\x40\x02\0\0")
             struct.pack_into("!H", pkt, 2, pid)
@@ -1093,6 +1241,42 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
 
         return pkt_type
 
+    def _seen_pid(self, pid: int, dup: int) -> bool:
+        """Whether a QoS 1 PUBLISH with ``pid`` is a redelivery of one already received.
+        Only one with the DUP flag set can be: without it, a pid seen before has been
+        reused for a new message."""
+        if dup and pid in self._recent_pids:
+            return True
+        if pid not in self._recent_pids:
+            self._recent_pids[self._recent_pid_index] = pid
+            self._recent_pid_index = (self._recent_pid_index + 1) % len(self._recent_pids)
+        return False
+
+    def _stream_payload(self, topic: str, size: int, buffer, callback) -> None:
+        """Read a payload of ``size`` bytes through ``buffer``, calling ``callback`` on
+        every piece, until it is all read or the callback returns False."""
+        view = memoryview(buffer)
+        offset = 0
+        while True:
+            count = min(len(buffer), size - offset)
+            self._sock_exact_recv_into(view, count)
+            if callback(self, topic, view[:count], offset, size) is False:
+                self._skip_payload(size - offset - count)
+                return
+            offset += count
+            if offset >= size:
+                return
+
+    def _skip_payload(self, size: int) -> None:
+        """Read ``size`` bytes and drop them, through a small reused buffer."""
+        if self._skip_buffer is None:
+            self._skip_buffer = bytearray(256)
+        view = memoryview(self._skip_buffer)
+        while size > 0:
+            count = min(len(view), size)
+            self._sock_exact_recv_into(view, count)
+            size -= count
+
     def _decode_remaining_length(self) -> int:
         """Decode Remaining Length [2.2.3]"""
         n = 0
@@ -1106,6 +1290,42 @@ class MQTT:  # noqa: PLR0904  # too-many-public-methods
                 return n
             sh += 7
 
+    def _log_debug(self) -> bool:
+        """Whether the logger takes debug lines. The ones on the hot path are only
+        made (arguments and all) if it does."""
+        return self.logger.getEffectiveLevel() <= LOG_DEBUG
+
+    def _sock_available(self) -> Optional[int]:
+        """Number of bytes that can be read without waiting, or None if the socket
+        can't tell (only ones with an ``available()`` method, like a buffered socket, can).
+        """
+        available = getattr(self._sock, "available", None)
+        return available() if available is not None else None
+
+    def _sock_exact_recv_into(self, view: memoryview, bufsize: int) -> None:
+        """Reads exactly ``bufsize`` bytes into the start of ``view``, like _sock_exact_recv()
+        but without allocating a buffer for them (except on legacy sockets).
+
+        :param memoryview view: where to put the bytes, at least ``bufsize`` long
+        :param int bufsize: number of bytes to receive
+        """
+        if not bufsize:
+            return
+        if self._backwards_compatible_sock:
+            view[:bufsize] = self._sock_exact_recv(bufsize)
+            return
+        stamp = ticks_ms()
+        to_read = bufsize
+        view = view[:bufsize]
+        while to_read > 0:
+            recv_len = self._sock.recv_into(view, to_read)
+            to_read -= recv_len
+            view = view[recv_len:]
+            if to_read and ticks_diff(ticks_ms(), stamp) / 1000 > self._recv_timeout:
+                raise MMQTTException(
+                    f"Unable to receive {to_read} bytes within {self._recv_timeout} seconds."
+                )
+
     def _sock_exact_recv(self, bufsize: int, timeout: Optional[float] = None) -> bytearray:
         """Reads _exact_ number of bytes from the connected socket. Will only return
         bytearray with the exact number of bytes requested.
@@ -0,0 +1,89 @@
+"""
+`asset_index`
+================================================================================
+
+What images there are, read once at boot.
+
+``/img`` used to find its file by trying a few spellings of the name with
+``os.stat`` on every request. This lists the image directory once, reads each
+BMP's header (see `sprite_stream.read_header`) and keeps name -> `Asset`, so a
+request is a dict lookup. ``"parrot"``, ``"parrot.bmp"`` and ``"bmps/parrot.bmp"``
+all find the same entry.
+"""
+
+import os
+from collections import namedtuple
+
+from flight_log import PrintLogger
+from sprite_stream import read_header
+
+Asset = namedtuple("Asset", "path width height bpp compression frames")
+
+
+class AssetIndex:
+    """BMPs in ``directory``, by name without the ``.bmp``.
+
+    :param str directory: Where the images are.
+    :param int frame_height: Frame height the frame counts are for.
+    :param logger: Where unreadable files are logged (`flight_log.Logger`). By
+                   default they are printed.
+    """
+
+    def __init__(self, directory="bmps", frame_height=32, logger=None):
+        self.directory = directory
+        self.frame_height = frame_height
+        self.logger = logger or PrintLogger("assets")
+        self.assets = {}
+        self.failed = 0
+        self.scan()
+
+    def scan(self):
+        """(Re)read the directory. Files that aren't readable BMPs are skipped."""
+        self.assets.clear()
+        try:
+            names = os.listdir(self.directory)
+        except OSError as e:
+            self.logger.warning("%s: %s", self.directory, e)
+            return
+        for filename in sorted(names):
+            if filename.lower().endswith(".bmp") and not filename.startswith("."):
+                self.add(f"{self.directory}/{filename}")
+
+    def add(self, path):
+        """Read the header of ``path`` and index it. Returns the `Asset`, or None."""
+        try:
+            with open(path, "rb") as file:
+                header = read_header(file)
+        except (OSError, ValueError) as e:
+            self.logger.warning("%s: %s", path, e)
+            self.failed += 1
+            return None
+        asset = Asset(
+            path,
+            header.width,
+            header.height,
+            header.bpp,
+            header.compression,
+            header.height // min(self.frame_height, header.height or 1),
+        )
+        self.assets[self._key(path)] = asset
+        return asset
+
+    def lookup(self, name):
+        """The `Asset` for ``name`` (with or without directory and ``.bmp``), or None."""
+        return self.assets.get(self._key(name))
+
+    def _key(self, name):
+        prefix = self.directory + "/"
+        if name.startswith(prefix):
+            name = name[len(prefix) :]
+        if name[-4:].lower() == ".bmp":
+            name = name[:-4]
+        return name
+
+    def stats(self):
+        """For the status payload: name -> [width, height, bpp, frames]."""
+        return {
+            name: [asset.width, asset.height, asset.bpp, asset.frames]
+            for name, asset in self.assets.items()
+        }
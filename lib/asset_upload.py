@@ -0,0 +1,387 @@
+"""
+`asset_upload`
+================================================================================
+
+Receive images over MQTT into the image directory.
+
+The sender and the clock talk on three topics under ``<prefix>/asset``:
+
+``begin``, JSON from the sender: ``{"name": "fireworks", "size": 78492, "crc": 1234}``
+    Starts an upload of ``size`` bytes whose CRC-32 is ``crc``. If a partial upload
+    of the same file is there from before (the connection dropped, the board
+    reset), it carries on from where that one got to.
+``data``, binary from the sender: the offset of the chunk (4 bytes), its CRC-32
+    (4 bytes), both big endian, then the chunk itself.
+``status``, JSON from the clock: ``{"name": ..., "state": ..., "offset": ...}``
+    ``"ready"``: send the chunk starting at ``offset``. ``"done"``: the file is in
+    place. ``"failed"``: given up, see ``"error"``.
+
+One chunk is in flight at a time: the sender waits for the next ``ready``. The
+clock only answers from the main loop, and no sooner than ``max_rate`` allows,
+which is what keeps an upload from getting in the way of drawing.
+
+Chunks are read off the socket a piece at a time (``MQTT.add_topic_stream``) and
+written straight to a hidden temp file, so their size is not limited by free
+RAM. A chunk with a bad CRC or at the wrong offset is asked for again. When the
+whole file is there and its CRC and BMP header check out, it is renamed into
+place. FAT can't rename over a file, so replacing an existing image removes the
+old one first.
+
+Nothing is written unless the drive is writable by the clock (``boot.py`` only
+remounts it so with ``asset_upload`` in secrets.py), and no upload may be bigger
+than ``max_size``: an upload that can't be taken, or a write that fails midway,
+is answered with ``failed``.
+"""
+
+import errno
+import json
+import os
+import struct
+from binascii import crc32
+
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
+
+from flight_log import PrintLogger
+from sprite_stream import read_header
+
+READY = "ready"
+DONE = "done"
+FAILED = "failed"
+
+CHUNK_HEADER = ">II"
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_HEADER)
+MAX_NAME = 32
+# Largest upload taken, in bytes: an RLE animation is well under this, and one
+# upload can't fill the drive.
+MAX_ASSET_SIZE = 256 * 1024
+# Free space to leave on the drive, in bytes.
+FREE_MARGIN = 16 * 1024
+# Time to spend hashing a resumed temp file per poll(), in milliseconds.
+HASH_MS = 10
+
+
+def valid_name(name):
+    """Letters, digits, ``_`` and ``-`` only: a name can't leave the directory."""
+    if not isinstance(name, str) or not 0 < len(name) <= MAX_NAME:
+        return False
+    for char in name:
+        if not (char.isalpha() or char.isdigit() or char in "_-"):
+            return False
+    return True
+
+
+class AssetReceiver:
+    # pylint: disable=too-many-instance-attributes
+    """The clock's side of an upload.
+
+    :param str directory: Where images go. Temp files are hidden ones there too.
+    :param publish: ``publish(dict)`` sends a status message.
+    :param int buffer_size: Size of the buffer chunks are read through; give
+                            ``buffer`` to ``add_topic_stream`` with `on_chunk`.
+    :param int max_rate: Bytes per second to accept at most.
+    :param float idle_timeout: Seconds without data after which an upload is put
+                               aside (its temp file stays, for resuming).
+    :param release: ``release(path)`` is called before an image is replaced, to
+                    close it if it is showing.
+    :param installed: ``installed(path)`` is called once a new image is in place.
+    :param logger: Where uploads put aside or failed are logged (`flight_log.Logger`).
+                   By default they are printed.
+    :param bool writable: Whether the clock can write to the drive. If not, every
+                          upload fails right away.
+    :param int max_size: Largest upload taken, in bytes.
+    """
+
+    def __init__(
+        self,
+        directory,
+        publish,
+        *,
+        buffer_size=256,
+        max_rate=4096,
+        idle_timeout=60,
+        release=None,
+        installed=None,
+        logger=None,
+        writable=True,
+        max_size=MAX_ASSET_SIZE,
+    ):
+        self.directory = directory
+        self._publish = publish
+        self.buffer = bytearray(max(buffer_size, CHUNK_HEADER_SIZE))
+        self.max_rate = max_rate
+        self.idle_timeout_ms = int(idle_timeout * 1000)
+        self._release = release
+        self._installed = installed
+        self.logger = logger or PrintLogger("upload")
+        self.writable = writable
+        self.max_size = max_size
+
+        self.name = None
+        self.size = 0
+        self.crc = 0
+        self.offset = 0
+        self._file = None
+        self._file_crc = 0
+        # Resuming: bytes of the temp file hashed so far, or None.
+        self._hash_pos = None
+        self._hash_end = 0
+        # Chunk being received: its offset, expected CRC, CRC so far, or None.
+        self._chunk_offset = None
+        self._chunk_crc = 0
+        self._chunk_crc_so_far = 0
+        self._file_crc_so_far = 0
+        self._answer = False
+        self._not_before = ticks_ms()
+        self._last_activity = ticks_ms()
+
+        self.started = 0
+        self.resumed = 0
+        self.done = 0
+        self.failed = 0
+        self.bad_chunks = 0
+        self.received = 0
+
+    def _temp(self, name):
+        return f"{self.directory}/.{name}.part"
+
+    def _meta(self, name):
+        return f"{self.directory}/.{name}.meta"
+
+    def begin(self, message):
+        """Handle a ``begin`` message (str)."""
+        try:
+            value = json.loads(message)
+            name = value["name"]
+            size = int(value["size"])
+            crc = int(value["crc"])
+        except (ValueError, KeyError, TypeError) as e:
+            self._fail(None, f"bad begin: {e}")
+            return
+        if not valid_name(name):
+            self._fail(name, "bad name")
+            return
+        if not self.writable:
+            self._fail(name, "read-only drive: set 'asset_upload': True in secrets.py")
+            return
+        if size > self.max_size:
+            self._fail(name, f"size {size} is over the {self.max_size} byte limit")
+            return
+        if self._file is not None and (name, size, crc) == (self.name, self.size, self.crc):
+            # The sender started over (it lost the connection, or gave up waiting):
+            # tell it where this one is.
+            self._chunk_offset = None
+            self._last_activity = ticks_ms()
+            self._answer = self._hash_pos is None
+            return
+        self._put_aside()
+        try:
+            stat = os.statvfs(self.directory)
+            free = stat[0] * stat[4]
+        except OSError:
+            free = None
+        if size <= 0 or (free is not None and size > free - FREE_MARGIN):
+            self._fail(name, f"size {size} does not fit in {free} free bytes")
+            return
+
+        self.name = name
+        self.size = size
+        self.crc = crc
+        self.offset = 0
+        self._file_crc = 0
+        self._chunk_offset = None
+        self._last_activity = ticks_ms()
+        temp = self._temp(name)
+        try:
+            with open(self._meta(name), "r") as meta:
+                value = json.load(meta)
+            partial = 0
+            if value["size"] == size and value["crc"] == crc:
+                # Past the offset put down when the upload was put aside (if it
+                # was, rather than cut off by a reset) is a chunk that didn't check out.
+                partial = min(os.stat(temp)[6], value.get("offset", size))
+        except (OSError, ValueError, KeyError, TypeError):
+            partial = 0
+        try:
+            if 0 < partial <= size:
+                # Hash what is there from poll(), a buffer at a time, then go on from its end.
+                self._file = open(temp, "r+b")
+                self._hash_pos = 0
+                self._hash_end = partial
+                self.resumed += 1
+            else:
+                with open(self._meta(name), "w") as meta:
+                    json.dump({"size": size, "crc": crc}, meta)
+                self._file = open(temp, "wb")
+                self._answer = True
+                self.started += 1
+        except OSError as e:
+            self._fail(name, f"can't write {temp}: {e}")
+
+    def on_chunk(self, _client, _topic, chunk, offset, total):
+        """``add_topic_stream`` callback for the ``data`` topic."""
+        if self._file is None or self._hash_pos is not None:
+            return False
+        last = offset + len(chunk) >= total
+        if offset == 0:
+            self._last_activity = ticks_ms()
+            if total <= CHUNK_HEADER_SIZE or len(chunk) < CHUNK_HEADER_SIZE:
+                return False
+            chunk_offset, self._chunk_crc = struct.unpack_from(CHUNK_HEADER, chunk)
+            if chunk_offset != self.offset or chunk_offset + total - CHUNK_HEADER_SIZE > self.size:
+                # Not what was asked for: ask again.
+                self._answer = True
+                return False
+            self._chunk_offset = chunk_offset
+            self._chunk_crc_so_far = 0
+            self._file_crc_so_far = self._file_crc
+            chunk = chunk[CHUNK_HEADER_SIZE:]
+        elif self._chunk_offset is None:
+            return False
+
+        try:
+            if offset == 0:
+                self._file.seek(self._chunk_offset)
+            self._file.write(chunk)
+        except OSError as e:
+            # Out of space, or a flash error: the upload fails, not the connection.
+            error = "drive full" if e.errno == errno.ENOSPC else f"can't write: {e}"
+            self._fail(self.name, error)
+            return False
+        self._chunk_crc_so_far = crc32(chunk, self._chunk_crc_so_far)
+        self._file_crc_so_far = crc32(chunk, self._file_crc_so_far)
+        if not last:
+            return True
+
+        length = total - CHUNK_HEADER_SIZE
+        if self._chunk_crc_so_far == self._chunk_crc:
+            self.offset += length
+            self._file_crc = self._file_crc_so_far
+            self.received += length
+        else:
+            # Written, but it gets written over when it comes again.
+            self.bad_chunks += 1
+        self._chunk_offset = None
+        self._not_before = ticks_add(ticks_ms(), length * 1000 // self.max_rate)
+        self._answer = True
+        return True
+
+    def poll(self):
+        """Call once per main loop pass: answers the sender, and does one step of
+        whatever else an upload needs (hashing a resumed file, finishing it)."""
+        if self._file is None:
+            return
+        now = ticks_ms()
+        if self._hash_pos is not None:
+            self._hash_step()
+            return
+        if self._answer and ticks_diff(now, self._not_before) >= 0:
+            self._answer = False
+            if self.offset >= self.size:
+                self._finish()
+            else:
+                self._status(READY)
+            return
+        if ticks_diff(now, self._last_activity) > self.idle_timeout_ms:
+            self.logger.info("%s idle, putting it aside at %d", self.name, self.offset)
+            self._put_aside()
+
+    def _hash_step(self):
+        start = ticks_ms()
+        self._file.seek(self._hash_pos)
+        count = 1
+        while count and self._hash_pos < self._hash_end and ticks_diff(ticks_ms(), start) < HASH_MS:
+            view = memoryview(self.buffer)[: min(len(self.buffer), self._hash_end - self._hash_pos)]
+            count = self._file.readinto(view)
+            self._file_crc = crc32(view[:count], self._file_crc)
+            self._hash_pos += count
+        if not count or self._hash_pos >= self._hash_end:
+            self.offset = self._hash_pos
+            self._hash_pos = None
+            self._last_activity = ticks_ms()
+            self._answer = True
+
+    def _finish(self):
+        name = self.name
+        temp = self._temp(name)
+        self._file.close()
+        self._file = None
+        if self._file_crc != self.crc:
+            self._discard(name)
+            self._fail(name, "file CRC mismatch")
+            return
+        try:
+            with open(temp, "rb") as file:
+                read_header(file)
+        except (OSError, ValueError) as e:
+            self._discard(name)
+            self._fail(name, f"not a BMP: {e}")
+            return
+        path = f"{self.directory}/{name}.bmp"
+        if self._release:
+            self._release(path)
+        try:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            os.rename(temp, path)
+            os.remove(self._meta(name))
+        except OSError as e:
+            self._fail(name, f"can't install {path}: {e}")
+            return
+        self.done += 1
+        self.name = None
+        self._status(DONE, name)
+        if self._installed:
+            self._installed(path)
+
+    def _put_aside(self):
+        """Stop the current upload, keeping its temp file to resume later."""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                # Can't flush (drive full): what was written before is kept.
+                pass
+            self._file = None
+            if self._hash_pos is None:
+                try:
+                    with open(self._meta(self.name), "w") as meta:
+                        json.dump({"size": self.size, "crc": self.crc, "offset": self.offset}, meta)
+                except OSError:
+                    pass
+        self._hash_pos = None
+        self._chunk_offset = None
+        self._answer = False
+        self.name = None
+
+    def _discard(self, name):
+        for path in (self._temp(name), self._meta(name)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _fail(self, name, error):
+        self.logger.warning("%s: %s", name, error)
+        self.failed += 1
+        self._put_aside()
+        self._publish({"name": name, "state": FAILED, "error": error})
+
+    def _status(self, state, name=None):
+        self._publish(
+            {"name": name or self.name, "state": state, "offset": self.offset, "size": self.size}
+        )
+
+    def stats(self):
+        """For the status payload."""
+        return {
+            "uploading": self.name,
+            "offset": self.offset if self.name else None,
+            "started": self.started,
+            "resumed": self.resumed,
+            "done": self.done,
+            "failed": self.failed,
+            "bad_chunks": self.bad_chunks,
+            "bytes": self.received,
+        }
@@ -0,0 +1,143 @@
+"""
+`buffered_socket`
+================================================================================
+
+Read-ahead buffering for pool sockets.
+
+Every ``recv_into()`` on an esp32spi socket goes over SPI to the ESP32 (asks how
+much has arrived, then reads it, which allocates what it read), and MiniMQTT
+reads a packet a piece at a time: the first byte, the remaining length a byte at
+a time, the topic length, the topic, the packet id, the payload. A
+`BufferedSocket` reads whatever has arrived, up to its buffer size, in one call
+and hands the pieces out from memory. A read at least as big as the buffer, with
+nothing buffered, goes straight into the caller's buffer, so streamed payloads
+aren't copied twice.
+
+`BufferedSocket.available` tells how many bytes can be read without waiting, so
+a caller can find out there is nothing there without sitting through a socket
+timeout (and the exception at the end of it).
+
+Works with any socket pool whose sockets have ``recv_into()``: give a
+`BufferedSocketPool` wrapping it to the connection manager or MiniMQTT in its
+place.
+"""
+
+import errno
+
+
+class BufferedSocket:
+    """A pool socket read through a read-ahead buffer. Everything but reading is
+    passed through to the socket.
+
+    :param sock: The socket, unconnected or connected.
+    :param int size: Size of the read-ahead buffer, in bytes.
+    """
+
+    def __init__(self, sock, size=256):
+        self._sock = sock
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        # Bytes _start up to _end of the buffer are read ahead, not handed out yet.
+        self._start = 0
+        self._end = 0
+        # The timeout available() puts back after reading ahead without waiting:
+        # the socket's own (esp32spi keeps it in _timeout) until settimeout().
+        gettimeout = getattr(sock, "gettimeout", None)
+        self._timeout = gettimeout() if gettimeout else getattr(sock, "_timeout", None)
+        # esp32spi sockets have a (private) _available(); with neither that nor
+        # an available(), available() reads ahead without waiting instead.
+        self._sock_available = getattr(sock, "available", None) or getattr(
+            sock, "_available", None
+        )
+        self.reads = 0
+        self.socket_reads = 0
+
+    def recv_into(self, buffer, nbytes=0):
+        """Read up to ``nbytes`` (or ``len(buffer)``) bytes into ``buffer``, from
+        what was read ahead if there is any, else waiting for the socket like its
+        own ``recv_into()`` does.
+
+        :return: The number of bytes read.
+        """
+        nbytes = nbytes or len(buffer)
+        if not nbytes:
+            return 0
+        self.reads += 1
+        count = self._end - self._start
+        if not count:
+            if nbytes >= len(self._buffer):
+                self.socket_reads += 1
+                return self._sock.recv_into(buffer, nbytes)
+            count = self._fill()
+            if not count:
+                return 0
+        start = self._start
+        if count > nbytes:
+            count = nbytes
+        if count == 1:
+            buffer[0] = self._buffer[start]
+        else:
+            buffer[:count] = self._view[start : start + count]
+        self._start = start + count
+        return count
+
+    def _fill(self):
+        """Read what the socket has, up to a buffer full. Raises what its
+        ``recv_into()`` raises when nothing comes in time."""
+        self.socket_reads += 1
+        self._start = 0
+        self._end = 0
+        self._end = self._sock.recv_into(self._buffer, len(self._buffer))
+        return self._end
+
+    def available(self):
+        """The number of bytes that can be read now, without waiting: what was
+        read ahead, else what the socket says it has (its ``available()`` or
+        ``_available()``). A socket with neither is read ahead from with a 0
+        timeout, and then gets its timeout back: the last one set, or the one it
+        had when it was wrapped."""
+        count = self._end - self._start
+        if count:
+            return count
+        if self._sock_available is not None:
+            return self._sock_available()
+        self._sock.settimeout(0)
+        try:
+            return self._fill()
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.ETIMEDOUT):
+                return 0
+            raise
+        finally:
+            self._sock.settimeout(self._timeout)
+
+    def settimeout(self, timeout):
+        self._timeout = timeout
+        self._sock.settimeout(timeout)
+
+    def close(self):
+        self._start = self._end = 0
+        self._sock.close()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class BufferedSocketPool:
+    """A socket pool whose sockets are `BufferedSocket` s; everything else is the
+    pool's.
+
+    :param pool: The socket pool, e.g. from
+                 ``adafruit_connection_manager.get_radio_socketpool()``.
+    :param int size: Read-ahead buffer size for each socket, in bytes.
+    """
+
+    def __init__(self, pool, size=256):
+        self._pool = pool
+        self.size = size
+
+    def socket(self, *args, **kwargs):
+        return BufferedSocket(self._pool.socket(*args, **kwargs), self.size)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
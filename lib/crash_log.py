@@ -0,0 +1,214 @@
+"""
+`crash_log`
+================================================================================
+
+What the clock was doing before it reset, kept in ``microcontroller.nvm`` and
+reported on the next boot.
+
+The main loop records into buffers allocated up front, without allocating: how
+long each of the last ``passes`` main loop passes took, the last ``topics`` MQTT
+topics handled (as indexes into the list given at the start) and the free heap,
+last and lowest. `save` writes all that to NVM as one record, with why it was
+written: right before the clock resets itself, and as checkpoints while it runs,
+since a watchdog reset gives no warning.
+
+NVM is flash, rated for about 25,000 erase/write cycles on the SAMD51, and each
+write holds up the main loop. So checkpoints come at uptime milestones:
+``checkpoint`` seconds after boot, then twice as long after that each time, up
+to one every ``checkpoint_max`` seconds (a few a day), and only if a topic was
+handled or the lowest free heap went down since the last save. A clock that
+resets early gets a recent record; one that has been up for days gets one up to
+``checkpoint_max`` old (``uptime`` says when it was saved).
+
+Record, little endian: ``KCcl``, version, reason, next pass slot, next topic
+slot, boot count (2 bytes), uptime in seconds, free heap, lowest free heap (4
+bytes each); then ``passes`` pass durations in ms (2 bytes each, oldest at the
+next pass slot), ``topics`` topic indexes (1 byte each, 255 for none); then a
+Fletcher-16 checksum of all that, so a record cut short by a reset reads as none.
+"""
+
+import struct
+from array import array
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+MAGIC = b"KCcl"
+VERSION = 1
+HEADER = "<4sBBBBHIII"
+HEADER_SIZE = struct.calcsize(HEADER)
+NO_TOPIC = 255
+MAX_MS = 65535
+
+# Why a record was written. More reasons can follow these, see CrashLog.
+CHECKPOINT = 0
+
+
+def fletcher16(data, end):
+    """Fletcher-16 of ``data[:end]``, without allocating."""
+    sum1 = sum2 = 0
+    for i in range(end):
+        sum1 = (sum1 + data[i]) % 255
+        sum2 = (sum2 + sum1) % 255
+    return sum2 << 8 | sum1
+
+
+class CrashLog:
+    # pylint: disable=too-many-instance-attributes
+    """The record in RAM, and reading and writing it in NVM.
+
+    :param nvm: ``microcontroller.nvm``, or None to keep it in RAM only.
+    :param topics: The topics `topic` is called with, in a fixed order (at most
+                   255): a topic is recorded as its index.
+    :param reasons: Names of the reasons `save` is called with, by number;
+                    0 is a checkpoint.
+    :param int offset: Where in NVM the record goes.
+    :param int passes: Number of pass durations kept.
+    :param int topics_kept: Number of topics kept.
+    :param int checkpoint: Uptime of the first checkpoint, in seconds, 0 for none.
+                           The time to the next one doubles after each.
+    :param int checkpoint_max: Longest time between two checkpoints, in seconds.
+    """
+
+    def __init__(
+        self,
+        nvm,
+        topics,
+        reasons=("checkpoint",),
+        *,
+        offset=0,
+        passes=32,
+        topics_kept=8,
+        checkpoint=60,
+        checkpoint_max=6 * 3600,
+    ):
+        self._nvm = nvm
+        self._topics = tuple(topics)
+        self._index = {topic: i for i, topic in enumerate(self._topics[:NO_TOPIC])}
+        self.reasons = tuple(reasons)
+        self.offset = offset
+        self._passes = array("H", [0] * passes)
+        self._topics_kept = bytearray(b"\xff" * topics_kept)
+        self._pass_head = 0
+        self._topic_head = 0
+        self.size = HEADER_SIZE + 2 * passes + topics_kept + 2
+        self._image = bytearray(self.size)
+        self.checkpoint_max = checkpoint_max
+        self._checkpoint_every = checkpoint
+        self._next_checkpoint = checkpoint
+        # Seconds since boot, and milliseconds toward the next one: counted from
+        # pass durations, in small ints.
+        self.uptime = 0
+        self._uptime_ms = 0
+        self._last_pass = ticks_ms()
+        # A topic was handled or the lowest free heap went down since the last save.
+        self._changed = True
+        self.boots = 1
+        self.mem_free = 0
+        self.mem_free_min = 0
+        self.saves = 0
+
+    def load(self):
+        """Read the record left in NVM by the last run.
+
+        :return: It as a dict, or None if there is no (whole) record.
+        """
+        if self._nvm is None or len(self._nvm) < self.offset + self.size:
+            return None
+        image = self._image
+        image[:] = self._nvm[self.offset : self.offset + self.size]
+        end = self.size - 2
+        if image[:4] != MAGIC or image[4] != VERSION:
+            return None
+        if fletcher16(image, end) != image[end] | image[end + 1] << 8:
+            return None
+        _, _, reason, pass_head, topic_head, boots, uptime, free, free_min = struct.unpack_from(
+            HEADER, image
+        )
+        self.boots = boots + 1
+        count = len(self._passes)
+        passes = struct.unpack_from("<%dH" % count, image, HEADER_SIZE)
+        kept = image[HEADER_SIZE + 2 * count : end]
+        topics = []
+        for i in range(len(kept)):
+            index = kept[(topic_head + i) % len(kept)]
+            if index != NO_TOPIC:
+                topics.append(self._topics[index] if index < len(self._topics) else index)
+        return {
+            "reason": self.reasons[reason] if reason < len(self.reasons) else reason,
+            "boot": boots,
+            "uptime": uptime,
+            "mem_free": free,
+            "mem_free_min": free_min,
+            "passes_ms": [passes[(pass_head + i) % count] for i in range(count)],
+            "topics": topics,
+        }
+
+    def pass_done(self):
+        """Call once per main loop pass: records how long it took since the last
+        call, and writes a checkpoint when one is due."""
+        now = ticks_ms()
+        duration = ticks_diff(now, self._last_pass)
+        self._last_pass = now
+        self._passes[self._pass_head] = duration if duration < MAX_MS else MAX_MS
+        self._pass_head = (self._pass_head + 1) % len(self._passes)
+        self._uptime_ms += duration
+        if self._uptime_ms >= 1000:
+            self.uptime += self._uptime_ms // 1000
+            self._uptime_ms %= 1000
+        if self._checkpoint_every and self.uptime >= self._next_checkpoint:
+            self._checkpoint_every = min(2 * self._checkpoint_every, self.checkpoint_max)
+            self._next_checkpoint = self.uptime + self._checkpoint_every
+            if self._changed:
+                self.save(CHECKPOINT)
+
+    def topic(self, topic):
+        """Record an MQTT topic being handled."""
+        self._topics_kept[self._topic_head] = self._index.get(topic, NO_TOPIC)
+        self._topic_head = (self._topic_head + 1) % len(self._topics_kept)
+        self._changed = True
+
+    def heap(self, free):
+        """Record the free heap (``gc.mem_free()``)."""
+        self.mem_free = free
+        if not self.mem_free_min or free < self.mem_free_min:
+            self.mem_free_min = free
+            self._changed = True
+
+    def save(self, reason):
+        """Write the record to NVM, saying it was written for ``reason`` (an index
+        into ``reasons``)."""
+        image = self._image
+        struct.pack_into(
+            HEADER,
+            image,
+            0,
+            MAGIC,
+            VERSION,
+            reason,
+            self._pass_head,
+            self._topic_head,
+            self.boots & 0xFFFF,
+            # Including the pass in progress: _reset() saves from a wait.
+            self.uptime + (self._uptime_ms + ticks_diff(ticks_ms(), self._last_pass)) // 1000,
+            self.mem_free,
+            self.mem_free_min,
+        )
+        # A byte at a time: image[start:end] = self._passes only copies between
+        # arrays of the same item size on MicroPython, and packing them all at
+        # once would build a tuple of them.
+        passes = self._passes
+        start = HEADER_SIZE
+        for i in range(len(passes)):
+            value = passes[i]
+            image[start] = value & 0xFF
+            image[start + 1] = value >> 8
+            start += 2
+        end = start + len(self._topics_kept)
+        image[start:end] = self._topics_kept
+        checksum = fletcher16(image, end)
+        image[end] = checksum & 0xFF
+        image[end + 1] = checksum >> 8
+        if self._nvm is not None:
+            self._nvm[self.offset : self.offset + self.size] = image
+        self.saves += 1
+        self._changed = False
@@ -0,0 +1,121 @@
+"""
+`display_profiles`
+================================================================================
+
+Named matrix bit depths, switched at runtime.
+
+The matrix is refreshed from an interrupt, and every bit of color depth adds a
+pass over the whole panel to each refresh: more colors, but a slower refresh and
+less CPU left for everything else. The clock face only needs a few colors, an
+animation wants all of them. Each profile is a bit depth; switching re-creates
+the matrix (see ``MatrixPortal.set_bit_depth``).
+
+How much CPU the refresh takes is measured by counting how far a busy loop gets
+in a few milliseconds, against the same loop with the matrix paused. That stalls
+everything else for as long, so it is done at boot, after a switch (which stalls
+anyway) and when asked for with `sample`, not on a timer.
+"""
+
+import time
+from collections import namedtuple
+
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
+
+DisplayProfile = namedtuple("DisplayProfile", "bit_depth")
+
+# How long a headroom sample spins for.
+SPIN_MS = 20
+
+
+def _spin(duration_ms):
+    """Loop iterations per millisecond over ``duration_ms``."""
+    count = 0
+    end = ticks_add(ticks_ms(), duration_ms)
+    while ticks_diff(end, ticks_ms()) > 0:
+        count += 1
+    return count // duration_ms
+
+
+class DisplayProfiles:
+    """Switch ``matrixportal`` between named profiles and keep metrics per profile.
+
+    :param matrixportal: The ``MatrixPortal`` whose matrix gets re-created.
+    :param dict profiles: Profile name -> `DisplayProfile`.
+    :param str initial: Profile to start in. Its bit depth should be the one the
+                        matrix was created with; if not, it is switched to.
+    """
+
+    def __init__(self, matrixportal, profiles, initial):
+        self._matrixportal = matrixportal
+        self.profiles = profiles
+        self.current = None
+        self.baseline = None
+        self._since = time.monotonic()
+        # name -> [seconds active, switches, failed switches, last switch ms,
+        #          headroom (iterations/ms) of the last sample]
+        self._metrics = {name: [0, 0, 0, 0, None] for name in profiles}
+        self.calibrate()
+        self.select(initial)
+
+    def calibrate(self):
+        """Measure the busy loop with the matrix paused: what 100% headroom is."""
+        matrix = self._matrixportal.matrix
+        paused = matrix.paused
+        matrix.paused = True
+        try:
+            self.baseline = _spin(SPIN_MS)
+        finally:
+            matrix.paused = paused
+
+    def select(self, name):
+        """Switch to profile ``name``. Returns True if the matrix was re-created.
+
+        :raises KeyError: If there is no such profile.
+        """
+        profile = self.profiles[name]
+        if name == self.current:
+            return False
+        now = time.monotonic()
+        if self.current is not None:
+            self._metrics[self.current][0] += now - self._since
+        self._since = now
+
+        metrics = self._metrics[name]
+        start = ticks_ms()
+        changed = self._matrixportal.set_bit_depth(profile.bit_depth)
+        metrics[3] = ticks_diff(ticks_ms(), start)
+        if self._matrixportal.bit_depth != profile.bit_depth:
+            metrics[2] += 1
+            return False
+        self.current = name
+        metrics[1] += 1
+        self.sample()
+        return changed
+
+    def sample(self):
+        """Measure headroom in the current profile. Stalls for ``SPIN_MS``: call
+        it on request, not from anything periodic."""
+        if self.current is not None:
+            self._metrics[self.current][4] = _spin(SPIN_MS)
+
+    def stats(self):
+        """Metrics for the status payload: per profile, its bit depth, seconds
+        spent in it, switches into it, failed switches, how long the last switch
+        took and the share of the CPU the matrix refresh took at the last sample."""
+        now = time.monotonic()
+        value = {"current": self.current}
+        for name, (seconds, switches, failed, switch_ms, headroom) in self._metrics.items():
+            if name == self.current:
+                seconds += now - self._since
+            refresh_pct = None
+            if headroom is not None and self.baseline:
+                refresh_pct = max(0, 100 - headroom * 100 // self.baseline)
+            value[name] = {
+                "bit_depth": self.profiles[name].bit_depth,
+                "secs": int(seconds),
+                "switches": switches,
+                "failed": failed,
+                "switch_ms": switch_ms,
+                "refresh_cpu_pct": refresh_pct,
+            }
+        return value
@@ -0,0 +1,203 @@
+"""
+`flight_log`
+================================================================================
+
+Logging for the clock: levels, lazy formatting, rate limits per message and a
+flight recorder.
+
+A log call passes its format string and arguments separately,
+``log.info("img: %s", message)``: nothing is formatted for a level that is off,
+and a message over its rate limit is only counted. What does get through is
+formatted once, printed if it is at or above ``print_level``, and copied into the
+flight recorder: the last ``size`` lines, in a buffer allocated up front (so
+keeping them doesn't fragment the heap), to be read back over MQTT or before a
+reset when something went wrong.
+
+Levels are the numbers ``logging`` and ``adafruit_logging`` use, and a
+`Logger` has enough of their API (``setLevel()``, ``getEffectiveLevel()``,
+``debug()`` ... ``critical()``) to be MiniMQTT's ``logger``. To take debug lines
+out of a hot path altogether, put them under a ``const()`` flag, which the
+compiler drops along with the whole ``if`` block when it is 0::
+
+    _LOG_DEBUG = const(0)
+    ...
+    if _LOG_DEBUG:
+        log.debug("frame %d", frame)
+
+Library classes take a ``logger``; without one they log through a `PrintLogger`,
+which prints what its level lets through and keeps nothing.
+"""
+
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
+from micropython import const
+
+DEBUG = const(10)
+INFO = const(20)
+WARNING = const(30)
+ERROR = const(40)
+CRITICAL = const(50)
+
+_LETTERS = {DEBUG: "D", INFO: "I", WARNING: "W", ERROR: "E", CRITICAL: "C"}
+
+
+class Logger:
+    """A named logger writing to a `FlightRecorder`. Get one from
+    `FlightRecorder.logger`."""
+
+    def __init__(self, recorder, name, level):
+        self._recorder = recorder
+        self.name = name
+        self._level = level
+
+    def setLevel(self, level):  # pylint: disable=invalid-name
+        self._level = level
+
+    def getEffectiveLevel(self):  # pylint: disable=invalid-name
+        return self._level
+
+    def log(self, level, msg, *args):
+        if level >= self._level:
+            self._recorder.record(self.name, level, msg, args)
+
+    def debug(self, msg, *args):
+        if DEBUG >= self._level:
+            self._recorder.record(self.name, DEBUG, msg, args)
+
+    def info(self, msg, *args):
+        if INFO >= self._level:
+            self._recorder.record(self.name, INFO, msg, args)
+
+    def warning(self, msg, *args):
+        if WARNING >= self._level:
+            self._recorder.record(self.name, WARNING, msg, args)
+
+    def error(self, msg, *args):
+        if ERROR >= self._level:
+            self._recorder.record(self.name, ERROR, msg, args)
+
+    def critical(self, msg, *args):
+        self._recorder.record(self.name, CRITICAL, msg, args)
+
+
+class PrintLogger(Logger):
+    """A `Logger` that only prints, for when there is no `FlightRecorder`."""
+
+    def __init__(self, name, level=INFO):
+        super().__init__(self, name, level)
+
+    def record(self, name, level, msg, args):
+        print(f"{_LETTERS.get(level, level)} {name}: {_format(msg, args)}")
+
+
+def _format(msg, args):
+    if args:
+        try:
+            return msg % args
+        except (TypeError, ValueError):
+            return f"{msg} {args}"
+    return msg
+
+
+class FlightRecorder:
+    # pylint: disable=too-many-instance-attributes
+    """Keeps the last ``size`` log lines, each cut to ``width`` bytes.
+
+    :param int size: Number of lines kept.
+    :param int width: Longest line kept, in bytes (up to 255).
+    :param int print_level: Lines at or above this level are printed too.
+    """
+
+    def __init__(self, size=48, width=96, *, print_level=INFO):
+        self.size = size
+        self.width = min(width, 255)
+        self.print_level = print_level
+        self._lines = bytearray(size * self.width)
+        self._view = memoryview(self._lines)
+        self._lengths = bytearray(size)
+        self._next = 0
+        self._count = 0
+        self._dumping = False
+        # key -> [interval ms, next time allowed, suppressed since]
+        self._limits = {}
+        self.recorded = 0
+        self.suppressed = 0
+
+    def logger(self, name, level=INFO):
+        """A `Logger` called ``name`` that drops what is below ``level``."""
+        return Logger(self, name, level)
+
+    def limit(self, key, seconds):
+        """Let a message through at most once every ``seconds``; the ones in
+        between are counted, and the count shows on the next one let through.
+        ``key`` is the message's format string."""
+        self._limits[key] = [int(seconds * 1000), ticks_ms(), 0]
+
+    def record(self, name, level, msg, args):
+        """Format a log line and keep it (`Logger` calls this for what its level
+        lets through)."""
+        suppressed = 0
+        limit = self._limits.get(msg)
+        if limit is not None:
+            now = ticks_ms()
+            if ticks_diff(now, limit[1]) < 0:
+                limit[2] += 1
+                self.suppressed += 1
+                return
+            limit[1] = ticks_add(now, limit[0])
+            suppressed = limit[2]
+            limit[2] = 0
+        msg = _format(msg, args)
+        if suppressed:
+            msg = f"{msg} ({suppressed} more)"
+        if level >= self.print_level:
+            print(f"{_LETTERS.get(level, level)} {name}: {msg}")
+        if self._dumping:
+            # Logged by the dump itself (publishing it): keep the lines as they are
+            return
+        line = f"{ticks_ms()} {_LETTERS.get(level, level)} {name}: {msg}".encode()
+        length = min(len(line), self.width)
+        while 0 < length < len(line) and line[length] & 0xC0 == 0x80:
+            # Don't cut a character in two
+            length -= 1
+        start = self._next * self.width
+        self._view[start : start + length] = line[:length]
+        self._lengths[self._next] = length
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        self.recorded += 1
+
+    def lines(self):
+        """The lines kept, oldest first, as memoryviews into the recorder: copy
+        one before logging anything else if it has to be kept."""
+        first = (self._next - self._count) % self.size
+        for i in range(self._count):
+            index = (first + i) % self.size
+            start = index * self.width
+            yield self._view[start : start + self._lengths[index]]
+
+    def dump(self, write=None):
+        """Pass every line kept, oldest first, to ``write(line)`` (bytes), or
+        print them; a header line goes first. Returns the number of lines."""
+        header = f"flight recorder at {ticks_ms()}: {self._count} lines".encode()
+        self._dumping = True
+        try:
+            if write is None:
+                print(str(header, "utf-8"))
+            else:
+                write(header)
+            for line in self.lines():
+                if write is None:
+                    print(str(line, "utf-8"))
+                else:
+                    write(bytes(line))
+        finally:
+            self._dumping = False
+        return self._count
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def stats(self):
+        """For the status payload."""
+        return {"recorded": self.recorded, "suppressed": self.suppressed, "kept": self._count}
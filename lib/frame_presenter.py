@@ -0,0 +1,125 @@
+"""
+`frame_presenter`
+================================================================================
+
+One display refresh per main loop pass, paced while something moves.
+
+With ``auto_refresh`` on, displayio refreshes the matrix on its own schedule,
+so an animation frame or a scroll step can land while a refresh is halfway
+through, and text changed by an MQTT handler shows up whenever the next
+refresh happens to run. This turns ``auto_refresh`` off: everything changed
+during a loop pass goes out together in the one ``display.refresh()`` at the
+end of it. While an animation or a scroll is running that refresh is paced to
+a fixed frame rate (``target_frames_per_second``), so frames are evenly spaced
+no matter how long the rest of the pass took, and a pass that ran past its
+frame counts as a dropped frame.
+"""
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+
+class FramePresenter:
+    # pylint: disable=too-many-instance-attributes
+    """Refresh ``matrixportal.display`` by hand.
+
+    :param matrixportal: The ``MatrixPortal`` to refresh. Its display is looked up
+                         on every call, since a bit depth change re-creates it.
+    :param int fps: Frame rate while something moves. A loop pass has to fit in a
+                    frame, MQTT polling included, or the frame is dropped.
+    :param int minimum_fps: Passed on to ``refresh()``, which raises ``RuntimeError``
+                            when frames are further apart. That frame is counted in
+                            ``below_minimum`` (and as dropped) and then shown anyway.
+                            0 never raises.
+    """
+
+    def __init__(self, matrixportal, *, fps=10, minimum_fps=0):
+        self._matrixportal = matrixportal
+        self.fps = fps
+        self.minimum_fps = minimum_fps
+        matrixportal.display.auto_refresh = False
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+        self.below_minimum = 0
+        self.refresh_ms = 0
+        self.max_refresh_ms = 0
+        self._last_frame_ms = None
+        self.window_max_frame_ms = 0
+
+    def present(self, moving):
+        """Show what changed during this loop pass. Call once at the end of every pass.
+
+        :param bool moving: True while an animation or a scroll is running: wait
+                            for the next frame boundary to refresh.
+        """
+        display = self._matrixportal.display
+        start = ticks_ms()
+        if not moving:
+            self._last_frame_ms = None
+            display.refresh()
+            self._timed(start)
+            return
+
+        # The first paced frame after a still stretch has nothing to be late for
+        minimum_fps = 0 if self._last_frame_ms is None else self.minimum_fps
+        if not self._paced_refresh(display, minimum_fps):
+            # This pass started more than a frame after the last one. Asking again
+            # right away waits for the next frame boundary and puts the next pass
+            # back in step, instead of skipping every other frame from now on.
+            self.late += 1
+            self._paced_refresh(display, 0)
+        now = ticks_ms()
+        if self._last_frame_ms is not None:
+            gap_ms = ticks_diff(now, self._last_frame_ms)
+            self.window_max_frame_ms = max(self.window_max_frame_ms, gap_ms)
+            # Frame slots that went by without a refresh
+            self.dropped += max(0, (gap_ms * self.fps + 500) // 1000 - 1)
+        self._last_frame_ms = now
+        self.frames += 1
+
+    def _paced_refresh(self, display, minimum_fps):
+        try:
+            return display.refresh(
+                target_frames_per_second=self.fps, minimum_frames_per_second=minimum_fps
+            )
+        except RuntimeError:
+            # Frames fell below minimum_fps and nothing was shown. The slots that
+            # went by are counted as dropped from the gap; show this one anyway.
+            self.below_minimum += 1
+            return display.refresh(target_frames_per_second=self.fps)
+
+    def until_next_frame(self):
+        """Seconds until the next paced frame is due: 0 if it already is, or
+        if there hasn't been one yet."""
+        if self._last_frame_ms is None:
+            return 0
+        due_ms = 1000 // self.fps - ticks_diff(ticks_ms(), self._last_frame_ms)
+        return max(0, due_ms) / 1000
+
+    def restart(self):
+        """Forget when the last paced frame was, after a stretch without
+        refreshes on purpose (e.g. the screen was off), so it isn't counted
+        as dropped frames."""
+        self._last_frame_ms = None
+
+    def _timed(self, start):
+        self.refresh_ms = ticks_diff(ticks_ms(), start)
+        self.max_refresh_ms = max(self.max_refresh_ms, self.refresh_ms)
+
+    def stats(self):
+        """Metrics for the status payload: paced frames shown and dropped, passes
+        that came in late or below ``minimum_fps``, how long an unpaced refresh
+        took and the longest gap between two paced frames since the last call,
+        which starts a new window."""
+        value = {
+            "fps": self.fps,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "late": self.late,
+            "below_minimum": self.below_minimum,
+            "refresh_ms": self.refresh_ms,
+            "max_refresh_ms": self.max_refresh_ms,
+            "window_max_frame_ms": self.window_max_frame_ms,
+        }
+        self.window_max_frame_ms = 0
+        return value
@@ -0,0 +1,89 @@
+"""
+`gc_policy`
+================================================================================
+
+Run garbage collections when the clock is idle instead of whenever the
+allocator runs out of room.
+
+A collection walks the whole heap, which on the MatrixPortal M4 takes long
+enough to show up as a hitch when it lands in the middle of a scroll or an
+animation frame. This turns off threshold-triggered collections (where the
+port supports ``gc.threshold``) and collects from the main loop's idle gaps
+instead, or right away if free memory drops below a watermark. The allocator
+still collects on its own as a last resort when an allocation fails.
+"""
+
+import gc
+import time
+
+
+class GCPolicy:
+    # pylint: disable=too-many-instance-attributes
+    """Decide when to call ``gc.collect()`` and keep track of how long it took.
+
+    :param int watermark: Collect as soon as ``gc.mem_free()`` drops below this many bytes,
+                          idle or not.
+    :param float idle_interval: Minimum seconds between two idle-gap collections.
+    :param float check_interval: Minimum seconds between two ``gc.mem_free()`` watermark checks.
+    """
+
+    def __init__(self, *, watermark=16 * 1024, idle_interval=10, check_interval=1):
+        self.watermark = watermark
+        self.idle_interval = idle_interval
+        self.check_interval = check_interval
+
+        self.auto_disabled = False
+        if hasattr(gc, "threshold"):
+            gc.threshold(-1)
+            self.auto_disabled = True
+
+        self.count = 0
+        self.low_mem_count = 0
+        self.last_pause_ms = 0
+        self.max_pause_ms = 0
+        self.window_max_pause_ms = 0
+        self._last_collect = time.monotonic()
+        self._last_check = self._last_collect
+
+    def poll(self, idle):
+        """Call once per main loop pass.
+
+        :param bool idle: True if nothing is being drawn right now (no message
+                          came in, nothing scrolling, no animation), so a pause
+                          will not be noticed.
+        """
+        now = time.monotonic()
+        if idle and now - self._last_collect >= self.idle_interval:
+            self.collect()
+            return
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if gc.mem_free() < self.watermark:
+                self.low_mem_count += 1
+                self.collect()
+
+    def collect(self):
+        """Collect now and record the pause."""
+        start = time.monotonic_ns()
+        gc.collect()
+        pause_ms = (time.monotonic_ns() - start) // 1000000
+        self._last_collect = time.monotonic()
+        self._last_check = self._last_collect
+        self.count += 1
+        self.last_pause_ms = pause_ms
+        self.max_pause_ms = max(self.max_pause_ms, pause_ms)
+        self.window_max_pause_ms = max(self.window_max_pause_ms, pause_ms)
+
+    def stats(self):
+        """Metrics for the status payload. Starts a new window for the worst-case
+        pause seen between two calls."""
+        value = {
+            "count": self.count,
+            "low_mem": self.low_mem_count,
+            "auto_disabled": self.auto_disabled,
+            "last_pause_ms": self.last_pause_ms,
+            "max_pause_ms": self.max_pause_ms,
+            "window_max_pause_ms": self.window_max_pause_ms,
+        }
+        self.window_max_pause_ms = 0
+        return value
@@ -0,0 +1,95 @@
+"""
+`message_queue`
+================================================================================
+
+Bounded queue of ``/msg`` messages waiting for their turn on the display.
+
+A burst of messages used to relayout the text label once per message and only
+ever show the last one. Messages now wait here, highest priority first, and a
+message that is already queued is updated in place instead of being queued
+twice. All MessageState objects come from a fixed pool allocated up front.
+"""
+
+from message_state import MessageState
+
+QUEUED = 0
+COALESCED = 1
+DROPPED = 2
+
+
+class MessageQueue:
+    """Pending messages, highest ``priority`` first and in arrival order within
+    the same priority.
+
+    :param int size: Most messages kept waiting. When full, the lowest priority
+                     message is dropped to make room, or the new message itself
+                     if nothing queued has a lower priority.
+    :param logger: Where bad values in payloads are logged (`flight_log.Logger`).
+    """
+
+    def __init__(self, size=4, logger=None):
+        self.size = size
+        self.logger = logger
+        self._pending = []
+        # One more than size: the extra one holds an incoming message while
+        # it's parsed, before we know where it goes.
+        self._free = [MessageState() for _ in range(size + 1)]
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def parse(self, payload):
+        """Parse a payload into a MessageState from the pool. Hand it back with
+        `push` or `release`."""
+        state = self._free.pop()
+        state.parse(payload, logger=self.logger)
+        return state
+
+    def release(self, state):
+        """Return a MessageState to the pool."""
+        state.reset()
+        self._free.append(state)
+
+    def push(self, state):
+        """Queue a parsed message. Returns QUEUED, COALESCED or DROPPED."""
+        for i, queued in enumerate(self._pending):
+            if queued.msg != state.msg:
+                continue
+            if queued.priority == state.priority:
+                queued.copy_from(state)
+                self.release(state)
+                return COALESCED
+            # Priority changed: take the newer one, at its new place.
+            self.release(self._pending.pop(i))
+            self._insert(state)
+            return COALESCED
+
+        result = QUEUED
+        if len(self._pending) >= self.size:
+            lowest = self._pending[-1]
+            if state.priority <= lowest.priority:
+                self.release(state)
+                return DROPPED
+            self.release(self._pending.pop())
+            result = DROPPED
+        self._insert(state)
+        return result
+
+    def pop(self):
+        """Next message to show. Hand it back with `release` once copied out."""
+        return self._pending.pop(0)
+
+    def clear(self):
+        """Drop everything pending."""
+        while self._pending:
+            self.release(self._pending.pop())
+
+    def _insert(self, state):
+        for i, queued in enumerate(self._pending):
+            if queued.priority < state.priority:
+                self._pending.insert(i, state)
+                return
+        self._pending.append(state)
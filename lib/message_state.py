@@ -0,0 +1,386 @@
+"""
+`message_state`
+================================================================================
+
+State of the message shown on the bottom line, filled in place from a ``/msg``
+payload.
+
+``json.loads`` builds a brand new dict (plus a string for every key and value)
+for each message, and the handler then normalized it with more string
+conversions. The parser here walks the payload once, picks out only the keys the
+clock knows about and converts their values straight from the payload, so the
+only thing allocated per message is the text itself.
+"""
+
+import json
+from array import array
+
+from flight_log import PrintLogger
+
+DEFAULT_TIMEOUT = 20
+
+_WHITESPACE = " \t\r\n"
+
+_print_logger = PrintLogger("msg")
+
+
+class MessageState:
+    """The message currently displayed, if any. Falsy when there is no message."""
+
+    __slots__ = ("msg", "timeout", "text_color", "scrolling", "x", "center", "priority")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drop the current message."""
+        self.msg = None
+        self.timeout = None
+        self.text_color = None
+        self.scrolling = True
+        self.x = None
+        self.center = False
+        self.priority = 0
+
+    def __bool__(self):
+        return bool(self.msg)
+
+    def copy_from(self, other):
+        """Take over all fields of another MessageState."""
+        self.msg = other.msg
+        self.timeout = other.timeout
+        self.text_color = other.text_color
+        self.scrolling = other.scrolling
+        self.x = other.x
+        self.center = other.center
+        self.priority = other.priority
+
+    def parse(self, payload, default_timeout=DEFAULT_TIMEOUT, logger=None):
+        """Reset and fill in from a ``/msg`` payload.
+
+        A JSON object may carry ``msg``, ``timeout``, ``text_color`` (or ``color``),
+        ``no_scroll``, ``x`` and ``priority``; any other key is skipped. Anything that is not a
+        JSON object, trailing text after one included, is shown as plain text for
+        ``default_timeout`` seconds.
+
+        Values are converted the way ``json.loads`` and ``int()`` would: a later
+        duplicate key wins, ``color`` is only used when ``text_color`` is missing or
+        falsy, and a bad value is logged and left unset. The differences: objects
+        and arrays are skipped over without being checked, ``NaN`` and ``Infinity``
+        are not accepted, a number for ``msg`` is shown as written and a fractional
+        number for ``text_color`` is truncated.
+
+        :param str payload: The MQTT payload.
+        :param int default_timeout: Timeout, in seconds, for plain text payloads.
+        :param logger: Where bad values are logged (`flight_log.Logger`). By
+                       default they are printed.
+        """
+        self.reset()
+        start = _skip_ws(payload, 0)
+        if start < len(payload) and payload[start] == "{":
+            try:
+                end = _scan_object(payload, start)
+            except (ValueError, IndexError):
+                end = -1
+            if end >= 0 and _skip_ws(payload, end + 1) == len(payload):
+                self._convert(payload, logger or _print_logger)
+                return
+        self.msg = payload
+        self.timeout = default_timeout
+
+    # pylint: disable=too-many-branches
+    def _convert(self, payload, logger):
+        """Fill in from the spans ``_scan_object`` recorded."""
+        if _found(_MSG):
+            start, end, quoted, escaped = _span(_MSG)
+            if escaped:
+                self.msg = json.loads(payload[start - 1 : end + 1])
+            elif quoted or _span_truthy(payload, start, end, quoted):
+                self.msg = payload[start:end]
+
+        if _found(_TIMEOUT):
+            start, end, quoted, _ = _span(_TIMEOUT)
+            if quoted or not _span_is(payload, start, end, "null"):
+                try:
+                    self.timeout = _span_int_value(payload, start, end, quoted)
+                except ValueError as e:
+                    logger.warning("bad timeout %r: %s", payload[start:end], e)
+
+        # A bad color keeps whatever color is already set rather than failing
+        # the whole message.
+        key = _TEXT_COLOR
+        if not _found(key) or not _span_truthy(payload, *_span(key)[:3]):
+            key = _COLOR
+        if _found(key):
+            start, end, quoted, _ = _span(key)
+            if _span_truthy(payload, start, end, quoted):
+                try:
+                    self.text_color = _span_color(payload, start, end, quoted)
+                except ValueError as e:
+                    logger.warning("bad text_color %r: %s", payload[start:end], e)
+
+        if _found(_NO_SCROLL):
+            start, end, quoted, _ = _span(_NO_SCROLL)
+            self.scrolling = not _span_is(payload, start, end, "true", True)
+
+        if _found(_X):
+            start, end, quoted, _ = _span(_X)
+            if _span_is(payload, start, end, "center", True):
+                self.center = True
+            elif quoted or not _span_is(payload, start, end, "null"):
+                try:
+                    self.x = _span_int_value(payload, start, end, quoted)
+                except ValueError as e:
+                    logger.warning("bad x %r: %s", payload[start:end], e)
+
+        if _found(_PRIORITY):
+            start, end, quoted, _ = _span(_PRIORITY)
+            if quoted or not _span_is(payload, start, end, "null"):
+                try:
+                    self.priority = _span_int_value(payload, start, end, quoted)
+                except ValueError as e:
+                    logger.warning("bad priority %r: %s", payload[start:end], e)
+
+
+# The keys MessageState picks out, and for each the value span of its last
+# occurrence in the payload being parsed: start, end and flags, start -1 if the
+# key isn't there.
+_KEYS = ("msg", "timeout", "text_color", "color", "no_scroll", "x", "priority")
+_MSG = 0
+_TIMEOUT = 1
+_TEXT_COLOR = 2
+_COLOR = 3
+_NO_SCROLL = 4
+_X = 5
+_PRIORITY = 6
+_QUOTED = 1
+_ESCAPED = 2
+_spans = array("i", [-1] * 3 * len(_KEYS))
+
+
+def _found(key):
+    return _spans[3 * key] >= 0
+
+
+def _span(key):
+    flags = _spans[3 * key + 2]
+    return _spans[3 * key], _spans[3 * key + 1], bool(flags & _QUOTED), bool(flags & _ESCAPED)
+
+
+def _scan_object(payload, pos):
+    """Check the JSON object starting at pos and record the value spans of the
+    keys in ``_KEYS``. Returns the index of its closing brace."""
+    for key in range(len(_KEYS)):
+        _spans[3 * key] = -1
+    pos = _skip_ws(payload, pos + 1)
+    if payload[pos] == "}":
+        return pos
+    while True:
+        if payload[pos] != '"':
+            raise ValueError("expected key")
+        key_start = pos + 1
+        key_end, _ = _string_end(payload, key_start)
+        pos = _skip_ws(payload, key_end + 1)
+        if payload[pos] != ":":
+            raise ValueError("expected ':'")
+        pos = _skip_ws(payload, pos + 1)
+        value_start, value_end, quoted, escaped = _value_span(payload, pos)
+        pos = _skip_ws(payload, value_end + 1 if quoted else value_end)
+
+        for key in range(len(_KEYS)):
+            if _span_is(payload, key_start, key_end, _KEYS[key]):
+                _spans[3 * key] = value_start
+                _spans[3 * key + 1] = value_end
+                _spans[3 * key + 2] = (_QUOTED if quoted else 0) | (_ESCAPED if escaped else 0)
+                break
+
+        if payload[pos] == "}":
+            return pos
+        if payload[pos] != ",":
+            raise ValueError("expected ',' or '}'")
+        pos = _skip_ws(payload, pos + 1)
+
+
+def _skip_ws(payload, pos):
+    while pos < len(payload) and payload[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _string_end(payload, pos):
+    """Index of the closing quote of the string starting at pos, and whether it
+    has escapes in it."""
+    escaped = False
+    while payload[pos] != '"':
+        if payload[pos] == "\\":
+            escaped = True
+            pos += 1
+        pos += 1
+    return pos, escaped
+
+
+def _value_span(payload, pos):
+    """(start, end, quoted, escaped) of the value at pos. For quoted strings the
+    span excludes the quotes and end is the closing quote. Objects and arrays
+    are skipped over whole."""
+    char = payload[pos]
+    if char == '"':
+        end, escaped = _string_end(payload, pos + 1)
+        return pos + 1, end, True, escaped
+    if char in "{[":
+        depth = 0
+        end = pos
+        while True:
+            char = payload[end]
+            if char == '"':
+                end, _ = _string_end(payload, end + 1)
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if not depth:
+                    return pos, end + 1, False, False
+            end += 1
+    end = pos
+    while payload[end] not in ",}" and payload[end] not in _WHITESPACE:
+        end += 1
+    _check_literal(payload, pos, end)
+    return pos, end, False, False
+
+
+def _digits_end(payload, pos, end):
+    while pos < end and "0" <= payload[pos] <= "9":
+        pos += 1
+    return pos
+
+
+def _check_literal(payload, start, end):
+    """Raise ValueError unless payload[start:end] is a JSON number, true, false
+    or null."""
+    if (
+        _span_is(payload, start, end, "true")
+        or _span_is(payload, start, end, "false")
+        or _span_is(payload, start, end, "null")
+    ):
+        return
+    pos = start
+    if pos < end and payload[pos] == "-":
+        pos += 1
+    digits = _digits_end(payload, pos, end)
+    if digits == pos or (payload[pos] == "0" and digits > pos + 1):
+        raise ValueError("expected value")
+    pos = digits
+    if pos < end and payload[pos] == ".":
+        digits = _digits_end(payload, pos + 1, end)
+        if digits == pos + 1:
+            raise ValueError("expected digits after '.'")
+        pos = digits
+    if pos < end and payload[pos] in "eE":
+        pos += 1
+        if pos < end and payload[pos] in "+-":
+            pos += 1
+        digits = _digits_end(payload, pos, end)
+        if digits == pos:
+            raise ValueError("expected exponent")
+        pos = digits
+    if pos != end:
+        raise ValueError("expected value")
+
+
+def _span_is(payload, start, end, word, fold=False):
+    """Compare payload[start:end] with a lowercase word without slicing;
+    case-insensitive with ``fold``, like ``str(value).lower() == word``."""
+    if end - start != len(word):
+        return False
+    for i in range(len(word)):
+        code = ord(payload[start + i])
+        if fold and 0x41 <= code <= 0x5A:  # A-Z
+            code |= 0x20
+        if code != ord(word[i]):
+            return False
+    return True
+
+
+def _span_truthy(payload, start, end, quoted):
+    """bool() of the JSON value at payload[start:end], without decoding it."""
+    if quoted:
+        return end > start
+    if payload[start] in "{[":
+        return _skip_ws(payload, start + 1) < end - 1
+    if _span_is(payload, start, end, "null") or _span_is(payload, start, end, "false"):
+        return False
+    # A number: nonzero if any digit of the mantissa is
+    for pos in range(start, end):
+        if payload[pos] in "eE":
+            break
+        if "1" <= payload[pos] <= "9":
+            return True
+    return _span_is(payload, start, end, "true")
+
+
+def _digit(char, base):
+    code = ord(char)
+    if 0x30 <= code <= 0x39:
+        return code - 0x30
+    code |= 0x20
+    if base == 16 and 0x61 <= code <= 0x66:
+        return code - 0x61 + 10
+    return -1
+
+
+def _span_int(payload, start, end, base):
+    """int() of the string payload[start:end] without slicing. Takes surrounding
+    whitespace, an optional sign and, for base 16, an optional 0x prefix."""
+    start = _skip_ws(payload, start)
+    while end > start and payload[end - 1] in _WHITESPACE:
+        end -= 1
+    pos = start
+    sign = 1
+    if pos < end and payload[pos] in "+-":
+        sign = -1 if payload[pos] == "-" else 1
+        pos += 1
+    if base == 16 and end - pos > 2 and payload[pos] == "0" and payload[pos + 1] in "xX":
+        pos += 2
+    value = 0
+    first = pos
+    while pos < end:
+        digit = _digit(payload[pos], base)
+        if digit < 0:
+            raise ValueError(f"invalid literal for int() with base {base}")
+        value = value * base + digit
+        pos += 1
+    if pos == first:
+        raise ValueError(f"invalid literal for int() with base {base}")
+    return sign * value
+
+
+def _span_int_value(payload, start, end, quoted):
+    """int() of the JSON value at payload[start:end]: a string is parsed as a
+    decimal integer, a fractional number is truncated."""
+    if quoted:
+        return _span_int(payload, start, end, 10)
+    if _span_is(payload, start, end, "true") or _span_is(payload, start, end, "false"):
+        return int(payload[start] == "t")
+    if payload[start] in "{[n":
+        raise ValueError("not a number")
+    try:
+        return _span_int(payload, start, end, 10)
+    except ValueError:
+        pass
+    # Fraction or exponent: rare enough to pay for the slice
+    try:
+        return int(float(payload[start:end]))
+    except OverflowError as e:
+        raise ValueError(str(e)) from e
+
+
+def _span_color(payload, start, end, quoted):
+    """Color value like ``html_color_convert()``: a JSON number, or a hex string
+    with '#' stripped from either end."""
+    if not quoted:
+        return _span_int_value(payload, start, end, quoted)
+    while start < end and payload[start] == "#":
+        start += 1
+    while end > start and payload[end - 1] == "#":
+        end -= 1
+    return _span_int(payload, start, end, 16)
@@ -38,6 +38,7 @@ import displayio
 from adafruit_display_text.label import Label
 import rgbmatrix
 import framebufferio
+from flight_log import PrintLogger
 
 try:
     from secrets import secrets
@@ -75,25 +76,29 @@ class MatrixPortal:
         esp=None,
         external_spi=None,
         bit_depth=4,
-        debug=False
+        width=64,
+        height=32,
+        tile=1,
+        serpentine=True,
+        debug=False,
+        logger=None
     ):
+        """
+        :param int width: Overall width of the chained panels, in pixels.
+        :param int height: Overall height of the chained panels, in pixels.
+        :param int tile: Number of rows of panels. Each row is ``height // tile`` pixels high.
+        :param bool serpentine: Whether every other row of panels is mounted upside down,
+                                as when the chain snakes back and forth.
+        :param logger: Where `set_bit_depth` logs (`flight_log.Logger`). By default it prints.
+        """
 
         self._debug = debug
+        self.logger = logger or PrintLogger("matrix")
+        self._geometry = (width, height, tile, serpentine)
+        self.bit_depth = bit_depth
 
         try:
-            displayio.release_displays()
-            matrix = rgbmatrix.RGBMatrix(
-                width=64,
-                height=32,
-                bit_depth=bit_depth,
-                rgb_pins=[board.MTX_R1, board.MTX_G1, board.MTX_B1, board.MTX_R2, board.MTX_G2,
-                          board.MTX_B2],
-                addr_pins=[board.MTX_ADDRA, board.MTX_ADDRB, board.MTX_ADDRC, board.MTX_ADDRD],
-                clock_pin=board.MTX_CLK,
-                latch_pin=board.MTX_LAT,
-                output_enable_pin=board.MTX_OE,
-            )
-            self.display = framebufferio.FramebufferDisplay(matrix)
+            self._init_matrix(bit_depth)
         except ValueError:
             raise RuntimeError("Failed to initialize RGB Matrix")
 
@@ -145,12 +150,96 @@ class MatrixPortal:
         self._text_transform = []
         self._text_scrolling = []
         self._scrolling_index = None
+        # Called with the label index every time a label finishes scrolling
+        # off the display.
+        self.on_scroll_done = None
 
         # Font Cache
         self._fonts = {}
 
         gc.collect()
 
+    def _init_matrix(self, bit_depth):
+        width, height, tile, serpentine = self._geometry
+        addr_pins = [board.MTX_ADDRA, board.MTX_ADDRB, board.MTX_ADDRC, board.MTX_ADDRD]
+        if height // tile > 32:
+            # 64 row panels need the 5th address line
+            addr_pins.append(board.MTX_ADDRE)
+
+        displayio.release_displays()
+        # Give the old matrix's buffers back before asking for the new ones.
+        self.matrix = None
+        self.display = None
+        gc.collect()
+        matrix = rgbmatrix.RGBMatrix(
+            width=width,
+            height=height,
+            tile=tile,
+            serpentine=serpentine,
+            bit_depth=bit_depth,
+            rgb_pins=[board.MTX_R1, board.MTX_G1, board.MTX_B1, board.MTX_R2, board.MTX_G2,
+                      board.MTX_B2],
+            addr_pins=addr_pins,
+            clock_pin=board.MTX_CLK,
+            latch_pin=board.MTX_LAT,
+            output_enable_pin=board.MTX_OE,
+        )
+        self.matrix = matrix
+        self.display = framebufferio.FramebufferDisplay(matrix)
+        self.bit_depth = bit_depth
+
+    def set_bit_depth(self, bit_depth):
+        """Re-create the matrix with a different bit depth. ``rgbmatrix`` can only
+        take it at construction, so this releases the display and builds a new one
+        around the same splash group, keeping brightness and refresh settings.
+
+        :param int bit_depth: Bits per color channel, 1 to 6. Fewer bits mean fewer
+                              colors but a faster refresh that takes less CPU time.
+        :return: True if the bit depth changed. False if it already was ``bit_depth``
+                 or the new matrix could not be allocated (the old depth is kept).
+        :raises MemoryError: If not even the old depth could be re-created: there is
+                             no display left.
+        """
+        if bit_depth == self.bit_depth:
+            return False
+        old_bit_depth = self.bit_depth
+        if bit_depth > old_bit_depth and not self._planes_fit(bit_depth):
+            # The old matrix is still up: better to keep it than to release it and
+            # find there is no room for either.
+            self.logger.warning("no room for bit depth %d, keeping %d", bit_depth, old_bit_depth)
+            return False
+        brightness = self.display.brightness
+        auto_refresh = self.display.auto_refresh
+        paused = self.matrix.paused
+        try:
+            self._init_matrix(bit_depth)
+            changed = True
+        except (MemoryError, ValueError) as e:
+            self.logger.warning("could not switch to bit depth %d: %s", bit_depth, e)
+            try:
+                self._init_matrix(old_bit_depth)
+            except (MemoryError, ValueError) as e:
+                self.logger.critical("no display: bit depth %d is gone too: %s", old_bit_depth, e)
+                raise
+            changed = False
+        self.display.root_group = self.splash
+        self.display.brightness = brightness
+        self.display.auto_refresh = auto_refresh
+        self.matrix.paused = paused
+        return changed
+
+    def _planes_fit(self, bit_depth):
+        """Whether the bit planes of a matrix with ``bit_depth`` could be allocated
+        right now, next to the current matrix: two buffers of ``bit_depth`` planes
+        of a byte per pixel pair."""
+        width, height, _, _ = self._geometry
+        try:
+            probe = bytearray(bit_depth * width * height)
+        except MemoryError:
+            return False
+        del probe
+        return True
+
     def add_text(
         self,
         text_position=None,
@@ -327,10 +416,13 @@ class MatrixPortal:
         self._text[self._scrolling_index].x = self._text[self._scrolling_index].x - 1
         line_width = self._text[self._scrolling_index].bounding_box[2]
         if self._text[self._scrolling_index].x < -line_width:
+            done_index = self._scrolling_index
             # Find the next line
             self._scrolling_index = self._get_next_scrollable_text_index()
             if self._scrolling_index is not None:
                 self._text[self._scrolling_index].x = self.display.width
+            if self.on_scroll_done is not None:
+                self.on_scroll_done(done_index)
 
     def _load_font(self, font):
         """
@@ -0,0 +1,159 @@
+"""
+`mqtt_poller`
+================================================================================
+
+How long to wait for MQTT messages on each main loop pass.
+
+The main loop used to call ``client.loop(timeout=0.1)`` on every pass, with the
+socket timeout at the same 0.1 s, and nap another 0.123 s when nothing came in:
+four or five passes a second whether there was anything to do or not, and a
+message that came in during the nap waited for it to end. This picks the wait
+for each pass from what the clock is doing:
+
+* Frames to show (an animation or a scroll): wait until shortly before the next
+  frame is due, with short socket reads so a message can't push the pass past it.
+* Otherwise: wait until the next timed job is due (the one second tick, usually),
+  up to the keep-alive interval.
+
+A pass that received something returns as soon as the socket goes quiet
+(``until_quiet``): right away if the socket can tell nothing more is there
+(lib/buffered_socket.py), else after one read that comes back empty.
+
+Every read that times out costs an exception and a buffer, so with a socket that
+can tell (``scale_reads``) the whole wait is one read, up to ``longest_read``: a
+message ends the read as it comes in, and the pass as soon as it is handled.
+Otherwise the wait is made of short reads while messages are flowing (one came
+in the last ``busy_hold`` seconds) or a frame is due, so the read that comes
+back empty after them doesn't hold the pass up; longer ones while idle.
+"""
+
+import time
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+MQTT_PUBLISH = 0x30
+
+
+class MQTTPoller:
+    # pylint: disable=too-many-instance-attributes
+    """Runs ``client.loop()`` once per main loop pass.
+
+    :param client: The ``MQTT`` client.
+    :param bool scale_reads: Read for the whole wait, up to ``longest_read``. Only
+                             for a socket with ``available()``.
+    :param float longest_read: Longest socket timeout with ``scale_reads``; less
+                               than the client's ``recv_timeout``.
+    :param float frame_read: Socket timeout while there are frames to show or
+                             messages flowing, in seconds. With ``scale_reads``, the
+                             shortest one.
+    :param float idle_read: Socket timeout while idle. A message that arrives while
+                            idle is handled right away; this is how long the pass
+                            then waits for more before it returns.
+    :param float busy_hold: Seconds after a message during which messages count as
+                            flowing.
+    :param float margin: How much before a frame is due to stop waiting, for the
+                         rest of the pass.
+    :param float maximum: Longest wait. Defaults to the client's keep-alive.
+    :param bool adaptive: False polls like before: 0.1 s waits and reads, and a nap
+                          after passes that received nothing.
+    """
+
+    FIXED_TIMEOUT = 0.1
+    FIXED_NAP = 0.123
+
+    def __init__(
+        self,
+        client,
+        *,
+        scale_reads=False,
+        longest_read=1.0,
+        frame_read=0.02,
+        idle_read=0.1,
+        busy_hold=1.0,
+        margin=0.01,
+        maximum=None,
+        adaptive=True,
+    ):
+        self._client = client
+        self.scale_reads = scale_reads
+        self.longest_read = longest_read
+        self.frame_read = frame_read
+        self.idle_read = idle_read
+        self.busy_hold_ms = int(busy_hold * 1000)
+        self.margin = margin
+        self.maximum = maximum if maximum is not None else client.keep_alive
+        self.adaptive = adaptive
+        self._last_message_ms = None
+        self.timeout = self.FIXED_TIMEOUT
+        self.passes = 0
+        self.frame_passes = 0
+        self.busy_passes = 0
+        self.idle_passes = 0
+        self.max_timeout = 0
+        if not adaptive:
+            client.socket_timeout = self.FIXED_TIMEOUT
+
+    def poll(self, frame_due=None, next_job=None):
+        """Wait for and handle MQTT messages for one pass.
+
+        :param float frame_due: Seconds until the next frame is due, or None when
+                                nothing moves.
+        :param float next_job: Seconds until the next timed job is due, or None.
+        :return: True if anything was received.
+        """
+        client = self._client
+        self.passes += 1
+        if not self.adaptive:
+            received = bool(client.loop(timeout=self.FIXED_TIMEOUT))
+            if not received and frame_due is None:
+                time.sleep(self.FIXED_NAP)
+            return received
+
+        now = ticks_ms()
+        busy = (
+            self._last_message_ms is not None
+            and ticks_diff(now, self._last_message_ms) < self.busy_hold_ms
+        )
+        if frame_due is not None:
+            read = self.frame_read
+            timeout = frame_due - self.margin
+            self.frame_passes += 1
+        else:
+            read = self.frame_read if busy else self.idle_read
+            timeout = self.maximum if next_job is None else next_job
+            if busy:
+                self.busy_passes += 1
+            else:
+                self.idle_passes += 1
+        timeout = min(timeout, self.maximum)
+        if self.scale_reads:
+            read = max(self.frame_read, min(timeout, self.longest_read))
+        elif frame_due is not None:
+            # loop() returns after the read that takes it past its timeout.
+            timeout -= read
+        # loop() takes no timeout shorter than a read.
+        timeout = max(read, timeout)
+        if client.socket_timeout != read:
+            client.socket_timeout = read
+        self.timeout = timeout
+        self.max_timeout = max(self.max_timeout, timeout)
+
+        rcs = client.loop(timeout=timeout, until_quiet=True)
+        if rcs and MQTT_PUBLISH in rcs:
+            # Acks and ping responses don't count: only messages keep reads short.
+            self._last_message_ms = ticks_ms()
+        return bool(rcs)
+
+    def stats(self):
+        """For the status payload: passes by kind, and the longest wait since the
+        last call, which starts a new window."""
+        value = {
+            "adaptive": self.adaptive,
+            "passes": self.passes,
+            "frame": self.frame_passes,
+            "busy": self.busy_passes,
+            "idle": self.idle_passes,
+            "max_timeout": self.max_timeout,
+        }
+        self.max_timeout = 0
+        return value
@@ -0,0 +1,146 @@
+"""
+`numeric_payload`
+================================================================================
+
+Numbers straight from MQTT payload bytes.
+
+The client runs in binary mode, so payloads arrive as a ``bytearray``. Topics
+that only ever carry a number (brightness, a neopixel color, a temperature)
+don't need the ``str`` that decoding them would allocate just to hand it to
+``int()`` or ``float()``: these read the ASCII digits from the bytes directly.
+Surrounding whitespace is ignored; anything else that isn't part of the number
+raises ``ValueError``, like ``int()`` and ``float()`` do. So do two things they
+accept: ``_`` between digits, and ``inf``/``nan`` for `parse_float` (a caller
+that wants those can fall back to decoding the payload and calling ``float()``).
+"""
+
+
+def _is_space(char):
+    return char == 0x20 or 0x09 <= char <= 0x0D
+
+
+def _start(payload):
+    start = 0
+    while start < len(payload) and _is_space(payload[start]):
+        start += 1
+    return start
+
+
+def _end(payload, start):
+    end = len(payload)
+    while end > start and _is_space(payload[end - 1]):
+        end -= 1
+    if end == start:
+        raise ValueError("empty number")
+    return end
+
+
+def _digit(char, base):
+    """Value of an ASCII digit in ``base``, or -1."""
+    char |= 0x20  # lower case letters, digits unchanged
+    if 0x30 <= char <= 0x39:
+        digit = char - 0x30
+    elif 0x61 <= char <= 0x66:
+        digit = char - 0x61 + 10
+    else:
+        return -1
+    return digit if digit < base else -1
+
+
+# Small ints and floats don't allocate on CircuitPython, but tuples do: the
+# loops below keep their state in locals rather than returning several values.
+
+
+def parse_int(payload, base=0):
+    """Like ``int(payload, base)``, for base 0 or 10.
+
+    Base 0 takes decimal, or hex/octal/binary with a ``0x``/``0o``/``0b`` prefix;
+    a decimal number can't start with 0 (``b"010"`` raises) unless it is all
+    zeros. Base 10 takes decimal only, leading zeros and all.
+    """
+    i = _start(payload)
+    end = _end(payload, i)
+    sign = 1
+    if payload[i] in (0x2B, 0x2D):  # + -
+        sign = 1 if payload[i] == 0x2B else -1
+        i += 1
+    if base == 0:
+        base = 10
+        if end - i > 2 and payload[i] == 0x30:
+            prefix = payload[i + 1] | 0x20
+            if prefix == 0x78:  # x
+                base = 16
+            elif prefix == 0x6F:  # o
+                base = 8
+            elif prefix == 0x62:  # b
+                base = 2
+            if base != 10:
+                i += 2
+        if base == 10 and i < end and payload[i] == 0x30:
+            # 0, 00, ... but not 010, like a Python literal
+            j = i
+            while j < end and payload[j] == 0x30:
+                j += 1
+            if j < end:
+                raise ValueError("invalid int payload")
+    elif base != 10:
+        raise ValueError("base must be 0 or 10")
+    if i == end:
+        raise ValueError("invalid int payload")
+    value = 0
+    while i < end:
+        digit = _digit(payload[i], base)
+        if digit < 0:
+            raise ValueError("invalid int payload")
+        value = value * base + digit
+        i += 1
+    return sign * value
+
+
+def parse_float(payload):
+    """Like ``float(payload)``, for plain decimal and exponent notation (no inf/nan)."""
+    i = _start(payload)
+    end = _end(payload, i)
+    sign = 1
+    if payload[i] in (0x2B, 0x2D):
+        sign = 1 if payload[i] == 0x2B else -1
+        i += 1
+    mantissa = 0
+    digits = 0
+    exponent = 0
+    seen_point = False
+    while i < end:
+        char = payload[i]
+        if char == 0x2E and not seen_point:  # .
+            seen_point = True
+        elif 0x30 <= char <= 0x39:
+            mantissa = mantissa * 10 + char - 0x30
+            digits += 1
+            if seen_point:
+                exponent -= 1
+        else:
+            break
+        i += 1
+    if not digits:
+        raise ValueError("invalid float payload")
+    if i < end and payload[i] | 0x20 == 0x65:  # e
+        i += 1
+        exp_sign = 1
+        if i < end and payload[i] in (0x2B, 0x2D):
+            exp_sign = 1 if payload[i] == 0x2B else -1
+            i += 1
+        if i == end:
+            raise ValueError("invalid float payload")
+        value = 0
+        while i < end:
+            digit = _digit(payload[i], 10)
+            if digit < 0:
+                raise ValueError("invalid float payload")
+            value = value * 10 + digit
+            i += 1
+        exponent += exp_sign * value
+    if i != end:
+        raise ValueError("invalid float payload")
+    if exponent < 0:
+        return sign * mantissa / 10**-exponent
+    return float(sign * mantissa * 10**exponent)
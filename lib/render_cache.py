@@ -0,0 +1,51 @@
+"""
+`render_cache`
+================================================================================
+
+Remember the last string drawn on a line, how wide it is and its color, so the
+line is only reformatted and re-measured when what it shows actually changes.
+"""
+
+
+class RenderCache:
+    """Single entry cache keyed on a pair of values, e.g. (hour, minute).
+
+    Two separate key fields instead of a tuple, so a lookup doesn't allocate.
+    """
+
+    __slots__ = ("_key_a", "_key_b", "_valid", "text", "width", "color", "hits", "misses")
+
+    def __init__(self):
+        self._key_a = None
+        self._key_b = None
+        self._valid = False
+        self.text = None
+        self.width = 0
+        self.color = None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key_a, key_b):
+        """True if text/width/color are already there for this key."""
+        if self._valid and self._key_a == key_a and self._key_b == key_b:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def store(self, key_a, key_b, text, width, color=None):
+        """Remember what was rendered for this key."""
+        self._key_a = key_a
+        self._key_b = key_b
+        self._valid = True
+        self.text = text
+        self.width = width
+        self.color = color
+
+    def invalidate(self):
+        """Forget the entry, e.g. after a font or layout change."""
+        self._valid = False
+
+    def stats(self):
+        """[hits, misses] for the status payload."""
+        return [self.hits, self.misses]
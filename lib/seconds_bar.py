@@ -0,0 +1,90 @@
+"""
+`seconds_bar`
+================================================================================
+
+Once-a-second progress bar drawn into a one pixel high ``displayio.Bitmap``.
+
+Repainting the whole row every second (``fill(0)`` and then every lit pixel)
+dirties all of it, so displayio refreshes the full strip each tick. This keeps
+track of which columns are lit and only writes the ones that change: when the
+bar moves one step that's the column it leaves and the column it enters.
+"""
+
+BAR = "bar"
+DOT = "dot"
+FILL = "fill"
+STYLES = (BAR, DOT, FILL)
+
+
+class SecondsBar:
+    """Incremental seconds indicator.
+
+    :param bitmap: The bitmap to draw in, row 0. Anything with ``width`` and
+                   ``bitmap[x, y] = value`` works.
+    :param str style: ``"bar"``: ``bar_width`` columns starting at the current second,
+                      ``"dot"``: a single column at the current second,
+                      ``"fill"``: every column from 0 up to the current second.
+    :param int bar_width: Width of the ``"bar"`` style, in seconds.
+    :param int color_index: Palette index for lit columns. Index 0 is off.
+    :param int scale: Columns per second, for displays wider than 64 pixels.
+    """
+
+    def __init__(self, bitmap, *, style=BAR, bar_width=4, color_index=1, scale=1):
+        if style not in STYLES:
+            raise ValueError(f"unknown seconds bar style {style!r}")
+        self._bitmap = bitmap
+        self.style = style
+        self.bar_width = bar_width
+        self.color_index = color_index
+        self.scale = scale
+        # Lit columns are always one run: [_lit_x0, _lit_x1)
+        self._lit_x0 = 0
+        self._lit_x1 = 0
+        # Columns written by the last update: [dirty_x0, dirty_x1)
+        self.dirty_x0 = 0
+        self.dirty_x1 = 0
+
+    def update(self, second):
+        """Show ``second`` (0-59). Only columns that change are written, and
+        the span they cover is left in dirty_x0/dirty_x1."""
+        if self.style == BAR:
+            x0, x1 = second, second + self.bar_width
+        elif self.style == DOT:
+            x0, x1 = second, second + 1
+        else:
+            x0, x1 = 0, second + 1
+        self._show(x0 * self.scale, x1 * self.scale)
+
+    def clear(self):
+        """Turn every lit column off."""
+        self._show(0, 0)
+
+    def _show(self, x0, x1):
+        width = self._bitmap.width
+        x0 = max(0, min(x0, width))
+        x1 = max(x0, min(x1, width))
+        old_x0, old_x1 = self._lit_x0, self._lit_x1
+        self.dirty_x0 = self.dirty_x1 = 0
+        if old_x0 == x0 and old_x1 == x1:
+            return
+
+        # Turn off what is no longer in the run, turn on what is new. Each is
+        # at most a piece on either side. With wraparound (59 -> 0) the runs
+        # don't overlap and all of both change.
+        for x in range(old_x0, min(old_x1, x0)):
+            self._set(x, 0)
+        for x in range(max(old_x0, x1), old_x1):
+            self._set(x, 0)
+        for x in range(x0, min(x1, old_x0)):
+            self._set(x, self.color_index)
+        for x in range(max(x0, old_x1), x1):
+            self._set(x, self.color_index)
+        self._lit_x0, self._lit_x1 = x0, x1
+
+    def _set(self, x, value):
+        self._bitmap[x, 0] = value
+        if self.dirty_x0 == self.dirty_x1:
+            self.dirty_x0, self.dirty_x1 = x, x + 1
+        else:
+            self.dirty_x0 = min(self.dirty_x0, x)
+            self.dirty_x1 = max(self.dirty_x1, x + 1)
@@ -0,0 +1,158 @@
+"""
+`sprite_cache`
+================================================================================
+
+Keep small sprite sheets in RAM.
+
+``OnDiskBitmap`` reads every frame from flash while the display refreshes, and
+holds the file open for as long as the image is up. A small sheet (``cat`` and
+``parrot`` are about 10 KB) fits in a ``displayio.Bitmap`` just as well. This
+loads those into RAM and keeps the last few around, least recently shown first
+out when free memory runs short. Anything bigger than a share of the free heap
+stays on disk.
+"""
+
+import gc
+
+import bitmaptools
+import displayio
+
+from sprite_stream import BI_RGB, read_header, read_palette
+
+
+class SpriteCache:
+    # pylint: disable=too-many-instance-attributes
+    """Least recently used cache of in-RAM sprite sheets, by path.
+
+    Only uncompressed palette BMPs (up to 8 bits per pixel) whose rows need no
+    padding are loaded; everything else is left for ``OnDiskBitmap`` or
+    `sprite_stream.SpriteStream`.
+
+    :param int reserve: Free bytes to leave on the heap. Cached sheets are
+                        dropped, oldest first, to keep at least this much.
+    :param int max_share: A sheet is only loaded if it takes at most
+                          1/``max_share`` of the free heap.
+    :param int max_entries: Most sheets to keep.
+    """
+
+    def __init__(self, *, reserve=32 * 1024, max_share=4, max_entries=4):
+        self.reserve = reserve
+        self.max_share = max_share
+        self.max_entries = max_entries
+        self._entries = {}
+        self._sizes = {}
+        # Paths, least recently used first.
+        self._order = []
+        # Bytes dropped that gc.mem_free() doesn't count yet: collecting is left
+        # to gc_policy, whenever it gets to it.
+        self._uncollected = 0
+        self._free_seen = 0
+        self.hits = 0
+        self.loads = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    @staticmethod
+    def size(asset):
+        """Bytes a ``displayio.Bitmap`` of ``asset`` takes, or None if it can't be cached."""
+        if asset.compression != BI_RGB or asset.bpp > 8 or (asset.width * asset.bpp) % 32:
+            return None
+        return asset.width * asset.bpp // 8 * asset.height
+
+    def get(self, asset):
+        """``(bitmap, palette)`` for an `asset_index.Asset`, from RAM, or None if
+        it is to be played from disk."""
+        entry = self._entries.get(asset.path)
+        if entry:
+            self._order.remove(asset.path)
+            self._order.append(asset.path)
+            self.hits += 1
+            return entry
+
+        size = self.size(asset)
+        if size is None:
+            self.skipped += 1
+            return None
+        while len(self._order) >= self.max_entries:
+            self._evict(self._order[0])
+        self.trim(size)
+        if size > self._mem_free() // self.max_share:
+            self.skipped += 1
+            return None
+        try:
+            entry = self._load(asset)
+        except MemoryError:
+            self.skipped += 1
+            return None
+        self._entries[asset.path] = entry
+        self._sizes[asset.path] = size
+        self._order.append(asset.path)
+        self.loads += 1
+        return entry
+
+    @staticmethod
+    def _load(asset):
+        with open(asset.path, "rb") as file:
+            header = read_header(file)
+            palette = read_palette(file, header)
+            bitmap = displayio.Bitmap(header.width, header.height, 1 << header.bpp)
+            file.seek(header.data_offset)
+            # BMP rows are bottom up, and pixels narrower than a byte go high bits first.
+            bitmaptools.readinto(
+                bitmap, file, header.bpp, reverse_pixels_in_element=True, reverse_rows=True
+            )
+        return bitmap, palette
+
+    def trim(self, size=0, keep=None):
+        """Drop sheets, least recently used first, until ``size`` more bytes
+        would still leave ``reserve`` free once they are collected. Returns how
+        many were dropped.
+
+        :param str keep: Path of the sheet on screen, if any. The display still
+                         holds on to it, so dropping it would free nothing.
+        """
+        short = size + self.reserve - self._mem_free()
+        dropped = 0
+        index = 0
+        while short > 0 and index < len(self._order):
+            path = self._order[index]
+            if path == keep:
+                index += 1
+                continue
+            short -= self._sizes[path]
+            self._evict(path)
+            dropped += 1
+        return dropped
+
+    def forget(self, path):
+        """Drop ``path``, if it is cached, e.g. because the file was replaced."""
+        if path in self._entries:
+            self._drop(path)
+
+    def _evict(self, path):
+        self._drop(path)
+        self.evictions += 1
+
+    def _drop(self, path):
+        del self._entries[path]
+        self._order.remove(path)
+        self._uncollected += self._sizes.pop(path)
+
+    def _mem_free(self):
+        """``gc.mem_free()`` plus what was dropped since the last collection."""
+        free = gc.mem_free()
+        if free > self._free_seen:
+            # Only a collection gives memory back: what was dropped is counted now.
+            self._uncollected = 0
+        self._free_seen = free
+        return free + self._uncollected
+
+    def stats(self):
+        """For the status payload."""
+        return {
+            "cached": len(self._order),
+            "hits": self.hits,
+            "loads": self.loads,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,278 @@
+"""
+`sprite_stream`
+================================================================================
+
+Play RLE compressed BMP sprite sheets one frame at a time.
+
+``OnDiskBitmap`` needs an uncompressed BMP, which for a long animation is a big
+chunk of the 2 MB CIRCUITPY drive. An RLE8 (or RLE4) BMP of the same frames is a
+fraction of that. This reads one frame's worth of compressed data at a time and
+decodes it into one half of a two frame ``displayio.Bitmap``: the frame on screen
+is one half, the next one is decoded into the other half ahead of time (see
+`SpriteStream.prefetch`), and showing it is just a tile index change.
+
+Frames are stacked top to bottom, ``frame_height`` pixels each, like the sheets
+``OnDiskBitmap`` plays. ``tools/bmp_rle.py`` makes RLE BMPs from uncompressed ones.
+"""
+
+import struct
+from collections import namedtuple
+
+import bitmaptools
+import displayio
+from adafruit_ticks import ticks_diff, ticks_ms
+
+BI_RGB = 0
+BI_RLE8 = 1
+BI_RLE4 = 2
+
+BmpHeader = namedtuple(
+    "BmpHeader", "data_offset data_size width height bpp compression colors palette_offset"
+)
+
+# Bytes read at a time while indexing the frames.
+_CHUNK = 256
+
+
+def read_header(file):
+    """Parse the file and info headers of a BMP. ``height`` is always positive;
+    rows are stored bottom up unless the file says otherwise, and RLE ones always are.
+
+    :raises ValueError: If this is not a BMP.
+    """
+    file.seek(0)
+    head = file.read(54)
+    if len(head) < 54 or head[:2] != b"BM":
+        raise ValueError("not a BMP file")
+    data_offset = struct.unpack_from("<I", head, 10)[0]
+    info_size, width, height, _, bpp, compression, data_size = struct.unpack_from(
+        "<IiiHHII", head, 14
+    )
+    colors = struct.unpack_from("<I", head, 46)[0]
+    if not colors and bpp <= 8:
+        colors = 1 << bpp
+    return BmpHeader(
+        data_offset, data_size, width, abs(height), bpp, compression, colors, 14 + info_size
+    )
+
+
+def read_palette(file, header):
+    """The color table of a BMP with a ``header`` from `read_header`, as a
+    ``displayio.Palette``."""
+    palette = displayio.Palette(header.colors)
+    file.seek(header.palette_offset)
+    entries = file.read(4 * header.colors)
+    for i in range(header.colors):
+        blue, green, red = entries[4 * i], entries[4 * i + 1], entries[4 * i + 2]
+        palette[i] = (red << 16) | (green << 8) | blue
+    return palette
+
+
+class SpriteStream:
+    # pylint: disable=too-many-instance-attributes
+    """An RLE8/RLE4 sprite sheet, decoded a frame at a time.
+
+    Show it with ``displayio.TileGrid(stream.bitmap, pixel_shader=stream.pixel_shader,
+    tile_width=stream.width, tile_height=stream.frame_height)`` and set the tile to
+    what `advance` returns.
+
+    :param file: The BMP, opened ``"rb"``. Stays open until `close`.
+    :param int frame_height: Height of one frame, in pixels.
+    :raises ValueError: If the file is not an RLE compressed BMP.
+    """
+
+    def __init__(self, file, frame_height):
+        header = read_header(file)
+        if header.compression not in (BI_RLE8, BI_RLE4):
+            raise ValueError("not an RLE compressed BMP")
+        self._file = file
+        self._rle4 = header.compression == BI_RLE4
+        self.width = header.width
+        self.height = header.height
+        self.frame_height = min(frame_height, header.height)
+        self.frame_count = header.height // self.frame_height
+
+        self.pixel_shader = read_palette(file, header)
+
+        # Where each frame starts in the file: offset, and the row (counted from
+        # the frame's bottom) and column the data there starts at.
+        self._offsets = [0] * (self.frame_count + 1)
+        self._rows = [0] * self.frame_count
+        self._columns = [0] * self.frame_count
+        data_end = header.data_offset + header.data_size if header.data_size else None
+        self._index(header.data_offset, data_end)
+        # Compressed data of the biggest frame.
+        self._buffer = bytearray(
+            max(self._frame_end(frame) - self._offsets[frame] for frame in range(self.frame_count))
+        )
+
+        # Two frames: the one on screen and the next one.
+        self.bitmap = displayio.Bitmap(self.width, 2 * self.frame_height, header.colors)
+        self.front = 0
+        self.frame = 0
+        self._ready = False
+        self.decode_ms = 0
+        self.max_decode_ms = 0
+        self.late = 0
+        self._decode(0, 0)
+
+    def _index(self, data_offset, data_end):
+        """Walk the RLE data once to find where each frame starts."""
+        # pylint: disable=too-many-branches
+        file = self._file
+        frame_height = self.frame_height
+        # Frames are stored last one first. Rows below the last frame are skipped.
+        first_row = self.height - self.frame_count * frame_height
+        next_frame = self.frame_count - 1
+        next_row = first_row
+        row = column = 0
+        pos = data_offset
+        chunk = bytearray(_CHUNK)
+        file.seek(pos)
+        filled = file.readinto(chunk)
+        start = pos
+        while True:
+            if pos + 2 > start + filled:
+                start = pos
+                file.seek(pos)
+                filled = file.readinto(chunk)
+                if filled < 2 or (data_end is not None and pos >= data_end):
+                    break
+            while next_frame >= 0 and row >= next_row:
+                self._offsets[next_frame] = pos
+                self._rows[next_frame] = row - next_row
+                self._columns[next_frame] = column
+                next_frame -= 1
+                next_row += frame_height
+            count = chunk[pos - start]
+            value = chunk[pos - start + 1]
+            pos += 2
+            if count:
+                column += count
+            elif value == 0:
+                row += 1
+                column = 0
+            elif value == 1:
+                break
+            elif value == 2:
+                if pos + 2 > start + filled:
+                    start = pos
+                    file.seek(pos)
+                    filled = file.readinto(chunk)
+                column += chunk[pos - start]
+                row += chunk[pos - start + 1]
+                pos += 2
+            else:
+                size = (value + 1) // 2 if self._rle4 else value
+                pos += size + (size & 1)
+        while next_frame >= 0:
+            # Nothing left in the file for these frames: they are blank.
+            self._offsets[next_frame] = pos
+            self._rows[next_frame] = frame_height
+            self._columns[next_frame] = 0
+            next_frame -= 1
+        self._offsets[self.frame_count] = pos
+
+    def _frame_end(self, frame):
+        # The frame above this one in the picture comes after it in the file.
+        return self._offsets[frame - 1] if frame else self._offsets[self.frame_count]
+
+    def _decode(self, frame, half):
+        """Decode ``frame`` into half ``half`` (0 or 1) of the bitmap."""
+        # pylint: disable=too-many-branches, too-many-locals, too-many-statements
+        start_ms = ticks_ms()
+        bitmap = self.bitmap
+        width = self.width
+        frame_height = self.frame_height
+        top = half * frame_height
+        bitmaptools.fill_region(bitmap, 0, top, width, top + frame_height, 0)
+
+        size = self._frame_end(frame) - self._offsets[frame]
+        view = memoryview(self._buffer)
+        self._file.seek(self._offsets[frame])
+        size = self._file.readinto(view[:size])
+        data = self._buffer
+        rle4 = self._rle4
+        row = self._rows[frame]
+        column = self._columns[frame]
+        i = 0
+        while i + 1 < size and row < frame_height:
+            count = data[i]
+            value = data[i + 1]
+            i += 2
+            y = top + frame_height - 1 - row
+            if count:
+                end = min(column + count, width)
+                if column < end:
+                    if not rle4 or value >> 4 == value & 0x0F:
+                        bitmaptools.fill_region(
+                            bitmap, column, y, end, y + 1, value & 0x0F if rle4 else value
+                        )
+                    else:
+                        high = value >> 4
+                        low = value & 0x0F
+                        for x in range(column, end):
+                            bitmap[x, y] = low if (x - column) & 1 else high
+                column += count
+            elif value == 0:
+                row += 1
+                column = 0
+            elif value == 1:
+                break
+            elif value == 2:
+                column += data[i]
+                row += data[i + 1]
+                i += 2
+            else:
+                end = min(column + value, width)
+                if rle4:
+                    for x in range(column, end):
+                        pixel = data[i + ((x - column) >> 1)]
+                        bitmap[x, y] = pixel & 0x0F if (x - column) & 1 else pixel >> 4
+                    size_bytes = (value + 1) // 2
+                else:
+                    if column < end:
+                        bitmaptools.arrayblit(
+                            bitmap, view[i : i + end - column], column, y, end, y + 1
+                        )
+                    size_bytes = value
+                i += size_bytes + (size_bytes & 1)
+                column += value
+
+        self.decode_ms = ticks_diff(ticks_ms(), start_ms)
+        self.max_decode_ms = max(self.max_decode_ms, self.decode_ms)
+
+    def prefetch(self):
+        """Decode the next frame into the hidden half, if not done yet. Call when
+        there is time to spare. Returns True if it decoded something."""
+        if self._ready or self.frame_count < 2:
+            return False
+        self._decode((self.frame + 1) % self.frame_count, self.front ^ 1)
+        self._ready = True
+        return True
+
+    def advance(self):
+        """Move on to the next frame. Returns the tile index to show it."""
+        if self.frame_count < 2:
+            return self.front
+        if not self._ready:
+            # Not prefetched in time: decode now, on the frame's own time.
+            self.late += 1
+            self.prefetch()
+        self.frame = (self.frame + 1) % self.frame_count
+        self.front ^= 1
+        self._ready = False
+        return self.front
+
+    def stats(self):
+        """For the status payload: frames, the last and slowest decode and how
+        many frames had to be decoded when due because they weren't prefetched."""
+        return {
+            "frames": self.frame_count,
+            "decode_ms": self.decode_ms,
+            "max_decode_ms": self.max_decode_ms,
+            "late": self.late,
+        }
+
+    def close(self):
+        self._file.close()
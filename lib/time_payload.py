@@ -0,0 +1,57 @@
+"""
+`time_payload`
+================================================================================
+
+Decoders for the two time sync payloads.
+
+The text one is the strftime output published on ``/aio/local_time``::
+
+    2021-01-15 23:07:36.339 015 5 -0500 EST
+
+The binary one is 6 or 8 bytes, big endian: UTC epoch seconds (uint32), UTC
+offset in minutes (int16) and, optionally, milliseconds (uint16). It decodes
+with a single ``struct.unpack_from`` and no intermediate strings.
+"""
+
+import struct
+
+BINARY_FORMAT = ">Ih"
+BINARY_FORMAT_MILLIS = ">IhH"
+BINARY_SIZE = struct.calcsize(BINARY_FORMAT)
+BINARY_SIZE_MILLIS = struct.calcsize(BINARY_FORMAT_MILLIS)
+
+
+def parse_text(message):
+    """Decode a strftime payload. Returns (struct_time fields, millis)."""
+    times = message.split(" ")
+    the_date = times[0]
+    the_time = times[1]
+    year_day = int(times[2])
+    week_day = int(times[3])
+    is_dst = None  # no way to know yet
+    year, month, mday = [int(x) for x in the_date.split("-")]
+    the_time, _, millis = the_time.partition(".")
+    hours, minutes, seconds = [int(x) for x in the_time.split(":")]
+    now = (year, month, mday, hours, minutes, seconds, week_day, year_day, is_dst)
+    return now, int(millis) if millis else 0
+
+
+def parse_binary(payload):
+    """Decode a binary payload. Returns (local epoch seconds, millis)."""
+    if len(payload) >= BINARY_SIZE_MILLIS:
+        epoch, offset_mins, millis = struct.unpack_from(BINARY_FORMAT_MILLIS, payload)
+    elif len(payload) >= BINARY_SIZE:
+        epoch, offset_mins = struct.unpack_from(BINARY_FORMAT, payload)
+        millis = 0
+    else:
+        raise ValueError(f"time payload too short: {len(payload)} bytes")
+    if millis > 999:
+        raise ValueError(f"bad millis: {millis}")
+    return epoch + offset_mins * 60, millis
+
+
+def encode_binary(epoch, offset_mins, millis=None):
+    """Build a binary payload, for publishers and tests."""
+    if millis is None:
+        return struct.pack(BINARY_FORMAT, epoch, offset_mins)
+    return struct.pack(BINARY_FORMAT_MILLIS, epoch, offset_mins, millis)
@@ -0,0 +1,214 @@
+"""
+`time_sync`
+================================================================================
+
+Keep the RTC close to the time published on ``/aio/local_time`` between updates.
+
+The first update (or one that is off by more than ``step_limit`` seconds, like a
+DST change) sets the RTC outright. After that, updates are used to estimate how
+fast the board's crystal drifts against the publisher. The estimate goes into
+``rtc.RTC.calibration`` (about 1 ppm per step on the SAMD51, whose ticks_ms
+counts the same oscillator, so later estimates see it applied). What that can't
+take, past its range or on a port without it, and any error seen at the last
+update, are worked off by nudging the RTC a second at a time instead of
+jumping. ``expected_error_ms`` says how far off the clock is likely to be by
+now, so the publisher can send the time much less often.
+"""
+
+import time
+
+from adafruit_ticks import ticks_add, ticks_diff, ticks_ms
+
+# Drift we assume before we've had a long enough baseline to measure it.
+UNKNOWN_DRIFT_PPM = 100
+# ticks_diff() is only good for intervals shorter than this.
+_TICKS_MAX_INTERVAL_MS = 1 << 27
+
+
+class TimeSync:
+    # pylint: disable=too-many-instance-attributes
+    """Drift estimation, calibration and slewed corrections for an ``rtc.RTC``.
+
+    :param rtc: The RTC to keep in sync.
+    :param int step_limit: Set the RTC outright when an update is off by more than this many
+                           seconds.
+    :param int slew_interval: Seconds to wait between two one-second corrections.
+    :param int min_drift_interval: Shortest time, in seconds, between two updates used to
+                                   measure the drift. Longer is more precise.
+    :param int calibration_limit: Largest ``rtc.calibration`` to set, either way (127 on
+                                  the SAMD51). 0 leaves it alone.
+    """
+
+    def __init__(
+        self,
+        rtc,
+        *,
+        step_limit=120,
+        slew_interval=5,
+        min_drift_interval=3600,
+        calibration_limit=127,
+    ):
+        self._rtc = rtc
+        self.step_limit = step_limit
+        self.slew_interval = slew_interval
+        self.min_drift_interval = min_drift_interval
+        self.calibration_limit = calibration_limit
+        self.calibration = 0
+        if calibration_limit:
+            try:
+                self.calibration = rtc.calibration
+            except (AttributeError, NotImplementedError):
+                # No calibration on this port: one-second steps do it all.
+                self.calibration_limit = 0
+
+        self.synced = False
+        self.drift_ppm = None
+        self.drift_ppm_change = UNKNOWN_DRIFT_PPM
+        self.last_error_ms = 0
+        self.steps = 0
+        self.slews = 0
+
+        self._pending = 0
+        self._sync_ticks = 0
+        self._last_adjust_ticks = 0
+        self._drift_ref_ms = 0
+        self._drift_ticks = 0
+        self._drift_rtc = 0
+        self._drift_every_ms = 0
+        self._drift_sign = 0
+        self._next_drift_ticks = 0
+
+    def update(self, now, millis=0):
+        """Take in the reference time.
+
+        :param now: The reference local time, as a ``time.struct_time``.
+        :param int millis: Milliseconds past ``now``'s second, if known.
+        """
+        self.update_epoch(time.mktime(now), millis)
+
+    def update_epoch(self, seconds, millis=0):
+        """Take in the reference time as local epoch seconds.
+
+        :param int seconds: The reference local time, in seconds since the epoch.
+        :param int millis: Milliseconds past ``seconds``, if known.
+        """
+        ticks = ticks_ms()
+        ref_ms = seconds * 1000 + millis
+        rtc_now = time.time()
+        # The RTC only counts whole seconds: on average it is half way into one.
+        error_ms = ref_ms - (rtc_now * 1000 + 500)
+
+        if not self.synced or abs(error_ms) > self.step_limit * 1000:
+            self._rtc.datetime = time.localtime((ref_ms + 500) // 1000)
+            self.steps += 1
+            self.synced = True
+            self._pending = 0
+            self._drift_anchor(ref_ms, ticks, rtc_now)
+        else:
+            # Work off whole seconds of error gradually in tick().
+            self._pending = int(error_ms / 1000)
+            self._measure_drift(ref_ms, ticks, rtc_now)
+
+        self.last_error_ms = error_ms
+        self._sync_ticks = ticks
+        self._calibrate()
+        self._schedule_drift(ticks)
+
+    def tick(self):
+        """Call about once a second. Applies at most one one-second correction."""
+        if not self.synced:
+            return
+        now = ticks_ms()
+        if self._pending:
+            if ticks_diff(now, self._last_adjust_ticks) >= self.slew_interval * 1000:
+                step = 1 if self._pending > 0 else -1
+                self._adjust(step, now)
+                self._pending -= step
+                self.slews += 1
+        elif self._drift_every_ms and ticks_diff(now, self._next_drift_ticks) >= 0:
+            self._adjust(self._drift_sign, now)
+            self._next_drift_ticks = ticks_add(self._next_drift_ticks, self._drift_every_ms)
+
+    @property
+    def expected_error_ms(self):
+        """Roughly how far off the RTC could be right now: its one second
+        resolution plus what the drift estimate could have gotten wrong since
+        the last update."""
+        if not self.synced:
+            return None
+        age_ms = ticks_diff(ticks_ms(), self._sync_ticks)
+        if not 0 <= age_ms < _TICKS_MAX_INTERVAL_MS:
+            age_ms = _TICKS_MAX_INTERVAL_MS
+        pending_ms = abs(self._pending) * 1000
+        return 1000 + pending_ms + age_ms * abs(self.drift_ppm_change) // 1000000
+
+    def stats(self):
+        """Metrics for the status payload."""
+        return {
+            "synced": self.synced,
+            "drift_ppm": self.drift_ppm,
+            "calibration": self.calibration,
+            "expected_error_ms": self.expected_error_ms,
+            "last_error_ms": self.last_error_ms,
+            "steps": self.steps,
+            "slews": self.slews,
+        }
+
+    def _adjust(self, seconds, now):
+        self._rtc.datetime = time.localtime(time.time() + seconds)
+        self._last_adjust_ticks = now
+
+    def _drift_anchor(self, ref_ms, ticks, rtc_now):
+        self._drift_ref_ms = ref_ms
+        self._drift_ticks = ticks
+        self._drift_rtc = rtc_now
+
+    def _measure_drift(self, ref_ms, ticks, rtc_now):
+        if (rtc_now - self._drift_rtc) * 1000 >= _TICKS_MAX_INTERVAL_MS:
+            # Too long since the anchor for ticks_diff(); start over.
+            self._drift_anchor(ref_ms, ticks, rtc_now)
+            return
+        elapsed_ms = ticks_diff(ticks, self._drift_ticks)
+        if elapsed_ms < self.min_drift_interval * 1000:
+            return
+        # How much further the reference moved than our own clock did, calibrated
+        # as it was since the anchor (it only changes right after one): what the
+        # crystal would have drifted without calibration.
+        ppm = ((ref_ms - self._drift_ref_ms) - elapsed_ms) * 1000000 // elapsed_ms
+        ppm += self.calibration
+        if self.drift_ppm is None:
+            self.drift_ppm = ppm
+        else:
+            smoothed = (3 * self.drift_ppm + ppm) // 4
+            self.drift_ppm_change = smoothed - self.drift_ppm
+            self.drift_ppm = smoothed
+        self._drift_anchor(ref_ms, ticks, rtc_now)
+
+    def _calibrate(self):
+        if not self.calibration_limit or self.drift_ppm is None:
+            return
+        limit = self.calibration_limit
+        # Positive speeds the RTC up, like a positive drift asks for.
+        calibration = max(-limit, min(limit, self.drift_ppm))
+        if calibration == self.calibration:
+            return
+        try:
+            self._rtc.calibration = calibration
+        except (AttributeError, NotImplementedError, ValueError):
+            self.calibration_limit = 0
+            return
+        self.calibration = calibration
+
+    def _schedule_drift(self, ticks):
+        self._drift_every_ms = 0
+        # What calibration leaves over.
+        drift_ppm = (self.drift_ppm or 0) - self.calibration
+        if not drift_ppm:
+            return
+        # Milliseconds for the drift to add up to a whole second.
+        every_ms = 1000000000 // abs(drift_ppm)
+        if every_ms >= _TICKS_MAX_INTERVAL_MS:
+            return
+        self._drift_every_ms = every_ms
+        self._drift_sign = 1 if drift_ppm > 0 else -1
+        self._next_drift_ticks = ticks_add(ticks, every_ms)
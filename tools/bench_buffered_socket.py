@@ -0,0 +1,193 @@
+"""Count socket reads with and without read-ahead (lib/buffered_socket.py) in the simulator.
+
+Runs kitchen_clock headless (tools/sim) through a few scenes, reading its MQTT
+socket bare (``socket_read_ahead``: 0) and through read-ahead buffers of a couple
+of sizes. The simulator's socket stands in for the esp32spi one: every
+``recv_into()`` is an SPI round trip to the ESP32 that allocates what it read, or
+an exception when it times out, and ``_available()`` is a round trip too.
+Reported per minute of virtual time:
+
+* msgs: MQTT messages the broker sent the clock,
+* reads: ``recv_into()`` calls on the socket, and per message the ones that
+  got data,
+* timeouts: reads that got nothing (on the board, an exception each),
+* polls: ``_available()`` calls,
+* allocs: per message, reads by MiniMQTT (through the buffer, if any) that
+  allocated anything, and the bytes they allocated (tracemalloc, the peak
+  during each read: a lower bound, in host CPython objects, which are bigger
+  than the board's),
+* latency: from the broker sending a ``/ping`` to the clock's status reply
+  reaching it, mean.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/bench_buffered_socket.py [--minutes N]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from send_asset import AssetSender
+from sim import Simulation
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+START = 10
+PING_EVERY = 7.31
+BURST_EVERY = 20
+BURST = 10
+READ_AHEAD = (0, 64, 256)
+
+
+def scene_idle(sim, prefix):
+    """The clock face, pings now and then."""
+    return []
+
+
+def scene_bursts(sim, prefix):
+    """Bursts of messages (a home automation scene), pings now and then."""
+
+    def burst():
+        for i in range(BURST):
+            sim.broker.publish(f"{prefix}/neopixel", str(i))
+
+    sim.every(BURST_EVERY, burst, start=START + 3.3)
+    return []
+
+
+def scene_upload(sim, prefix):
+    """An image uploaded over and over, pings now and then. Returns the senders."""
+    with open("bmps/parrot.bmp", "rb") as file:
+        data = file.read()
+
+    def publish(subtopic, payload):
+        sim.broker.publish(f"{prefix}/asset/{subtopic}", payload)
+
+    def upload():
+        sender = AssetSender("bench", data, publish, 1024)
+        listeners.append(sender)
+        sender.begin()
+
+    listeners = []
+    sim.every(30, upload, start=START + 1)
+    return listeners
+
+
+SCENES = (("idle", scene_idle), ("bursts", scene_bursts), ("upload", scene_upload))
+
+
+class ReadAllocs:
+    """Counts what the socket MiniMQTT reads from allocates (tracemalloc must be
+    tracing): its ``recv_into()`` and ``available()`` calls, including the
+    simulated esp32spi socket's allocations underneath."""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def wrap(self, sock):
+        for name in ("recv_into", "available"):
+            fun = getattr(sock, name, None)
+            if fun is not None:
+                setattr(sock, name, self._traced(fun))
+
+    def _traced(self, fun):
+        def traced(*args):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                return fun(*args)
+            finally:
+                allocated = tracemalloc.get_traced_memory()[1] - before
+                if allocated > 0:
+                    self.calls += 1
+                    self.bytes += allocated
+
+        return traced
+
+
+def run(scene, read_ahead, minutes, directory):
+    sim = Simulation(secrets={"socket_read_ahead": read_ahead, "asset_dir": directory})
+    prefix = sim.secrets["topic_prefix"]
+    status = f"{prefix}/status"
+    sim.publish(2, "/aio/local_time", LOCAL_TIME)
+    senders = scene(sim, prefix)
+    pings = []
+    latencies = []
+    start = {}
+    allocs = ReadAllocs()
+
+    def ping():
+        pings.append(sim.now)
+        sim.broker.publish(f"{prefix}/ping", "")
+
+    def on_publish(topic, payload):
+        if topic == status and pings and len(latencies) < len(pings):
+            latencies.append(sim.now - pings[len(latencies)])
+        elif topic == f"{prefix}/asset/status" and not senders[-1].finished:
+            senders[-1].on_status(payload)
+
+    def begin():
+        broker = sim.broker
+        start.update(
+            msgs=broker.delivered, reads=broker.reads, timeouts=broker.timeouts, polls=broker.polls
+        )
+        allocs.wrap(sim.module.client._sock)
+        tracemalloc.start()
+
+    sim.broker.on_publish = on_publish
+    sim.every(PING_EVERY, ping, start=START + 0.5)
+    sim.at(START, begin)
+    try:
+        sim.run(until=START + minutes * 60)
+    finally:
+        tracemalloc.stop()
+    broker = sim.broker
+    msgs = broker.delivered - start["msgs"]
+    reads = broker.reads - start["reads"]
+    timeouts = broker.timeouts - start["timeouts"]
+    return {
+        "msgs": msgs / minutes,
+        "reads": reads / minutes,
+        "per_msg": (reads - timeouts) / msgs,
+        "timeouts": timeouts / minutes,
+        "polls": (broker.polls - start["polls"]) / minutes,
+        "allocs": allocs.calls / msgs,
+        "alloc_bytes": allocs.bytes / msgs,
+        "latency_ms": sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def main():
+    minutes = 3
+    if "--minutes" in sys.argv:
+        minutes = float(sys.argv[sys.argv.index("--minutes") + 1])
+    print(f"{minutes:g} virtual minutes per run")
+    print(
+        f"{'scene':<8} {'read-ahead':>10} {'msgs/min':>9} {'reads/min':>10} {'reads/msg':>10}"
+        f" {'timeouts/min':>13} {'polls/min':>10} {'allocs/msg':>11} {'alloc B/msg':>12}"
+        f" {'latency ms':>11}"
+    )
+    directory = tempfile.mkdtemp(prefix="bench_buffered_socket_")
+    try:
+        for name, scene in SCENES:
+            for read_ahead in READ_AHEAD:
+                result = run(scene, read_ahead, minutes, directory)
+                print(
+                    f"{name:<8} {read_ahead or 'off':>10} {result['msgs']:>9.0f}"
+                    f" {result['reads']:>10.0f} {result['per_msg']:>10.1f}"
+                    f" {result['timeouts']:>13.0f} {result['polls']:>10.0f}"
+                    f" {result['allocs']:>11.1f} {result['alloc_bytes']:>12.0f}"
+                    f" {result['latency_ms']:>11.0f}"
+                )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
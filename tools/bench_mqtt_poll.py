@@ -0,0 +1,122 @@
+"""Compare fixed and adaptive MQTT polling (lib/mqtt_poller.py) in the simulator.
+
+Runs kitchen_clock headless (tools/sim) through a few scenes, once polling the
+old way (``mqtt_poll_fixed``: 0.1 s waits, a nap when idle) and once adaptively,
+and reports per minute of virtual time:
+
+* wakeups: main loop passes (each one runs the clock's own code),
+* reads: socket reads,
+* timeouts: reads that came back empty (each costs MiniMQTT an exception and a
+  buffer),
+* latency: from the broker sending a ``/ping`` to the clock's status reply
+  reaching it, mean and worst,
+* dropped: animation frames that missed their slot (the status reply samples
+  the display profile, which stalls for a while on purpose).
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/bench_mqtt_poll.py [--minutes N]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from sim import Simulation
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+START = 10
+# Pings come at an odd interval, so they land all over the clock's passes.
+PING_EVERY = 7.31
+BURST_EVERY = 20
+BURST = 10
+
+
+def scene_idle(sim, prefix):
+    """The clock face, pings now and then."""
+
+
+def scene_animation(sim, prefix):
+    """An animation playing the whole time, pings now and then."""
+    sim.publish(START - 5, f"{prefix}/img", '{"img": "parrot", "timeout": 100000}')
+
+
+def scene_bursts(sim, prefix):
+    """Bursts of messages (a home automation scene), pings now and then."""
+
+    def burst():
+        for i in range(BURST):
+            sim.broker.publish(f"{prefix}/neopixel", str(i))
+
+    sim.every(BURST_EVERY, burst, start=START + 3.3)
+
+
+SCENES = (("idle", scene_idle), ("animation", scene_animation), ("bursts", scene_bursts))
+
+
+def run(scene, fixed, minutes):
+    secrets = {"mqtt_poll_fixed": True} if fixed else {}
+    sim = Simulation(secrets=secrets)
+    prefix = sim.secrets["topic_prefix"]
+    status = f"{prefix}/status"
+    sim.publish(2, "/aio/local_time", LOCAL_TIME)
+    scene(sim, prefix)
+    pings = []
+    latencies = []
+    start = {}
+
+    def ping():
+        pings.append(sim.now)
+        sim.broker.publish(f"{prefix}/ping", "")
+
+    def on_publish(topic, _payload):
+        if topic == status and pings and len(latencies) < len(pings):
+            latencies.append(sim.now - pings[len(latencies)])
+
+    def begin():
+        start["passes"] = sim.module.mqtt_poller.passes
+        start["reads"] = sim.broker.reads
+        start["timeouts"] = sim.broker.timeouts
+        start["presenter"] = sim.module.presenter.stats()
+
+    sim.broker.on_publish = on_publish
+    sim.every(PING_EVERY, ping, start=START + 0.5)
+    sim.at(START, begin)
+    end = START + minutes * 60
+    sim.run(until=end)
+    mod = sim.module
+    return {
+        "passes": (mod.mqtt_poller.passes - start["passes"]) / minutes,
+        "reads": (sim.broker.reads - start["reads"]) / minutes,
+        "timeouts": (sim.broker.timeouts - start["timeouts"]) / minutes,
+        "latency_ms": sum(latencies) / len(latencies) * 1000,
+        "worst_ms": max(latencies) * 1000,
+        "dropped": mod.presenter.dropped - start["presenter"]["dropped"],
+    }
+
+
+def main():
+    minutes = 5
+    if "--minutes" in sys.argv:
+        minutes = float(sys.argv[sys.argv.index("--minutes") + 1])
+    print(f"{minutes:g} virtual minutes per run")
+    print(
+        f"{'scene':<10} {'polling':<9} {'wakeups/min':>11} {'reads/min':>10}"
+        f" {'timeouts/min':>13}"
+        f" {'latency ms':>11} {'worst ms':>9} {'dropped':>8}"
+    )
+    for name, scene in SCENES:
+        for fixed in (True, False):
+            result = run(scene, fixed, minutes)
+            print(
+                f"{name:<10} {'fixed' if fixed else 'adaptive':<9} {result['passes']:>11.0f}"
+                f" {result['reads']:>10.0f} {result['timeouts']:>13.0f}"
+                f" {result['latency_ms']:>11.0f}"
+                f" {result['worst_ms']:>9.0f} {result['dropped']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
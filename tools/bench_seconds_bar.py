@@ -0,0 +1,89 @@
+"""Dirty area per tick of the seconds indicator, full repaint vs SecondsBar.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/bench_seconds_bar.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+# pylint: disable=wrong-import-position
+from seconds_bar import STYLES, SecondsBar
+
+WIDTH = 64
+SECS_WIDTH = 4
+TICKS = 3600
+
+
+class DirtyTrackingBitmap:
+    """One row bitmap that records the span of columns written, like displayio
+    does for its dirty area."""
+
+    def __init__(self, width):
+        self.width = width
+        self.pixels = bytearray(width)
+        self.writes = 0
+        self.dirty = None
+
+    def __setitem__(self, xy, value):
+        x = xy[0]
+        self.pixels[x] = value
+        self.writes += 1
+        if self.dirty is None:
+            self.dirty = [x, x + 1]
+        else:
+            self.dirty[0] = min(self.dirty[0], x)
+            self.dirty[1] = max(self.dirty[1], x + 1)
+
+    def fill(self, value):
+        for x in range(self.width):
+            self[x, 0] = value
+
+    def take_dirty(self):
+        dirty = 0 if self.dirty is None else self.dirty[1] - self.dirty[0]
+        self.dirty = None
+        return dirty
+
+
+def full_repaint(bitmap, second):
+    """What kitchen_clock did before SecondsBar."""
+    bitmap.fill(0)
+    for x in range(max(0, second), min(second + SECS_WIDTH, bitmap.width)):
+        bitmap[x, 0] = 1
+
+
+def measure(tick):
+    bitmap = DirtyTrackingBitmap(WIDTH)
+    update = tick(bitmap)
+    dirty = 0
+    for second in range(TICKS):
+        update(second % 60)
+        dirty += bitmap.take_dirty()
+    return dirty / TICKS, bitmap.writes / TICKS
+
+
+def main():
+    cases = [("full repaint (bar)", lambda bitmap: lambda sec: full_repaint(bitmap, sec))]
+    for style in STYLES:
+        cases.append(
+            (
+                f"SecondsBar {style}",
+                lambda bitmap, style=style: SecondsBar(
+                    bitmap, style=style, bar_width=SECS_WIDTH
+                ).update,
+            )
+        )
+
+    print(f"{'renderer':<20} {'dirty cols/tick':>15} {'writes/tick':>12} {'us/tick':>8}")
+    for name, tick in cases:
+        dirty, writes = measure(tick)
+        seconds = min(timeit.repeat(lambda tick=tick: measure(tick), number=1, repeat=3))
+        print(f"{name:<20} {dirty:>15.2f} {writes:>12.2f} {seconds / TICKS * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the text and binary time sync parsers under CPython.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/bench_time_payload.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+
+# pylint: disable=wrong-import-position
+from time_payload import encode_binary, parse_binary, parse_text
+
+TEXT_PAYLOAD = "2021-01-15 23:07:36.339 015 5 -0500 EST"
+BINARY_PAYLOAD = encode_binary(1610770056, -300, 339)
+RUNS = 200000
+
+
+def _alloc_bytes(fun, payload, runs=1000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    for _ in range(runs):
+        fun(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def main():
+    print(f"{'parser':<8} {'payload':>8} {'ns/call':>9} {'peak alloc':>11}")
+    for name, fun, payload in (
+        ("text", parse_text, TEXT_PAYLOAD),
+        ("binary", parse_binary, BINARY_PAYLOAD),
+    ):
+        seconds = min(timeit.repeat(lambda: fun(payload), number=RUNS, repeat=5))
+        print(
+            f"{name:<8} {len(payload):>7}B {seconds / RUNS * 1e9:>9.0f}"
+            f" {_alloc_bytes(fun, payload):>10}B"
+        )
+
+
+if __name__ == "__main__":
+    main()
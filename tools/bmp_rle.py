@@ -0,0 +1,155 @@
+"""Convert a BMP sprite sheet to RLE8 (or RLE4) for lib/sprite_stream.py.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/bmp_rle.py bmps/fireworks.bmp bmps/fireworks_rle.bmp [--rle4]
+
+Palette images (1, 4 or 8 bpp) keep their palette. 24 and 32 bpp ones get one
+made from their 256 most used colors (after dropping the low 3 bits of each
+channel, which the matrix can't show anyway); other colors map to the nearest
+of those. ``--rle4`` needs 16 colors or fewer.
+"""
+
+import struct
+import sys
+from collections import Counter
+
+BI_RLE8 = 1
+BI_RLE4 = 2
+
+
+def read_bmp(path):
+    """(width, height, palette [(r, g, b)], rows of palette indexes, top row first)."""
+    # pylint: disable=too-many-locals
+    with open(path, "rb") as bmp:
+        data = bmp.read()
+    if data[:2] != b"BM":
+        raise ValueError(f"{path}: not a BMP")
+    offset = struct.unpack_from("<I", data, 10)[0]
+    info_size, width, height, _, bpp, compression = struct.unpack_from("<IiiHHI", data, 14)
+    if compression != 0:
+        raise ValueError(f"{path}: already compressed")
+    colors = struct.unpack_from("<I", data, 46)[0] or (1 << bpp if bpp <= 8 else 0)
+    bottom_up = height > 0
+    height = abs(height)
+    stride = (width * bpp + 31) // 32 * 4
+    rows = []
+    for row in range(height):
+        src = offset + (height - 1 - row if bottom_up else row) * stride
+        line = data[src : src + stride]
+        if bpp == 8:
+            rows.append(list(line[:width]))
+        elif bpp in (24, 32):
+            step = bpp // 8
+            rows.append([tuple(line[x * step : x * step + 3][::-1]) for x in range(width)])
+        else:
+            per_byte = 8 // bpp
+            mask = (1 << bpp) - 1
+            rows.append(
+                [
+                    line[x // per_byte] >> (8 - bpp * (x % per_byte + 1)) & mask
+                    for x in range(width)
+                ]
+            )
+    if bpp > 8:
+        return width, height, *quantize(rows)
+    at = 14 + info_size
+    palette = [tuple(data[at + 4 * i : at + 4 * i + 3][::-1]) for i in range(colors)]
+    return width, height, palette, rows
+
+
+def quantize(rows):
+    """Popularity palette for RGB rows."""
+    counts = Counter((r >> 3, g >> 3, b >> 3) for row in rows for r, g, b in row)
+    palette = [(r << 3 | r >> 2, g << 3 | g >> 2, b << 3 | b >> 2) for (r, g, b), _ in
+               counts.most_common(256)]
+    nearest = {}
+
+    def index(color):
+        key = (color[0] >> 3, color[1] >> 3, color[2] >> 3)
+        if key not in nearest:
+            nearest[key] = min(
+                range(len(palette)),
+                key=lambda i: sum((a - b) ** 2 for a, b in zip(palette[i], color)),
+            )
+        return nearest[key]
+
+    return palette, [[index(color) for color in row] for row in rows]
+
+
+def encode_row(row, rle4):
+    """One row of RLE8/RLE4 opcodes, without the end of line."""
+    out = bytearray()
+    i = 0
+    width = len(row)
+    while i < width:
+        run = 1
+        while i + run < width and run < 255 and row[i + run] == row[i]:
+            run += 1
+        if run >= 3 or width - i < 3:
+            out += bytes((run, row[i] * 17 if rle4 else row[i]))
+            i += run
+            continue
+        # Literal stretch, up to the next run of 3 or more.
+        end = i
+        while end < width and end - i < 255:
+            if end + 2 < width and row[end] == row[end + 1] == row[end + 2]:
+                break
+            end += 1
+        literal = row[i:end]
+        if len(literal) < 3:
+            for value in literal:
+                out += bytes((1, value * 17 if rle4 else value))
+        else:
+            out += bytes((0, len(literal)))
+            if rle4:
+                packed = bytes(
+                    literal[j] << 4 | (literal[j + 1] if j + 1 < len(literal) else 0)
+                    for j in range(0, len(literal), 2)
+                )
+            else:
+                packed = bytes(literal)
+            out += packed
+            if len(packed) & 1:
+                out.append(0)
+        i = end
+    return out
+
+
+def write_rle(path, width, height, palette, rows, rle4=False):
+    pixels = bytearray()
+    for row in reversed(rows):
+        pixels += encode_row(row, rle4)
+        pixels += b"\x00\x00"
+    pixels[-2:] = b"\x00\x01"
+    colors = 16 if rle4 else 256
+    palette = list(palette) + [(0, 0, 0)] * (colors - len(palette))
+    table = b"".join(bytes((b, g, r, 0)) for r, g, b in palette)
+    offset = 14 + 40 + len(table)
+    header = struct.pack("<2sIHHI", b"BM", offset + len(pixels), 0, 0, offset)
+    info = struct.pack(
+        "<IiiHHIIiiII",
+        40, width, height, 1, 4 if rle4 else 8, BI_RLE4 if rle4 else BI_RLE8,
+        len(pixels), 2835, 2835, colors, 0,
+    )
+    with open(path, "wb") as bmp:
+        bmp.write(header + info + table + pixels)
+    return offset + len(pixels)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 2:
+        sys.exit(__doc__)
+    rle4 = "--rle4" in sys.argv
+    width, height, palette, rows = read_bmp(args[0])
+    if rle4 and len(palette) > 16:
+        sys.exit(f"{args[0]} has {len(palette)} colors, too many for --rle4")
+    with open(args[0], "rb") as bmp:
+        before = len(bmp.read())
+    after = write_rle(args[1], width, height, palette, rows, rle4)
+    print(f"{args[0]}: {before} bytes -> {args[1]}: {after} bytes ({after * 100 // before}%)")
+
+
+if __name__ == "__main__":
+    main()
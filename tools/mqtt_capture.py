@@ -0,0 +1,175 @@
+"""Capture the MQTT traffic the clock gets into a compact log file.
+
+Subscribes to the broker the way the clock does and writes every message that
+comes in (topic, payload, QoS, retain flag, when) to a file that
+tools/sim_replay.py plays back against the clock in the simulator. Messages the
+clock publishes itself (status, alerts, ...) are left out.
+
+Log file: ``KCmq`` and a version byte, then one record per message:
+
+* milliseconds since the previous message (varint),
+* flags: bit 0 retain, bits 1-2 QoS, bit 3 new topic,
+* the topic: its index among the topics seen so far (varint), or for a new
+  topic its length (varint) and its UTF-8 bytes, which gives it the next index,
+* the payload: its length (varint) and its bytes.
+
+Run from the repo root (this is a host tool; it is not copied to the board). It
+needs paho-mqtt (``pip install paho-mqtt``):
+
+    python3 tools/mqtt_capture.py --host 192.168.10.238 --prefix matrix_portal \\
+        [--topic '/aio/#' ...] [--seconds N] capture.mqtt
+"""
+
+import argparse
+import sys
+import time
+
+MAGIC = b"KCmq"
+VERSION = 1
+RETAIN = 0x01
+NEW_TOPIC = 0x08
+
+# What the clock publishes, under its prefix: not part of what it gets.
+CLOCK_PUBLISHES = ("status", "alert", "log", "crash", "asset/status")
+
+
+def _write_varint(file, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        file.write(bytes((byte | 0x80 if value else byte,)))
+        if not value:
+            return
+
+
+def _read_varint(file):
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            raise EOFError
+        value |= (byte[0] & 0x7F) << shift
+        shift += 7
+        if not byte[0] & 0x80:
+            return value
+
+
+class CaptureWriter:
+    """Writes messages to a log file opened for binary writing, in the order
+    they came in.
+
+    :param file: The file; the header is written right away.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self._topics = {}
+        self._last_ms = 0
+        self.count = 0
+        file.write(MAGIC + bytes((VERSION,)))
+
+    def write(self, when, topic, payload, qos=0, retain=False):
+        """Add a message that came in at ``when`` seconds (from any starting point,
+        never going back)."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        when_ms = max(self._last_ms, round(when * 1000))
+        flags = (qos & 3) << 1 | (RETAIN if retain else 0)
+        index = self._topics.get(topic)
+        if index is None:
+            flags |= NEW_TOPIC
+        _write_varint(self._file, when_ms - self._last_ms if self.count else 0)
+        self._file.write(bytes((flags,)))
+        if index is None:
+            self._topics[topic] = len(self._topics)
+            encoded = topic.encode("utf-8")
+            _write_varint(self._file, len(encoded))
+            self._file.write(encoded)
+        else:
+            _write_varint(self._file, index)
+        _write_varint(self._file, len(payload))
+        self._file.write(payload)
+        self._last_ms = when_ms
+        self.count += 1
+
+
+def read_capture(file):
+    """The messages in a log file opened for binary reading, as
+    ``(seconds since the first one, topic, payload, qos, retain)``."""
+    header = file.read(len(MAGIC) + 1)
+    if header[: len(MAGIC)] != MAGIC:
+        raise ValueError("not an MQTT capture")
+    if header[len(MAGIC)] != VERSION:
+        raise ValueError(f"MQTT capture version {header[len(MAGIC)]}, not {VERSION}")
+    topics = []
+    when_ms = 0
+    while True:
+        try:
+            when_ms += _read_varint(file)
+        except EOFError:
+            return
+        flags = file.read(1)[0]
+        if flags & NEW_TOPIC:
+            topics.append(file.read(_read_varint(file)).decode("utf-8"))
+            topic = topics[-1]
+        else:
+            topic = topics[_read_varint(file)]
+        payload = file.read(_read_varint(file))
+        yield when_ms / 1000, topic, payload, flags >> 1 & 3, bool(flags & RETAIN)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("file", help="log file to write")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--prefix", default="/matrixportal", help="the clock's topic_prefix")
+    parser.add_argument(
+        "--topic",
+        action="append",
+        help="topic filter to capture, repeatable (default: the prefix's, /aio/# and /sensor/#)",
+    )
+    parser.add_argument("--seconds", type=float, help="stop after this long (default: Ctrl-C)")
+    args = parser.parse_args()
+
+    try:
+        import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        sys.exit("mqtt_capture: needs paho-mqtt (pip install paho-mqtt)")
+
+    topics = args.topic or [f"{args.prefix}/#", "/aio/#", "/sensor/#"]
+    skip = {f"{args.prefix}/{topic}" for topic in CLOCK_PUBLISHES}
+    try:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    except AttributeError:  # paho-mqtt 1.x
+        client = mqtt.Client()
+
+    with open(args.file, "wb") as file:
+        writer = CaptureWriter(file)
+        started = time.monotonic()
+
+        def on_message(_client, _userdata, msg):
+            if msg.topic in skip:
+                return
+            writer.write(time.monotonic() - started, msg.topic, msg.payload, msg.qos, msg.retain)
+            print(f"\r{args.file}: {writer.count} messages", end="")
+
+        client.on_message = on_message
+        client.connect(args.host, args.port)
+        for topic in topics:
+            # QoS 1, like the clock's subscriptions
+            client.subscribe(topic, 1)
+        client.loop_start()
+        try:
+            while args.seconds is None or time.monotonic() - started < args.seconds:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.loop_stop()
+            client.disconnect()
+    print(f"\n{args.file}: {writer.count} messages in {time.monotonic() - started:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Upload an image to the clock over MQTT (the sender's side of lib/asset_upload.py).
+
+The clock asks for each chunk in turn on ``<prefix>/asset/status``; this sends it
+on ``<prefix>/asset/data`` and waits for the next request. An upload that was
+cut off carries on where it stopped when it is started again.
+
+Run from the repo root (this is a host tool; it is not copied to the board). It
+needs paho-mqtt (``pip install paho-mqtt``):
+
+    python3 tools/send_asset.py --host 192.168.10.238 --prefix matrix_portal \\
+        bmps/fireworks_rle.bmp [--name fireworks]
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from binascii import crc32
+
+CHUNK_HEADER = ">II"
+
+
+class AssetSender:
+    """Answers the clock's status messages with chunks of ``data``.
+
+    :param str name: Name the image gets on the clock (no directory, no ``.bmp``).
+    :param bytes data: The BMP file.
+    :param publish: ``publish(subtopic, payload)``, with ``subtopic`` ``"begin"``
+                    or ``"data"``.
+    :param int chunk_size: Bytes per chunk.
+    """
+
+    def __init__(self, name, data, publish, chunk_size=1024):
+        self.name = name
+        self.data = bytes(data)
+        self.crc = crc32(self.data)
+        self.chunk_size = chunk_size
+        self._publish = publish
+        self.state = None
+        self.error = None
+        self.chunks = 0
+        self.offset = 0
+        self.first_offset = None
+
+    @property
+    def finished(self):
+        return self.state in ("done", "failed")
+
+    def begin(self):
+        self.state = None
+        self._publish(
+            "begin", json.dumps({"name": self.name, "size": len(self.data), "crc": self.crc})
+        )
+
+    def on_status(self, payload):
+        """Handle a message from ``<prefix>/asset/status``."""
+        status = json.loads(payload)
+        if status.get("name") != self.name:
+            return
+        self.state = status["state"]
+        if self.state == "failed":
+            self.error = status.get("error")
+        elif self.state == "ready":
+            self.offset = status["offset"]
+            if self.first_offset is None:
+                self.first_offset = self.offset
+            self.send_chunk(self.offset)
+
+    def send_chunk(self, offset):
+        chunk = self.data[offset : offset + self.chunk_size]
+        self._publish("data", struct.pack(CHUNK_HEADER, offset, crc32(chunk)) + chunk)
+        self.chunks += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("file", help="BMP to upload")
+    parser.add_argument("--name", help="name on the clock (default: the file's, without .bmp)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--prefix", default="/matrixportal", help="the clock's topic_prefix")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the clock")
+    args = parser.parse_args()
+
+    try:
+        import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        sys.exit("send_asset: needs paho-mqtt (pip install paho-mqtt)")
+
+    name = args.name or os.path.splitext(os.path.basename(args.file))[0]
+    with open(args.file, "rb") as file:
+        data = file.read()
+
+    try:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    except AttributeError:  # paho-mqtt 1.x
+        client = mqtt.Client()
+    sender = AssetSender(
+        name,
+        data,
+        lambda subtopic, payload: client.publish(f"{args.prefix}/asset/{subtopic}", payload),
+        args.chunk_size,
+    )
+    heard = [time.monotonic()]
+
+    def on_message(_client, _userdata, msg):
+        heard[0] = time.monotonic()
+        sender.on_status(msg.payload)
+        if sender.state == "ready":
+            print(f"\r{name}: {sender.offset}/{len(data)} bytes", end="")
+
+    client.on_message = on_message
+    client.connect(args.host, args.port)
+    client.subscribe(f"{args.prefix}/asset/status")
+    client.loop_start()
+    sender.begin()
+    try:
+        while not sender.finished:
+            if time.monotonic() - heard[0] > args.timeout:
+                sys.exit(f"\n{name}: no answer from the clock in {args.timeout} s")
+            time.sleep(0.1)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    if sender.state == "failed":
+        sys.exit(f"\n{name}: failed: {sender.error}")
+    print(f"\n{name}: done, {len(data)} bytes in {sender.chunks} chunks")
+
+
+if __name__ == "__main__":
+    main()
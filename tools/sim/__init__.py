@@ -0,0 +1,17 @@
+"""Headless simulator for kitchen_clock.py.
+
+Fake CircuitPython modules live in ``fakes/`` and shadow the real ones while the
+clock runs; MiniMQTT and everything else in ``lib/`` is the real code. Time is
+virtual: it only moves when the clock sleeps or waits on its socket, so a day of
+uptime runs in however long the clock's own code takes.
+
+    from sim import Simulation
+
+    sim = Simulation(secrets={"matrix_width": 128})
+    sim.publish(1, "/aio/local_time", "2021-05-18 23:23:36.339 138 2 -0500 EST")
+    sim.at(5, lambda: print(sim.display.render()[:8]))
+    sim.run(until=10)
+"""
+
+from .broker import FakeBroker, FakeSocket, encode_publish, topic_matches
+from .core import RTC_EPOCH, Simulation, SimulationDone, VirtualClock, ascii_frame
@@ -0,0 +1,264 @@
+"""In-process MQTT 3.1.1 broker for one client, speaking real bytes to MiniMQTT."""
+
+import errno
+import struct
+
+PUBLISH = 0x30
+# How far past its timeout a read with nothing to read returns.
+TIMEOUT_OVERSHOOT = 0.002
+
+
+def topic_matches(sub, topic):
+    """MQTT topic filter match, with ``+`` and ``#`` wildcards."""
+    sub_parts = sub.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(sub_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(sub_parts) == len(topic_parts)
+
+
+def encode_packet(first_byte, body):
+    header = bytearray((first_byte,))
+    length = len(body)
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(header) + body
+
+
+def encode_publish(topic, payload, qos=0, retain=False, pid=1, dup=False):
+    topic = topic.encode("utf-8")
+    body = struct.pack("!H", len(topic)) + topic
+    if qos:
+        body += struct.pack("!H", pid)
+    return encode_packet(PUBLISH | int(dup) << 3 | qos << 1 | int(retain), body + payload)
+
+
+class FakeSocket:
+    """One connection. Reading with nothing buffered waits on the virtual clock for
+    up to ``timeout`` seconds, like esp32spi, then raises OSError(ETIMEDOUT)."""
+
+    def __init__(self, broker):
+        self._broker = broker
+        self._clock = broker.clock
+        self.rx = bytearray()
+        self.tx = bytearray()
+        self.timeout = None
+        self.closed = False
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def connect(self, _address):
+        self._broker.accept(self)
+
+    def _available(self):
+        """Bytes waiting, like the esp32spi socket's (one SPI round trip)."""
+        if self.closed:
+            return 0
+        self._broker.polls += 1
+        return len(self.rx)
+
+    def send(self, data):
+        if self.closed:
+            raise OSError(errno.ENOTCONN, "ENOTCONN")
+        self.tx += data
+        self._broker.handle(self)
+        return len(data)
+
+    def recv_into(self, buf, nbytes=0):
+        if self.closed:
+            raise OSError(errno.ENOTCONN, "ENOTCONN")
+        nbytes = nbytes or len(buf)
+        if not nbytes:
+            return 0
+        self._broker.reads += 1
+        if not self.rx:
+            self._clock.advance(self.timeout or 0, until=lambda: self.rx or self.closed)
+            if self.closed:
+                raise OSError(errno.ENOTCONN, "ENOTCONN")
+            if not self.rx:
+                # The esp32spi socket polls the coprocessor until the timeout
+                # has passed, so it gives up a little after it, not on it.
+                self._clock.advance(TIMEOUT_OVERSHOOT)
+                self._broker.timeouts += 1
+                raise OSError(errno.ETIMEDOUT, "ETIMEDOUT")
+        count = min(nbytes, len(self.rx))
+        buf[:count] = self.rx[:count]
+        del self.rx[:count]
+        return count
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBroker:
+    """Accepts the clock's connection, answers CONNECT/SUBSCRIBE/PINGREQ, records
+    what the clock publishes and delivers what the simulation publishes.
+
+    ``published`` holds (time, topic, payload) for every message from the clock;
+    ``on_publish(topic, payload)``, if set, is called with each one as it comes in.
+    QoS 1 ones are acknowledged ``puback_delay`` seconds later (a round trip).
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, clock):
+        self.clock = clock
+        self.client = None
+        self.refuse = False
+        self.subscriptions = {}
+        self.retained = {}
+        self.published = []
+        self.connects = 0
+        self.undelivered = 0
+        # recv_into() calls on the clock's sockets (on the board, SPI round trips that
+        # allocate what they read), how many of them timed out (allocating an
+        # exception instead), and _available() calls (SPI round trips too)
+        self.reads = 0
+        self.timeouts = 0
+        self.polls = 0
+        # PUBLISH packets sent to the clock
+        self.delivered = 0
+        self.on_publish = None
+        self.puback_delay = 0
+        self.pubacks_received = 0
+        # (topic, payload, qos, pid) of the last QoS 1 messages sent to the clock
+        self._sent = []
+        self._pid = 0
+
+    def socket(self):
+        """A new, unconnected socket; connecting it makes it the client."""
+        return FakeSocket(self)
+
+    def accept(self, sock):
+        if self.refuse:
+            raise OSError(errno.ECONNREFUSED, "ECONNREFUSED")
+        if self.client:
+            self.client.close()
+        self.client = sock
+        self.subscriptions = {}
+
+    def drop(self):
+        """Cut the connection, like the WiFi going away."""
+        if self.client:
+            self.client.close()
+            self.client = None
+
+    def connected(self):
+        return self.client is not None and not self.client.closed
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Send to the clock, if it's subscribed. Returns True if delivered."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if retain:
+            self.retained[topic] = payload
+        if not self.connected():
+            self.undelivered += 1
+            return False
+        for sub, granted in self.subscriptions.items():
+            if topic_matches(sub, topic):
+                self._deliver(topic, payload, min(qos, granted))
+                return True
+        self.undelivered += 1
+        return False
+
+    def _deliver(self, topic, payload, qos):
+        self._pid = self._pid % 0xFFFF + 1
+        self.delivered += 1
+        self.client.rx += encode_publish(topic, payload, qos, pid=self._pid)
+        if qos:
+            self._sent = self._sent[-7:] + [(topic, payload, qos, self._pid)]
+
+    def redeliver(self, count=1):
+        """Send the last ``count`` QoS 1 messages again with DUP set, as a broker
+        does when it hasn't seen their PUBACK."""
+        if not self.connected():
+            return
+        for topic, payload, qos, pid in self._sent[-count:]:
+            self.client.rx += encode_publish(topic, payload, qos, pid=pid, dup=True)
+
+    def _puback(self, sock, pid):
+        if not sock.closed:
+            sock.rx += b"\x40\x02" + pid
+
+    def handle(self, sock):
+        """Process every complete packet the client has sent so far."""
+        while True:
+            packet = self._take_packet(sock.tx)
+            if packet is None:
+                return
+            first_byte, body = packet
+            self._dispatch(sock, first_byte, body)
+
+    @staticmethod
+    def _take_packet(data):
+        length = shift = 0
+        pos = 1
+        while True:
+            if pos >= len(data):
+                return None
+            byte = data[pos]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            pos += 1
+            if not byte & 0x80:
+                break
+        if len(data) < pos + length:
+            return None
+        packet = (data[0], bytes(data[pos : pos + length]))
+        del data[: pos + length]
+        return packet
+
+    def _dispatch(self, sock, first_byte, body):
+        kind = first_byte & 0xF0
+        if kind == 0x10:  # CONNECT
+            self.connects += 1
+            sock.rx += b"\x20\x02\x00\x00"
+        elif kind == PUBLISH:
+            qos = (first_byte >> 1) & 3
+            topic_len = struct.unpack_from("!H", body)[0]
+            topic = body[2 : 2 + topic_len].decode("utf-8")
+            pos = 2 + topic_len
+            if qos:
+                pid = body[pos : pos + 2]
+                pos += 2
+                if self.puback_delay:
+                    self.clock.at(
+                        self.clock.now + self.puback_delay, lambda: self._puback(sock, pid)
+                    )
+                else:
+                    self._puback(sock, pid)
+            self.published.append((self.clock.now, topic, body[pos:]))
+            if self.on_publish:
+                self.on_publish(topic, body[pos:])
+        elif kind == 0x40:  # PUBACK
+            self.pubacks_received += 1
+        elif kind == 0x80:  # SUBSCRIBE
+            pid = body[:2]
+            pos = 2
+            granted = bytearray()
+            new_topics = []
+            while pos < len(body):
+                topic_len = struct.unpack_from("!H", body, pos)[0]
+                topic = body[pos + 2 : pos + 2 + topic_len].decode("utf-8")
+                qos = body[pos + 2 + topic_len]
+                pos += 3 + topic_len
+                self.subscriptions[topic] = qos
+                granted.append(qos)
+                new_topics.append(topic)
+            sock.rx += encode_packet(0x90, pid + granted)
+            for topic, payload in self.retained.items():
+                if any(topic_matches(sub, topic) for sub in new_topics):
+                    self._deliver(topic, payload, 0)
+        elif kind == 0xA0:  # UNSUBSCRIBE
+            sock.rx += b"\xb0\x02" + body[:2]
+        elif kind == 0xC0:  # PINGREQ
+            sock.rx += b"\xd0\x00"
+        elif kind == 0xE0:  # DISCONNECT
+            sock.close()
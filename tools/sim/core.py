@@ -0,0 +1,301 @@
+"""Virtual clock and the harness that runs kitchen_clock.py against the fakes."""
+
+import calendar
+import collections
+import contextlib
+import gc as host_gc
+import heapq
+import io
+import os
+import random
+import sys
+import time as host_time
+import tracemalloc
+import types
+
+from .broker import FakeBroker
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FAKES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakes")
+LIB = os.path.join(REPO, "lib")
+
+# CircuitPython's RTC starts out at 2000-01-01 00:00:00.
+RTC_EPOCH = 946684800
+
+DEFAULT_SECRETS = {
+    "ssid": "sim",
+    "password": "sim",
+    "broker": "sim-broker",
+    "broker_user": "sim",
+    "broker_pass": "sim",
+    "topic_prefix": "/matrixportal",
+}
+
+
+class SimulationDone(BaseException):
+    """Raised from inside the clock's code when virtual time runs out."""
+
+
+class VirtualClock:
+    """Monotonic time that only moves when the code under test waits, plus
+    events scheduled at given times."""
+
+    # Virtual time each read of the clock costs, so busy-waits on it finish.
+    READ_COST = 0.000001
+
+    def __init__(self):
+        self.now = 0.0
+        self.end = None
+        self._rtc_base = RTC_EPOCH
+        self._events = []
+        self._seq = 0
+
+    def read(self):
+        self.now += self.READ_COST
+        return self.now
+
+    def at(self, when, fun):
+        """Run ``fun()`` once virtual time reaches ``when``."""
+        heapq.heappush(self._events, (when, self._seq, fun))
+        self._seq += 1
+
+    def advance(self, seconds, until=None):
+        """Move forward by ``seconds``, running due events on the way. Stops early,
+        returning True, as soon as ``until()`` is true after an event."""
+        target = self.now + seconds
+        while self._events and self._events[0][0] <= target:
+            when, _, fun = heapq.heappop(self._events)
+            self.now = max(self.now, when)
+            self._check_end()
+            fun()
+            if until is not None and until():
+                return True
+        self.now = target
+        self._check_end()
+        return False
+
+    def _check_end(self):
+        if self.end is not None and self.now >= self.end:
+            raise SimulationDone()
+
+    def time(self):
+        return int(self._rtc_base + self.now + 1e-6)
+
+    def set_rtc(self, epoch):
+        self._rtc_base = epoch - self.now
+
+
+def _time_module(clock):
+    module = types.ModuleType("time")
+    module.__dict__.update(
+        monotonic=clock.read,
+        monotonic_ns=lambda: int(clock.read() * 1000000000),
+        sleep=clock.advance,
+        time=clock.time,
+        # Local time is UTC on the board: the RTC is set to local time directly.
+        localtime=lambda secs=None: host_time.gmtime(clock.time() if secs is None else secs),
+        gmtime=lambda secs=None: host_time.gmtime(clock.time() if secs is None else secs),
+        mktime=lambda t: calendar.timegm(tuple(t)[:6]),
+        struct_time=host_time.struct_time,
+        # Not on CircuitPython; the fakes use it to time rendering on the host.
+        perf_counter=host_time.perf_counter,
+    )
+    return module
+
+
+class _Heap:
+    """gc module for the clock. Sizes come from tracemalloc when it's tracing."""
+
+    def __init__(self, size):
+        self.size = size
+        self.collections = 0
+
+    def module(self):
+        module = types.ModuleType("gc")
+        module.__dict__.update(
+            collect=self.collect,
+            mem_alloc=self.mem_alloc,
+            mem_free=self.mem_free,
+            enable=lambda: None,
+            disable=lambda: None,
+            isenabled=lambda: True,
+            threshold=lambda *_args: -1,
+        )
+        return module
+
+    def collect(self):
+        self.collections += 1
+        host_gc.collect(0)
+
+    def mem_alloc(self):
+        if tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return 0
+
+    def mem_free(self):
+        return max(0, self.size - self.mem_alloc())
+
+
+class _Tail(io.TextIOBase):
+    """Keeps the last lines the clock printed."""
+
+    def __init__(self, lines):
+        self.lines = collections.deque(maxlen=lines)
+        self._partial = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        text = self._partial + text
+        *lines, self._partial = text.split("\n")
+        self.lines.extend(lines)
+        return len(text)
+
+
+class Simulation:
+    """Runs ``kitchen_clock.py`` headless on a virtual clock.
+
+    :param dict secrets: Entries to add to or override in the default secrets.
+    :param int seed: Seed for ``random`` (MiniMQTT's client id).
+    :param bool quiet: Keep the clock's output in ``output`` instead of printing it.
+    :param int heap_size: What ``gc.mem_free()`` counts down from.
+    :param bool composite: Composite every refresh into ``display.frame``. Off, a
+                           refresh leaves the frame alone (``display.render()``
+                           still composites), which makes long runs much faster.
+
+    Schedule traffic and checks with `at` and `publish`, then `run`. Callbacks run
+    inside the clock's own waits, so ``sim.module`` has its live globals.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self, *, secrets=None, seed=0, quiet=True, heap_size=64 * 1024 * 1024, composite=True
+    ):
+        self.clock = VirtualClock()
+        self.broker = FakeBroker(self.clock)
+        self.secrets = dict(DEFAULT_SECRETS, **(secrets or {}))
+        self.seed = seed
+        self.quiet = quiet
+        self.heap = _Heap(heap_size)
+        self.composite = composite
+        self.nvm = bytearray(8192)
+        self.module = None
+        self.boots = 0
+        self._reset_reason = None
+        self.output = _Tail(200)
+
+    @property
+    def now(self):
+        return self.clock.now
+
+    @property
+    def display(self):
+        return self.module.matrixportal.display
+
+    def at(self, when, fun):
+        """Call ``fun()`` at virtual time ``when``."""
+        self.clock.at(when, fun)
+
+    def every(self, interval, fun, start=0.0):
+        """Call ``fun()`` every ``interval`` seconds from ``start`` on."""
+
+        def tick(when=start):
+            fun()
+            self.clock.at(when + interval, lambda: tick(when + interval))
+
+        self.clock.at(start, tick)
+
+    def publish(self, when, topic, payload, retain=False):
+        """Have the broker publish to the clock at virtual time ``when``."""
+        self.clock.at(when, lambda: self.broker.publish(topic, payload, retain=retain))
+
+    def watchdog_reset(self):
+        """Reboot the clock the way its watchdog does: right now, wherever it is,
+        with ``microcontroller.cpu.reset_reason`` WATCHDOG on the next boot."""
+        self._reset_reason = "WATCHDOG"
+        raise sys.modules["microcontroller"].SimReset()
+
+    def run(self, until):
+        """Boot the clock and run it until virtual time ``until``. A call to
+        ``microcontroller.reset()`` reboots it and carries on."""
+        self.clock.end = until
+        with self._environment():
+            while True:
+                try:
+                    self._boot()
+                except SimulationDone:
+                    return self
+                except BaseException as err:  # pylint: disable=broad-except
+                    if type(err).__name__ != "SimReset":
+                        raise
+
+    def _boot(self):
+        for name in [name for name in sys.modules if name not in self._host_modules]:
+            del sys.modules[name]
+        self._install_modules()
+        # pylint: disable=import-outside-toplevel, import-error
+        import adafruit_connection_manager
+        import framebufferio
+        import microcontroller
+        import rtc
+
+        adafruit_connection_manager.broker = self.broker
+        framebufferio.composite = self.composite
+        rtc.clock = self.clock
+        self.clock.set_rtc(RTC_EPOCH)
+        microcontroller.nvm = self.nvm
+        if self.boots:
+            microcontroller.cpu.reset_reason = getattr(
+                microcontroller.ResetReason, self._reset_reason or "SOFTWARE"
+            )
+            self._reset_reason = None
+        self.boots += 1
+
+        path = os.path.join(REPO, "kitchen_clock.py")
+        self.module = types.ModuleType("kitchen_clock")
+        self.module.__file__ = path
+        sys.modules["kitchen_clock"] = self.module
+        with open(path, encoding="utf-8") as source:
+            code = compile(source.read(), path, "exec")
+        exec(code, self.module.__dict__)  # pylint: disable=exec-used
+
+    def _install_modules(self):
+        secrets = types.ModuleType("secrets")
+        secrets.secrets = self.secrets
+        sys.modules["secrets"] = secrets
+        sys.modules["time"] = _time_module(self.clock)
+        sys.modules["gc"] = self.heap.module()
+
+    @contextlib.contextmanager
+    def _environment(self):
+        saved_path = list(sys.path)
+        saved_modules = dict(sys.modules)
+        saved_cwd = os.getcwd()
+        sys.path[:0] = [FAKES, LIB, REPO]
+        self._host_modules = set(saved_modules) - {"secrets", "time", "gc"}
+        os.chdir(REPO)
+        random.seed(self.seed)
+        try:
+            if self.quiet:
+                with contextlib.redirect_stdout(self.output):
+                    yield
+            else:
+                yield
+        finally:
+            for name in list(sys.modules):
+                if name not in saved_modules:
+                    del sys.modules[name]
+            sys.modules.update(saved_modules)
+            sys.path[:] = saved_path
+            os.chdir(saved_cwd)
+
+
+def ascii_frame(display, frame=None):
+    """The display as text, one character per pixel: ``#`` lit, ``.`` off."""
+    frame = display.render() if frame is None else frame
+    width = display.width
+    return "\n".join(
+        "".join("#" if pixel else "." for pixel in frame[row : row + width])
+        for row in range(0, len(frame), width)
+    )
@@ -0,0 +1,86 @@
+"""BDF fonts for the simulation, parsed whole so text can be drawn for real."""
+
+from collections import namedtuple
+
+Glyph = namedtuple("Glyph", "bitmap width height dx dy shift_x shift_y pixels")
+
+_cache = {}
+
+
+class BDFFont:
+    def __init__(self, path):
+        self._glyphs = {}
+        self.ascent = 0
+        self._bounding_box = (0, 0, 0, 0)
+        self._parse(path)
+
+    def _parse(self, path):
+        # pylint: disable=too-many-branches
+        code = shift_x = bbx = None
+        rows = None
+        with open(path, encoding="utf-8") as bdf:
+            for line in bdf:
+                words = line.split()
+                if not words:
+                    continue
+                key = words[0]
+                if key == "FONTBOUNDINGBOX":
+                    self._bounding_box = tuple(int(w) for w in words[1:5])
+                elif key == "FONT_ASCENT":
+                    self.ascent = int(words[1])
+                elif key == "ENCODING":
+                    code = int(words[1])
+                elif key == "DWIDTH":
+                    shift_x = int(words[1])
+                elif key == "BBX":
+                    bbx = tuple(int(w) for w in words[1:5])
+                elif key == "BITMAP":
+                    rows = []
+                elif key == "ENDCHAR":
+                    width, height, dx, dy = bbx
+                    pixels = []
+                    for y, row in enumerate(rows):
+                        bits = int(row, 16)
+                        nbits = len(row) * 4
+                        for x in range(width):
+                            if bits >> (nbits - 1 - x) & 1:
+                                pixels.append((x, y))
+                    self._glyphs[code] = Glyph(None, width, height, dx, dy, shift_x, 0, pixels)
+                    rows = None
+                elif rows is not None:
+                    rows.append(key)
+
+    def get_glyph(self, code):
+        return self._glyphs.get(code)
+
+    def load_glyphs(self, code_points):
+        pass
+
+    def get_bounding_box(self):
+        return self._bounding_box
+
+
+class BlockFont:
+    """Stand-in for terminalio.FONT: every character is a 5x8 block, 6 wide."""
+
+    ascent = 8
+
+    def __init__(self):
+        pixels = [(x, y) for y in range(8) for x in range(5)]
+        self._glyph = Glyph(None, 5, 8, 0, 0, 6, 0, pixels)
+        self._space = Glyph(None, 5, 8, 0, 0, 6, 0, [])
+
+    def get_glyph(self, code):
+        return self._space if code == 32 else self._glyph
+
+    def load_glyphs(self, code_points):
+        pass
+
+    def get_bounding_box(self):
+        return (6, 12, 0, -2)
+
+
+def load_font(path):
+    if path not in _cache:
+        _cache[path] = BDFFont(path)
+    return _cache[path]
@@ -0,0 +1,49 @@
+"""Hands out sockets from the simulation's fake broker."""
+
+# Set by the simulation to its FakeBroker.
+broker = None
+
+
+class _SocketPool:
+    """Stands in for the esp32spi socket pool. No ``timeout`` attribute, so
+    MiniMQTT treats it like esp32spi: a read with no data raises OSError(ETIMEDOUT)."""
+
+    AF_INET = 2
+    SOCK_STREAM = 1
+
+    def socket(self, family=AF_INET, type=SOCK_STREAM):  # pylint: disable=redefined-builtin
+        return broker.socket()
+
+
+class _ConnectionManager:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def get_socket(self, host, port, proto, session_id=None, *, timeout=1, **_kwargs):
+        # Like the real one: a socket from the pool, its timeout set, then connected.
+        sock = self.pool.socket(self.pool.AF_INET, self.pool.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect((host, port))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def close_socket(self, sock):
+        sock.close()
+
+
+_pool = _SocketPool()
+
+
+def get_radio_socketpool(radio):
+    return _pool
+
+
+def get_radio_ssl_context(radio):
+    return None
+
+
+def get_connection_manager(socket_pool):
+    return _ConnectionManager(socket_pool)
@@ -0,0 +1,54 @@
+"""Simulated Label: draws glyphs from the font with y at the text's vertical middle."""
+
+import displayio
+
+
+class Label(displayio.Group):
+    def __init__(self, font, *, text="", color=0xFFFFFF, x=0, y=0, **_kwargs):
+        super().__init__(x=x, y=y)
+        self._font = font
+        self.font = font
+        self._text = str(text)
+        self.color = color
+
+    def __bool__(self):
+        # The real Label always holds its TileGrid, so it's never an empty Group.
+        return True
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = str(value)
+
+    @property
+    def bounding_box(self):
+        width = 0
+        for char in self._text:
+            glyph = self._font.get_glyph(ord(char))
+            if glyph:
+                width += glyph.shift_x
+        height = self._font.ascent
+        return (0, -height // 2, width, height)
+
+    def _render(self, frame, frame_width, frame_height, ox, oy):
+        if self.color is None:
+            return 0
+        visited = 0
+        cursor = ox + self.x
+        baseline = oy + self.y + self._font.ascent // 2
+        for char in self._text:
+            glyph = self._font.get_glyph(ord(char))
+            if not glyph:
+                continue
+            top = baseline - glyph.dy - glyph.height
+            visited += len(glyph.pixels)
+            for gx, gy in glyph.pixels:
+                px = cursor + glyph.dx + gx
+                py = top + gy
+                if 0 <= px < frame_width and 0 <= py < frame_height:
+                    frame[py * frame_width + px] = self.color
+            cursor += glyph.shift_x
+        return visited
@@ -0,0 +1,18 @@
+"""Simulated ESP32 co-processor: always connected."""
+
+
+class ESP_SPIcontrol:  # pylint: disable=invalid-name
+    def __init__(self, spi, cs_dio, ready_dio, reset_dio, gpio0_dio=None, **_kwargs):
+        self.firmware_version = bytearray(b"1.7.7\x00")
+        self.ip_address = bytes((10, 0, 0, 2))
+        self.is_connected = True
+
+    def reset(self):
+        pass
+
+    def connect(self, secrets):
+        self.is_connected = True
+
+    @staticmethod
+    def pretty_ip(ip):
+        return ".".join(str(octet) for octet in ip)
@@ -0,0 +1,13 @@
+"""Simulated WiFi manager."""
+
+
+class ESPSPI_WiFiManager:  # pylint: disable=invalid-name
+    def __init__(self, esp, secrets, status_pixel=None, **_kwargs):
+        self.esp = esp
+        self.secrets = secrets
+
+    def connect(self):
+        self.esp.connect(self.secrets)
+
+    def ip_address(self):
+        return self.esp.pretty_ip(self.esp.ip_address)
@@ -0,0 +1,103 @@
+"""Enough of adafruit_logging for kitchen_clock and MiniMQTT."""
+
+import sys
+import time
+from collections import namedtuple
+
+NOTSET = 0
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+CRITICAL = 50
+
+LEVELS = {
+    NOTSET: "NOTSET",
+    DEBUG: "DEBUG",
+    INFO: "INFO",
+    WARNING: "WARNING",
+    ERROR: "ERROR",
+    CRITICAL: "CRITICAL",
+}
+
+LogRecord = namedtuple("LogRecord", "name levelno levelname msg created args")
+
+
+class Handler:
+    def __init__(self, level=NOTSET):
+        self.level = level
+
+    def format(self, record):
+        return f"{record.created:<0.3f}: {record.levelname} - {record.msg}"
+
+    def emit(self, record):
+        pass
+
+
+class StreamHandler(Handler):
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream
+
+    def emit(self, record):
+        stream = self.stream or sys.stdout
+        stream.write(self.format(record) + "\n")
+
+
+class Logger:
+    def __init__(self, name, level=WARNING):
+        self.name = name
+        self._level = level
+        self._handlers = []
+
+    def setLevel(self, level):  # pylint: disable=invalid-name
+        self._level = level
+
+    def getEffectiveLevel(self):  # pylint: disable=invalid-name
+        return self._level
+
+    def isEnabledFor(self, level):  # pylint: disable=invalid-name
+        return level >= self._level
+
+    def addHandler(self, handler):  # pylint: disable=invalid-name
+        self._handlers.append(handler)
+
+    def removeHandler(self, handler):  # pylint: disable=invalid-name
+        self._handlers.remove(handler)
+
+    def log(self, level, msg, *args):
+        if level < self._level:
+            return
+        record = LogRecord(
+            self.name, level, LEVELS.get(level, str(level)), msg % args if args else msg,
+            time.monotonic(), args,
+        )
+        for handler in self._handlers:
+            handler.emit(record)
+
+    def debug(self, msg, *args):
+        self.log(DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self.log(WARNING, msg, *args)
+
+    def error(self, msg, *args):
+        self.log(ERROR, msg, *args)
+
+    def critical(self, msg, *args):
+        self.log(CRITICAL, msg, *args)
+
+    def exception(self, err):
+        self.log(ERROR, str(err))
+
+
+_loggers = {}
+
+
+def getLogger(name=None):  # pylint: disable=invalid-name
+    if name not in _loggers:
+        _loggers[name] = Logger(name)
+    return _loggers[name]
@@ -0,0 +1,47 @@
+"""The parts of bitmaptools the clock uses, on the fake displayio.Bitmap."""
+
+
+def fill_region(dest_bitmap, x1, y1, x2, y2, value):
+    for y in range(max(0, y1), min(y2, dest_bitmap.height)):
+        for x in range(max(0, x1), min(x2, dest_bitmap.width)):
+            dest_bitmap[x, y] = value
+
+
+def arrayblit(bitmap, data, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+    x2 = bitmap.width if x2 is None else x2
+    y2 = bitmap.height if y2 is None else y2
+    width = x2 - x1
+    if len(data) < width * (y2 - y1):
+        raise ValueError("data is too short")
+    for y in range(y1, y2):
+        for x in range(x1, x2):
+            value = data[(y - y1) * width + (x - x1)]
+            if value != skip_index:
+                bitmap[x, y] = value
+
+
+def readinto(
+    bitmap,
+    file,
+    bits_per_pixel,
+    element_size=1,
+    reverse_pixels_in_element=False,
+    swap_bytes_in_element=False,
+    reverse_rows=False,
+):
+    # Only what the clock uses: whole bytes of 1 to 8 bit pixels, no swapping.
+    if element_size != 1 or swap_bytes_in_element or bits_per_pixel > 8:
+        raise NotImplementedError("only element_size=1, up to 8 bits per pixel")
+    row_bytes = (bitmap.width * bits_per_pixel + 7) // 8
+    per_byte = 8 // bits_per_pixel
+    mask = (1 << bits_per_pixel) - 1
+    rows = range(bitmap.height - 1, -1, -1) if reverse_rows else range(bitmap.height)
+    for y in rows:
+        data = file.read(row_bytes)
+        if len(data) < row_bytes:
+            raise EOFError()
+        for x in range(bitmap.width):
+            slot = x % per_byte
+            if reverse_pixels_in_element:
+                slot = per_byte - 1 - slot
+            bitmap[x, y] = data[x // per_byte] >> (slot * bits_per_pixel) & mask
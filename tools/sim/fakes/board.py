@@ -0,0 +1,28 @@
+"""Pin names for the simulated MatrixPortal M4."""
+
+NEOPIXEL = "NEOPIXEL"
+L = "L"
+D13 = "D13"
+SCK = "SCK"
+MOSI = "MOSI"
+MISO = "MISO"
+BUTTON_UP = "BUTTON_UP"
+BUTTON_DOWN = "BUTTON_DOWN"
+ESP_BUSY = "ESP_BUSY"
+ESP_GPIO0 = "ESP_GPIO0"
+ESP_RESET = "ESP_RESET"
+ESP_CS = "ESP_CS"
+MTX_R1 = "MTX_R1"
+MTX_G1 = "MTX_G1"
+MTX_B1 = "MTX_B1"
+MTX_R2 = "MTX_R2"
+MTX_G2 = "MTX_G2"
+MTX_B2 = "MTX_B2"
+MTX_ADDRA = "MTX_ADDRA"
+MTX_ADDRB = "MTX_ADDRB"
+MTX_ADDRC = "MTX_ADDRC"
+MTX_ADDRD = "MTX_ADDRD"
+MTX_ADDRE = "MTX_ADDRE"
+MTX_CLK = "MTX_CLK"
+MTX_LAT = "MTX_LAT"
+MTX_OE = "MTX_OE"
@@ -0,0 +1,261 @@
+"""Headless displayio: the objects kitchen_clock uses, composited in Python.
+
+Rendering is pixel exact for Bitmaps, Palettes and TileGrids (including
+OnDiskBitmap sprite sheets); text comes from the fake Label. Colors are RGB888
+ints and a frame is a flat list of them, row by row.
+"""
+
+import struct
+from array import array
+
+
+def release_displays():
+    pass
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        if value_count <= 256:
+            self._data = bytearray(width * height)
+        else:
+            self._data = array("I", bytes(4 * width * height))
+
+    def _index(self, key):
+        if isinstance(key, tuple):
+            x, y = key
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise IndexError("pixel out of bounds")
+            return y * self.width + x
+        return key
+
+    def __getitem__(self, key):
+        return self._data[self._index(key)]
+
+    def __setitem__(self, key, value):
+        if not 0 <= value < self.value_count:
+            raise ValueError("value out of range")
+        self._data[self._index(key)] = value
+
+    def __len__(self):
+        return self.width * self.height
+
+    def fill(self, value):
+        for i in range(len(self._data)):
+            self._data[i] = value
+
+    def _row(self, y):
+        return self._data[y * self.width : (y + 1) * self.width]
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = [False] * color_count
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __setitem__(self, index, color):
+        if isinstance(color, (tuple, list)):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        elif isinstance(color, (bytes, bytearray)):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        self._colors[index] = color
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def make_transparent(self, index):
+        self._transparent[index] = True
+
+    def make_opaque(self, index):
+        self._transparent[index] = False
+
+    def is_transparent(self, index):
+        return self._transparent[index]
+
+    def _lut(self):
+        return [None if t else c for c, t in zip(self._colors, self._transparent)]
+
+
+class ColorConverter:
+    def __init__(self, *, input_colorspace=None, dither=False):
+        self.transparent_color = None
+
+    def convert(self, color):
+        return color
+
+    def make_transparent(self, color):
+        self.transparent_color = color
+
+    def _lut(self):
+        return None
+
+
+# BMP file contents -> pixels: decoding in Python is slow, and runs that go on
+# for hours open the same few images over and over.
+_decoded = {}
+
+
+class OnDiskBitmap:
+    """Uncompressed BMP, decoded up front (the real one reads from flash as it draws)."""
+
+    def __init__(self, file):
+        if isinstance(file, str):
+            with open(file, "rb") as bmp:
+                data = bmp.read()
+        else:
+            file.seek(0)
+            data = file.read()
+        if data[:2] != b"BM":
+            raise ValueError("Invalid BMP file")
+        offset = struct.unpack_from("<I", data, 10)[0]
+        header_size = struct.unpack_from("<I", data, 14)[0]
+        width, height, _, bpp, compression = struct.unpack_from("<iiHHI", data, 18)
+        if compression != 0:
+            raise ValueError("Only uncompressed BMP files are supported")
+        colors = struct.unpack_from("<I", data, 46)[0] or (1 << bpp if bpp <= 8 else 0)
+        bottom_up = height > 0
+        height = abs(height)
+        self.width = width
+        self.height = height
+
+        if bpp <= 8:
+            self.pixel_shader = Palette(colors)
+            palette_at = 14 + header_size
+            for i in range(colors):
+                b, g, r = data[palette_at + 4 * i : palette_at + 4 * i + 3]
+                self.pixel_shader[i] = (r << 16) | (g << 8) | b
+        else:
+            self.pixel_shader = ColorConverter()
+
+        decoded = _decoded.get(data)
+        if decoded is None:
+            decoded = _decoded[data] = self._decode(data, offset, bpp, bottom_up)
+        self._data = array("I", decoded)
+
+    def _decode(self, data, offset, bpp, bottom_up):
+        width, height = self.width, self.height
+        pixels = array("I", [0]) * (width * height)
+        stride = ((width * bpp + 31) // 32) * 4
+        per_byte = 8 // bpp if bpp < 8 else 0
+        for row in range(height):
+            src = offset + (height - 1 - row if bottom_up else row) * stride
+            dst = row * width
+            for x in range(width):
+                if bpp == 24:
+                    b, g, r = data[src + 3 * x : src + 3 * x + 3]
+                    value = (r << 16) | (g << 8) | b
+                elif bpp == 32:
+                    b, g, r = data[src + 4 * x : src + 4 * x + 3]
+                    value = (r << 16) | (g << 8) | b
+                elif bpp == 8:
+                    value = data[src + x]
+                else:
+                    byte = data[src + x // per_byte]
+                    shift = 8 - bpp * (x % per_byte + 1)
+                    value = (byte >> shift) & ((1 << bpp) - 1)
+                pixels[dst + x] = value
+        return pixels
+
+    def __getitem__(self, key):
+        x, y = key
+        return self._data[y * self.width + x]
+
+    def _row(self, y):
+        return self._data[y * self.width : (y + 1) * self.width]
+
+
+class TileGrid:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        bitmap,
+        *,
+        pixel_shader,
+        width=1,
+        height=1,
+        tile_width=None,
+        tile_height=None,
+        default_tile=0,
+        x=0,
+        y=0,
+    ):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._tiles = [default_tile] * (width * height)
+
+    def _tile_index(self, key):
+        if isinstance(key, tuple):
+            return key[1] * self.width + key[0]
+        return key
+
+    def __getitem__(self, key):
+        return self._tiles[self._tile_index(key)]
+
+    def __setitem__(self, key, tile):
+        tiles = (self.bitmap.width // self.tile_width) * (self.bitmap.height // self.tile_height)
+        if not 0 <= tile < tiles:
+            raise ValueError("Tile index out of bounds")
+        self._tiles[self._tile_index(key)] = tile
+
+    def _render(self, frame, frame_width, frame_height, ox, oy):
+        """Draw into frame. Returns the number of source pixels visited."""
+        visited = 0
+        lut = self.pixel_shader._lut()  # pylint: disable=protected-access
+        transparent = getattr(self.pixel_shader, "transparent_color", None)
+        per_row = self.bitmap.width // self.tile_width
+        for i, tile in enumerate(self._tiles):
+            src_x = (tile % per_row) * self.tile_width
+            src_y = (tile // per_row) * self.tile_height
+            dst_x = ox + self.x + (i % self.width) * self.tile_width
+            dst_y = oy + self.y + (i // self.width) * self.tile_height
+            x0 = max(0, -dst_x)
+            x1 = min(self.tile_width, frame_width - dst_x)
+            if x0 >= x1:
+                continue
+            rows = range(max(0, -dst_y), min(self.tile_height, frame_height - dst_y))
+            visited += len(rows) * (x1 - x0)
+            for row in rows:
+                values = self.bitmap._row(src_y + row)  # pylint: disable=protected-access
+                out = (dst_y + row) * frame_width + dst_x
+                for col in range(x0, x1):
+                    value = values[src_x + col]
+                    color = lut[value] if lut is not None else value
+                    if color is not None and color != transparent:
+                        frame[out + col] = color
+        return visited
+
+
+class Group(list):
+    def __init__(self, *, scale=1, x=0, y=0):
+        super().__init__()
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        return self is other
+
+    def _render(self, frame, frame_width, frame_height, ox, oy):
+        visited = 0
+        for layer in self:
+            if not layer.hidden:
+                visited += layer._render(  # pylint: disable=protected-access
+                    frame, frame_width, frame_height, ox + self.x, oy + self.y
+                )
+        return visited
@@ -0,0 +1,86 @@
+"""Simulated FramebufferDisplay that composites its root group into a frame."""
+
+import time
+
+# Set by the simulation: False keeps refresh() from compositing frames, for
+# long runs that don't look at the pixels. render() always composites.
+composite = True
+
+
+class FramebufferDisplay:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, framebuffer, *, rotation=0, auto_refresh=True):
+        self.framebuffer = framebuffer
+        self.width = framebuffer.width
+        self.height = framebuffer.height
+        self.rotation = rotation
+        self._auto_refresh = auto_refresh
+        self.root_group = None
+        self._brightness = 1.0
+        self.frame = [0] * (self.width * self.height)
+        self.frames = 0
+        self.render_seconds = 0.0
+        # Pixels cleared plus source pixels visited by the last render().
+        self.pixels_touched = 0
+        # refresh() pacing, in virtual seconds, as the real one does it.
+        self.refreshes = 0
+        self._first_manual = not auto_refresh
+        self._last_refresh = 0
+        self._last_refresh_call = 0
+
+    @property
+    def auto_refresh(self):
+        return self._auto_refresh
+
+    @auto_refresh.setter
+    def auto_refresh(self, value):
+        self._auto_refresh = value
+        self._first_manual = not value
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        self._brightness = value
+        self.framebuffer.brightness = value
+        self.framebuffer.paused = not value
+
+    def render(self):
+        """Composite the root group into self.frame. Returns the frame."""
+        start = time.perf_counter()
+        frame = self.frame
+        for i in range(len(frame)):
+            frame[i] = 0
+        touched = len(frame)
+        if self.root_group is not None and not self.root_group.hidden:
+            touched += self.root_group._render(  # pylint: disable=protected-access
+                frame, self.width, self.height, 0, 0
+            )
+        self.pixels_touched = touched
+        self.render_seconds += time.perf_counter() - start
+        self.frames += 1
+        return frame
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        # Same rules as CircuitPython, in whole milliseconds like it: with
+        # auto_refresh off and a target, wait for the next frame boundary, or
+        # skip (False) if this call came more than a frame after the last one.
+        now = int(time.monotonic() * 1000)
+        if not self.auto_refresh and not self._first_manual and target_frames_per_second:
+            frame_ms = 1000 // target_frames_per_second
+            since_refresh = now - self._last_refresh
+            if minimum_frames_per_second and since_refresh > 1000 // minimum_frames_per_second:
+                raise RuntimeError("Below minimum frame rate")
+            since_call = now - self._last_refresh_call
+            self._last_refresh_call = now
+            if since_call > frame_ms:
+                return False
+            time.sleep((frame_ms - since_refresh % frame_ms) / 1000)
+        self._first_manual = False
+        self._last_refresh = int(time.monotonic() * 1000)
+        self.refreshes += 1
+        if composite:
+            self.render()
+        return True
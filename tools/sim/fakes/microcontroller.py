@@ -0,0 +1,52 @@
+"""Simulated microcontroller module.
+
+``reset()`` raises SimReset, which the simulation catches to reboot the clock.
+``watchdog`` records feeds; the simulation checks the gaps against its timeout.
+"""
+
+
+class SimReset(BaseException):
+    """Raised by reset(). Not an Exception, so the clock's handlers let it through."""
+
+
+class _WatchDog:
+    def __init__(self):
+        self.timeout = None
+        self.mode = None
+        self.last_feed = None
+        self.longest_gap = 0
+
+    def feed(self):
+        from time import monotonic  # the simulation's virtual clock
+
+        now = monotonic()
+        if self.last_feed is not None:
+            self.longest_gap = max(self.longest_gap, now - self.last_feed)
+        self.last_feed = now
+
+    def deinit(self):
+        self.timeout = None
+        self.mode = None
+
+
+class _ResetReason:
+    POWER_ON = "POWER_ON"
+    WATCHDOG = "WATCHDOG"
+    SOFTWARE = "SOFTWARE"
+    UNKNOWN = "UNKNOWN"
+
+
+class _Processor:
+    reset_reason = _ResetReason.POWER_ON
+    temperature = 30.0
+    frequency = 120000000
+
+
+ResetReason = _ResetReason
+watchdog = _WatchDog()
+cpu = _Processor()
+nvm = bytearray(8192)
+
+
+def reset():
+    raise SimReset()
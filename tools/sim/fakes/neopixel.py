@@ -0,0 +1,15 @@
+"""Simulated neopixel strip: a list of (r, g, b) tuples."""
+
+
+class NeoPixel(list):
+    def __init__(self, pin, n, *, auto_write=True, **_kwargs):
+        super().__init__([(0, 0, 0)] * n)
+        self.pin = pin
+        self.auto_write = auto_write
+
+    def fill(self, color):
+        for i in range(len(self)):
+            self[i] = color
+
+    def show(self):
+        pass
@@ -0,0 +1,44 @@
+"""Simulated RGBMatrix: checks the geometry like the real one and keeps its settings."""
+
+
+class RGBMatrix:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        *,
+        width,
+        bit_depth,
+        rgb_pins,
+        addr_pins,
+        clock_pin,
+        latch_pin,
+        output_enable_pin,
+        height=0,
+        tile=1,
+        serpentine=True,
+        doublebuffer=True,
+        framebuffer=None,
+    ):
+        if not 1 <= bit_depth <= 6:
+            raise ValueError("Bit depth must be in range 1 to 6")
+        if len(rgb_pins) % 6:
+            raise ValueError("Must use a multiple of 6 rgb pins")
+        rows_per_panel = 2 << len(addr_pins)
+        computed_height = rows_per_panel * tile
+        if height and height != computed_height:
+            raise ValueError(f"{len(addr_pins)} address pins and {tile} tiles give height "
+                             f"{computed_height}, not {height}")
+        self.width = width
+        self.height = computed_height
+        self.tile = tile
+        self.serpentine = serpentine
+        self.bit_depth = bit_depth
+        self.paused = False
+        self.brightness = 1.0
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def deinit(self):
+        pass
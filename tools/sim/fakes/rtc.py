@@ -0,0 +1,29 @@
+"""Simulated RTC, backed by the simulation's virtual clock."""
+
+import time
+
+# Set by the simulation to its VirtualClock.
+clock = None
+
+
+class RTC:
+    _calibration = 0
+
+    @property
+    def calibration(self):
+        return self._calibration
+
+    @calibration.setter
+    def calibration(self, value):
+        # The SAMD51's range. The virtual clock doesn't drift, so it has no effect.
+        if not -127 <= value <= 127:
+            raise ValueError("calibration out of range")
+        self._calibration = value
+
+    @property
+    def datetime(self):
+        return time.localtime()
+
+    @datetime.setter
+    def datetime(self, value):
+        clock.set_rtc(time.mktime(value))
@@ -0,0 +1,9 @@
+"""Simulated storage module: the drive is the host's, writable by the clock."""
+
+
+class _Mount:
+    readonly = False
+
+
+def getmount(_path):
+    return _Mount()
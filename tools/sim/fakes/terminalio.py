@@ -0,0 +1,5 @@
+"""Simulated terminalio: a fixed 6x12 block font."""
+
+from adafruit_bitmap_font.bitmap_font import BlockFont
+
+FONT = BlockFont()
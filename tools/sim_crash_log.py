@@ -0,0 +1,133 @@
+"""Reset kitchen_clock in the simulator and check what it reports after each boot.
+
+Boots the clock in the simulator (tools/sim) with a short checkpoint interval
+for lib/crash_log.py, then resets it a few ways: its watchdog biting, the clock
+giving up on reconnecting to the broker, and a watchdog reset with the record
+in NVM damaged. After every boot it must publish what it found on
+``<prefix>/crash``: the reset reason, and the last run's record (why it was
+written, pass durations, topics handled, free heap) or none.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/sim_crash_log.py
+"""
+
+import errno
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from sim import Simulation
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+CHECKPOINT = 20
+
+
+class CrashRun:
+    def __init__(self):
+        self.failures = []
+        self.sim = Simulation(secrets={"crash_log_checkpoint": CHECKPOINT})
+        self.prefix = self.sim.secrets["topic_prefix"]
+        self.reports = []
+        self.refuse = 0
+        self.sim.broker.on_publish = self.on_publish
+        accept = self.sim.broker.accept
+
+        def refusing_accept(sock):
+            if self.refuse:
+                self.refuse -= 1
+                raise OSError(errno.ECONNREFUSED, "ECONNREFUSED")
+            accept(sock)
+
+        self.sim.broker.accept = refusing_accept
+
+    def check(self, what, ok, detail=""):
+        if not ok:
+            self.failures.append(f"{what} {detail}".rstrip())
+
+    def on_publish(self, topic, payload):
+        if topic == f"{self.prefix}/crash":
+            self.reports.append(json.loads(payload))
+
+    def cut(self):
+        # The clock's reconnect attempt is refused, so it resets itself.
+        self.refuse = 1
+        self.sim.broker.drop()
+
+    def damage(self):
+        self.sim.nvm[10] ^= 0xFF
+
+    def run(self):
+        sim = self.sim
+        sim.publish(2, "/aio/local_time", LOCAL_TIME)
+        sim.publish(5, f"{self.prefix}/img", '{"img": "parrot", "timeout": 10}')
+        sim.publish(6, f"{self.prefix}/msg", "hello")
+        sim.at(30, sim.watchdog_reset)
+        sim.at(60, self.cut)
+        sim.at(90, self.damage)
+        sim.at(91, sim.watchdog_reset)
+        sim.run(until=100)
+        return self
+
+    def report(self, index):
+        if index >= len(self.reports):
+            self.check(f"report after boot {index + 1}", False)
+            return None
+        return self.reports[index]
+
+    def check_reports(self):
+        self.check("one report per boot", len(self.reports) == self.sim.boots, str(self.reports))
+
+        report = self.report(0)
+        if report:
+            self.check("power on", report["reset_reason"] == "POWER_ON", str(report))
+            self.check("nothing in a new NVM", report["last_run"] is None, str(report))
+
+        report = self.report(1)
+        if report:
+            last_run = report["last_run"] or {}
+            self.check("watchdog reset", report["reset_reason"] == "WATCHDOG", str(report))
+            self.check("watchdog: from a checkpoint", last_run.get("reason") == "checkpoint")
+            self.check("watchdog: saved by the checkpoint", last_run.get("uptime") == CHECKPOINT)
+            topics = last_run.get("topics", [])
+            for topic in ("/aio/local_time", f"{self.prefix}/img", f"{self.prefix}/msg"):
+                self.check(f"watchdog: {topic} handled", topic in topics, str(topics))
+            passes = last_run.get("passes_ms", [])
+            self.check("watchdog: pass durations", passes and all(passes), str(passes))
+            self.check("watchdog: free heap", last_run.get("mem_free_min", 0) > 0)
+
+        report = self.report(2)
+        if report:
+            last_run = report["last_run"] or {}
+            self.check("software reset", report["reset_reason"] == "SOFTWARE", str(report))
+            self.check("reconnect: why", last_run.get("reason") == "mqtt_reconnect", str(last_run))
+            self.check("reconnect: second boot", last_run.get("boot") == 2, str(last_run))
+            # Saved right before the reset, after the cut (about 29 s into the boot)
+            # and the 3 s before trying again, not by the last checkpoint.
+            self.check("reconnect: saved at the reset", last_run.get("uptime", 0) >= 30, str(last_run))
+
+        report = self.report(3)
+        if report:
+            self.check("damaged record dropped", report["last_run"] is None, str(report))
+
+
+def main():
+    run = CrashRun().run()
+    run.check_reports()
+    for report in run.reports:
+        last_run = report["last_run"]
+        if last_run:
+            last_run = {key: last_run[key] for key in ("reason", "boot", "uptime", "topics")}
+        print(f"{report['reset_reason']}: {last_run}")
+    for failure in run.failures:
+        print(f"FAIL {failure}")
+    if run.failures:
+        sys.exit(1)
+    print("all resets reported")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Run kitchen_clock headless on chained panel layouts and check the layout.
+
+For each geometry this boots the clock in the simulator (tools/sim), sets the
+time, then checks that the time and date are centered, the seconds bar scales
+with the width, a sprite is centered and a scrolling message goes all the way
+across. It then measures the compositing of a full frame, to show the cost per
+frame grows linearly with the pixel count: the pixels the compositor touches
+(exact, and what the check is on) and the host time it takes (noisy).
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/sim_panels.py [--show]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from sim import Simulation, ascii_frame
+
+# (width, height, tile)
+GEOMETRIES = ((64, 32, 1), (128, 32, 1), (64, 64, 2), (128, 64, 2))
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+TIME_COLOR = 0xFFFFFF
+SPRITE = "parrot"
+# The compositor is ours and exact, but glyph ink can sit a pixel off the
+# advance width either side.
+CENTER_SLACK = 2
+FRAMES = 100
+BATCHES = 7
+
+
+def ink_box(frame, width, color=None, rows=None):
+    """(x0, y0, x1, y1) around the pixels lit (in ``color``, if given), or None."""
+    box = None
+    for y in rows if rows is not None else range(len(frame) // width):
+        for x in range(width):
+            pixel = frame[y * width + x]
+            if pixel and (color is None or pixel == color):
+                if box is None:
+                    box = [x, y, x + 1, y + 1]
+                else:
+                    box = [min(box[0], x), min(box[1], y), max(box[2], x + 1), max(box[3], y + 1)]
+    return box
+
+
+def frame_cost(display):
+    """(best of a few batches in microseconds, pixels touched) per full frame."""
+    best = None
+    for _ in range(BATCHES):
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            display.render()
+        cost = (time.perf_counter() - start) / FRAMES * 1000000
+        best = cost if best is None else min(best, cost)
+    return best, display.pixels_touched
+
+
+class PanelRun:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, width, height, tile, show=False):
+        self.width = width
+        self.height = height
+        self.show = show
+        self.failures = []
+        self.costs = {}
+        self.sim = Simulation(
+            secrets={"matrix_width": width, "matrix_height": height, "matrix_tile": tile}
+        )
+
+    @property
+    def name(self):
+        return f"{self.width}x{self.height}"
+
+    def check(self, what, ok, detail=""):
+        if not ok:
+            self.failures.append(f"{self.name}: {what} {detail}".rstrip())
+
+    def run(self):
+        sim = self.sim
+        sim.publish(2, "/aio/local_time", LOCAL_TIME)
+        sim.at(5.05, self.check_clock_face)
+        sim.publish(10, f"{sim.secrets['topic_prefix']}/img", SPRITE)
+        sim.at(12.05, self.check_sprite)
+        sim.publish(14, f"{sim.secrets['topic_prefix']}/img", "")
+        scroll = '{"msg": "Dinner is ready, come and get it", "no_scroll": false}'
+        sim.publish(20, f"{sim.secrets['topic_prefix']}/msg", scroll)
+        sim.at(20.05, self.check_scroll_start)
+        sim.run(until=150)
+        self.check("message scrolled across", sim.module.msg_scrolled)
+        return self
+
+    def _frame(self, label):
+        frame = self.sim.display.render()
+        if self.show:
+            print(f"--- {self.name} {label}")
+            print(ascii_frame(self.sim.display, frame))
+        return frame
+
+    def check_clock_face(self):
+        mod = self.sim.module
+        frame = self._frame("clock")
+        width, height = self.width, self.height
+        self.check("display size", (mod.matrixportal.display.width, height) == (width, height))
+
+        time_box = ink_box(frame, width, TIME_COLOR)
+        self.check("time drawn", time_box is not None)
+        if time_box:
+            left, right = time_box[0], width - time_box[2]
+            self.check("time centered", abs(left - right) <= CENTER_SLACK, f"{left} vs {right}")
+            self.check("time in top half", time_box[1] < height // 2, str(time_box))
+
+        date_color = mod.WEEK_DAY_COLORS[mod.global_rtc.datetime.tm_wday]
+        date_box = ink_box(frame, width, date_color)
+        self.check("date drawn", date_box is not None)
+        if date_box:
+            left, right = date_box[0], width - date_box[2]
+            self.check("date centered", abs(left - right) <= CENTER_SLACK, f"{left} vs {right}")
+        if time_box and date_box:
+            self.check("date below time", date_box[1] >= time_box[3], f"{date_box} {time_box}")
+
+        # The bar moves on the next one second tick, so it can be a second behind.
+        second = mod.global_rtc.datetime.tm_sec
+        scale = max(1, width // 64)
+        bar = ink_box(frame, width, mod.SECS_COLOR, rows=(1,))
+        expected = [
+            [s * scale, 1, min(width, (s + mod.SECS_WIDTH) * scale), 2]
+            for s in (second, (second - 1) % 60)
+        ]
+        self.check("seconds bar", bar in expected, f"{bar} not in {expected}")
+
+        self.costs["clock"] = frame_cost(self.sim.display)
+
+    def check_sprite(self):
+        mod = self.sim.module
+        frame = self._frame("sprite")
+        sprite = mod.matrixportal.splash[mod.img_index]
+        frame_height = sprite.tile_height
+        x0 = (self.width - sprite.bitmap.width) // 2
+        y0 = (self.height - frame_height) // 2
+        self.check("sprite position", (sprite.x, sprite.y) == (x0, y0), f"{sprite.x},{sprite.y}")
+        box = ink_box(frame, self.width)
+        inside = box is not None and (
+            box[0] >= x0
+            and box[1] >= y0
+            and box[2] <= x0 + sprite.bitmap.width
+            and box[3] <= y0 + frame_height
+        )
+        self.check("only the sprite is drawn", inside, str(box))
+        self.costs["sprite"] = frame_cost(self.sim.display)
+
+    def check_scroll_start(self):
+        mod = self.sim.module
+        label = mod.matrixportal._text[mod.MSG_TXT_IDX]  # pylint: disable=protected-access
+        self.check("scroll starts off the right edge", label.x >= self.width - 1, str(label.x))
+
+
+def linear_fit(points):
+    """Least squares cost = per_pixel * pixels + fixed. Returns (per_pixel, fixed,
+    worst relative deviation from the line)."""
+    count = len(points)
+    mean_x = sum(x for x, _ in points) / count
+    mean_y = sum(y for _, y in points) / count
+    per_pixel = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum(
+        (x - mean_x) ** 2 for x, _ in points
+    )
+    fixed = mean_y - per_pixel * mean_x
+    worst = max(abs(y - (per_pixel * x + fixed)) / y for x, y in points)
+    return per_pixel, fixed, worst
+
+
+def main():
+    show = "--show" in sys.argv
+    runs = [PanelRun(*geometry, show=show).run() for geometry in GEOMETRIES]
+    failures = [failure for run in runs for failure in run.failures]
+
+    print(f"{'panel':>8} {'pixels':>7} {'scene':>7} {'touched':>8} {'us/frame':>9} {'ns/pixel':>9}")
+    for run in runs:
+        pixels = run.width * run.height
+        for scene, (cost, touched) in run.costs.items():
+            print(
+                f"{run.name:>8} {pixels:>7} {scene:>7} {touched:>8} {cost:>9.0f} "
+                f"{cost * 1000 / pixels:>9.1f}"
+            )
+
+    for scene in ("clock", "sprite"):
+        measured = [run for run in runs if scene in run.costs]
+        if len(measured) != len(runs):
+            failures.append(f"{scene}: not measured on every panel")
+            continue
+        pixels = [run.width * run.height for run in measured]
+        per_pixel, fixed, worst = linear_fit(
+            [(x, run.costs[scene][1]) for x, run in zip(pixels, measured)]
+        )
+        print(
+            f"{scene}: touched = {per_pixel:.2f} x pixels + {fixed:.0f} "
+            f"(worst deviation {worst:.1%})"
+        )
+        if worst > 0.05:
+            failures.append(f"{scene}: pixels touched per frame are not linear in pixels")
+        per_pixel, fixed, worst = linear_fit(
+            [(x, run.costs[scene][0]) for x, run in zip(pixels, measured)]
+        )
+        print(
+            f"{scene}: host time = {per_pixel * 1000:.1f} ns x pixels + {fixed:.0f} us "
+            f"(worst deviation {worst:.0%})"
+        )
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("all layouts ok")
+
+
+if __name__ == "__main__":
+    main()
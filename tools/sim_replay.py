@@ -0,0 +1,311 @@
+"""Replay captured MQTT traffic against kitchen_clock in the simulator and profile it.
+
+Plays a log written by tools/mqtt_capture.py through the simulator's broker
+(tools/sim) with the timing it was captured with, and reports for every message:
+
+* latency: virtual ms from the broker sending it to the clock's handler
+  getting it (time spent waiting for the main loop to read the socket),
+* to screen: virtual ms from sending it to the next display refresh,
+* handler: host CPU us in MiniMQTT's callback (the clock's handler),
+* render: host CPU us compositing that next refresh, and the pixels it
+  touched.
+
+Virtual time only moves while the clock waits, so the clock's own work shows
+in the host CPU columns: a burst that stutters on the board is one whose
+handler and render costs add up to more than a frame (100 ms at 10 fps on the
+board, which is much slower than the host). Everything but the host CPU
+columns comes out the same on every run: the simulator is seeded and the
+replay is driven by virtual time, at any speed.
+
+``--speed max`` (the default) runs as fast as the host can; ``--speed 1`` paces
+virtual time to the wall clock (``--speed 2`` twice as fast), e.g. to watch
+the clock's output with ``--verbose``. Without a log file it replays a made-up
+home automation burst.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/sim_replay.py [capture.mqtt] [--speed max|N] [--each] [--worst N]
+"""
+
+import argparse
+import collections
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from mqtt_capture import CaptureWriter, read_capture
+from sim import Simulation
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+# Virtual second the first message goes out at: the clock is up and connected.
+START = 10
+# Virtual seconds to keep going after the last message.
+TAIL = 5
+PACE_EVERY = 0.02
+
+
+def demo_traffic(prefix):
+    """A home automation scene every 15 s for a minute: a run of neopixel colors,
+    brightness, the outside temperature and a message, with an image in the
+    middle of it once."""
+    file = io.BytesIO()
+    writer = CaptureWriter(file)
+    for scene in range(4):
+        when = scene * 15.0
+        for i in range(10):
+            writer.write(when + i * 0.01, f"{prefix}/neopixel", str(0x100000 * i + scene))
+        writer.write(when + 0.1, f"{prefix}/brightness", "0.5")
+        writer.write(when + 0.1, "/sensor/temperature_outside", str(60 + scene))
+        writer.write(when + 0.2, f"{prefix}/msg", f"Scene {scene}", qos=1)
+        if scene == 1:
+            writer.write(when + 0.3, f"{prefix}/img", '{"img": "parrot", "timeout": 5}', qos=1)
+    file.seek(0)
+    return list(read_capture(file))
+
+
+class Replay:
+    # pylint: disable=too-many-instance-attributes
+    """Sends ``messages`` (as `read_capture` gives them) to the clock from virtual
+    second `START` on, and times what the clock does with each.
+
+    :param float speed: Virtual seconds per wall clock second, or None for as
+                        fast as possible.
+    """
+
+    def __init__(self, messages, *, speed=None, quiet=True):
+        self.messages = messages
+        self.speed = speed
+        self.sim = Simulation(quiet=quiet)
+        self.prefix = self.sim.secrets["topic_prefix"]
+        self.results = []
+        # topic -> results sent to the clock, not handled yet, in order
+        self._pending = collections.defaultdict(collections.deque)
+        # Handled, waiting for the refresh that shows them
+        self._unshown = []
+        self._client = None
+        self._display_class = None
+        self.renders = 0
+        self.render_seconds = 0
+        self._wall_start = None
+        self.begin = {}
+        self.end = {}
+        self.wall_seconds = 0
+
+    def run(self):
+        sim = self.sim
+        sim.publish(2, "/aio/local_time", LOCAL_TIME)
+        for when, topic, payload, qos, retain in self.messages:
+            result = {"when": when, "topic": topic, "size": len(payload)}
+            self.results.append(result)
+            sim.at(
+                START + when,
+                lambda result=result, payload=payload, qos=qos, retain=retain: self._send(
+                    result, payload, qos, retain
+                ),
+            )
+        if self.speed:
+            sim.every(PACE_EVERY, self._pace)
+        sim.at(START - 0.5, lambda: self._snapshot(self.begin))
+        until = START + (self.messages[-1][0] if self.messages else 0) + TAIL
+        sim.at(until - 0.001, lambda: self._snapshot(self.end))
+        wall_start = time.perf_counter()
+        sim.run(until=until)
+        self.wall_seconds = time.perf_counter() - wall_start
+        return self
+
+    def _pace(self):
+        now = time.perf_counter()
+        if self._wall_start is None:
+            self._wall_start = now - self.sim.now / self.speed
+        ahead = self._wall_start + self.sim.now / self.speed - now
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def _snapshot(self, into):
+        self._hook()
+        module = self.sim.module
+        into.update(
+            frames=module.presenter.frames,
+            dropped=module.presenter.dropped,
+            passes=module.mqtt_poller.passes,
+            renders=self.renders,
+            render_seconds=self.render_seconds,
+        )
+
+    def _send(self, result, payload, qos, retain):
+        self._hook()
+        result["sent"] = self.sim.now
+        if self.sim.broker.publish(result["topic"], payload, qos=qos, retain=retain):
+            self._pending[result["topic"]].append((result, payload))
+
+    def _hook(self):
+        """Time the clock's message handling and rendering (again, after a reset)."""
+        client = self.sim.module.client
+        if client is self._client:
+            return
+        self._client = client
+        self._pending.clear()
+        self._unshown = []
+        handle_on_message = client._handle_on_message
+        stream_payload = client._stream_payload
+
+        def timed_handle_on_message(topic, message):
+            payload = message.encode("utf-8") if isinstance(message, str) else bytes(message)
+            self._handled(topic, payload, handle_on_message, topic, message)
+
+        def timed_stream_payload(topic, *args):
+            self._handled(topic, None, stream_payload, topic, *args)
+
+        client._handle_on_message = timed_handle_on_message
+        client._stream_payload = timed_stream_payload
+
+        # On the class: switching display profiles makes a new display.
+        display_class = type(self.sim.display)
+        if display_class is self._display_class:
+            return
+        self._display_class = display_class
+        render = display_class.render
+
+        def timed_render(display):
+            start = time.perf_counter()
+            frame = render(display)
+            self._rendered(time.perf_counter() - start, display.pixels_touched)
+            return frame
+
+        display_class.render = timed_render
+
+    def _handled(self, topic, payload, fun, *args):
+        # Messages the clock dropped (too big, a redelivery) come out of the queue
+        # unhandled; a streamed payload can't be compared, it is the next one.
+        pending = self._pending.get(topic)
+        result = None
+        while pending:
+            result, sent = pending.popleft()
+            if payload is None or sent == payload:
+                break
+            result = None
+        start = time.perf_counter()
+        try:
+            return fun(*args)
+        finally:
+            if result is not None:
+                result["handler_us"] = (time.perf_counter() - start) * 1000000
+                result["handled"] = self.sim.now
+                self._unshown.append(result)
+
+    def _rendered(self, seconds, pixels):
+        self.renders += 1
+        self.render_seconds += seconds
+        for result in self._unshown:
+            result["shown"] = self.sim.now
+            result["render_us"] = seconds * 1000000
+            result["pixels"] = pixels
+        self._unshown = []
+
+
+def _ms(result, key):
+    return (result[key] - result["sent"]) * 1000
+
+
+def _mean_max(values):
+    if not values:
+        return "-"
+    return f"{sum(values) / len(values):.0f}/{max(values):.0f}"
+
+
+def _row(name, results):
+    handled = [result for result in results if "handled" in result]
+    shown = [result for result in handled if "shown" in result]
+    pixels = [result["pixels"] for result in shown]
+    return (
+        f"{name:<32} {len(results):>5} {len(handled):>7}"
+        f" {_mean_max([_ms(result, 'handled') for result in handled]):>11}"
+        f" {_mean_max([_ms(result, 'shown') for result in shown]):>11}"
+        f" {_mean_max([result['handler_us'] for result in handled]):>11}"
+        f" {_mean_max([result['render_us'] for result in shown]):>11}"
+        f" {sum(pixels) // len(pixels) if pixels else '-':>7}"
+    )
+
+
+def _message_line(result):
+    if "handled" not in result:
+        return f"{result['when']:>9.3f} {result['topic']:<32} {result['size']:>6} not handled"
+    line = (
+        f"{result['when']:>9.3f} {result['topic']:<32} {result['size']:>6}"
+        f" latency {_ms(result, 'handled'):>5.0f} ms handler {result['handler_us']:>6.0f} us"
+    )
+    if "shown" in result:
+        line += (
+            f" to screen {_ms(result, 'shown'):>5.0f} ms render {result['render_us']:>6.0f} us"
+            f" {result['pixels']} px"
+        )
+    return line
+
+
+def report(replay, each=False, worst=5):
+    results = replay.results
+    begin, end = replay.begin, replay.end
+    speed = f"{replay.speed:g}x" if replay.speed else "max speed"
+    print(
+        f"{len(results)} messages over {results[-1]['when'] if results else 0:.1f} s,"
+        f" replayed at {speed} in {replay.wall_seconds:.1f} s"
+    )
+    if each:
+        for result in results:
+            print(_message_line(result))
+    print(
+        f"{'topic':<32} {'msgs':>5} {'handled':>7} {'latency ms':>11} {'screen ms':>11}"
+        f" {'handler us':>11} {'render us':>11} {'pixels':>7}"
+    )
+    by_topic = collections.defaultdict(list)
+    for result in results:
+        by_topic[result["topic"]].append(result)
+    for topic in sorted(by_topic):
+        print(_row(topic, by_topic[topic]))
+    print(_row("all", results))
+    print("(latency and screen: virtual, mean/max; handler and render: host CPU, mean/max)")
+    if begin and end:
+        renders = end["renders"] - begin["renders"]
+        render_us = (end["render_seconds"] - begin["render_seconds"]) * 1000000
+        print(
+            f"main loop passes {end['passes'] - begin['passes']},"
+            f" renders {renders} ({render_us / max(1, renders):.0f} us each),"
+            f" paced frames {end['frames'] - begin['frames']},"
+            f" dropped {end['dropped'] - begin['dropped']}"
+        )
+    costly = sorted(
+        (result for result in results if "handled" in result),
+        key=lambda result: result["handler_us"] + result.get("render_us", 0),
+        reverse=True,
+    )[:worst]
+    if costly:
+        print(f"most costly {len(costly)}:")
+        for result in costly:
+            print(_message_line(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("file", nargs="?", help="log from tools/mqtt_capture.py (default: a demo)")
+    parser.add_argument("--speed", default="max", help="max, or virtual seconds per second")
+    parser.add_argument("--each", action="store_true", help="a line for every message")
+    parser.add_argument("--worst", type=int, default=5, help="list the N most costly messages")
+    parser.add_argument("--verbose", action="store_true", help="show the clock's output")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    if args.file:
+        with open(args.file, "rb") as file:
+            messages = list(read_capture(file))
+    else:
+        messages = demo_traffic(Simulation().secrets["topic_prefix"])
+    replay = Replay(messages, speed=speed, quiet=not args.verbose).run()
+    report(replay, each=args.each, worst=args.worst)
+
+
+if __name__ == "__main__":
+    main()
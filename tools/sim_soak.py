@@ -0,0 +1,364 @@
+"""Soak test: a day of kitchen_clock under load in the simulator, failing on drift.
+
+Runs the clock headless (tools/sim) for ``--ticks`` of its one-second ticks
+(86400 by default, a day) under a steady load that repeats every hour:
+a ``/msg`` every 20 s (plain, JSON, long scrolling ones, priorities, a clear
+now and then), an ``/img`` every 45 s for 8 s, a burst of neopixel colors
+every 5 minutes, a ``/ping`` every 5 minutes, the time every hour and the
+connection dropped once an hour. Every virtual hour it samples:
+
+* heap: bytes the clock holds after a full collection, from tracemalloc
+  (the simulator's own bookkeeping left out),
+* churn: bytes allocated per virtual second, counted as how far the heap
+  rose during each main loop pass (what the board's GC has to clean up),
+* pass: host CPU us per main loop pass, mean and worst,
+* ping: virtual ms from a ``/ping`` to its status reply,
+* tick: virtual ms from one one-second tick to the next, mean,
+* dropped animation frames, collections and reconnects.
+
+The first ``--warmup`` hours (caches filling up, the first images loaded)
+are left out; over the rest, the last third of the hours is compared with
+the first third. It fails if the heap grew by more than ``--heap-drift``
+bytes or went up every hour (listing the lines that allocated what was kept),
+if the time per pass, the ping latency or the churn went up by more than
+``--latency-drift`` (a ratio), or if the ticks came further apart.
+
+The clock and its load run only on virtual time, so everything but the pass
+times comes out the same on every run: a difference in the heap, churn, ping
+or tick columns between two commits is the code's, not noise. A day takes
+about ten minutes.
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/sim_soak.py [--ticks N] [--heap-drift BYTES] [--latency-drift RATIO]
+"""
+
+import argparse
+import fnmatch
+import gc as host_gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from sim import Simulation, SimulationDone
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+HOUR = 3600
+MSG_EVERY = 20
+IMG_EVERY = 45
+IMG_TIMEOUT = 8
+BURST_EVERY = 300
+BURST = 10
+PING_EVERY = 300
+# Growth every hour that fails even under --heap-drift, in bytes in all.
+HEAP_CREEP = 1024
+# How much further apart the one-second ticks may come (they are virtual time,
+# the same on every run).
+TICK_DRIFT = 1.01
+MESSAGES = (
+    "Door open",
+    '{"msg": "Dinner is ready, come downstairs please", "priority": 3}',
+    '{"msg": "Washer done", "timeout": 5, "text_color": "0x00ff00"}',
+    "The quick brown fox jumps over the lazy dog, twice: the quick brown fox",
+    '{"msg": "Garage", "no_scroll": true, "x": 2}',
+    "",
+)
+# What the harness allocates itself, left out of the clock's heap.
+HARNESS = ("*/tools/sim_soak.py", "*/tools/sim/core.py", "*/tools/sim/broker.py", "<frozen*")
+# Lines shown when the heap drifts.
+TOP_LINES = 10
+
+
+class Hour:
+    """What one virtual hour looked like."""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self):
+        self.passes = 0
+        self.pass_seconds = 0.0
+        self.pass_max = 0.0
+        self.churn = 0
+        self.ticks = 0
+        self.pings = []
+        self.latencies = []
+        self.heap = 0
+        self.dropped = 0
+        self.collections = 0
+        self.reconnects = 0
+
+
+class Soak:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, ticks, warmup):
+        self.ticks = ticks
+        self.warmup = warmup
+        # The clock prints into the simulation while it runs.
+        self.out = sys.stdout
+        # Nothing looks at the pixels: compositing every frame would be most of the run.
+        self.sim = Simulation(composite=False)
+        self.prefix = self.sim.secrets["topic_prefix"]
+        self.images = sorted(
+            name[:-4] for name in os.listdir("bmps") if name.endswith(".bmp")
+        )
+        self.done = []
+        self.hour = Hour()
+        self.first_snapshot = None
+        self.last_snapshot = None
+        self._module = None
+        self._last_pass = None
+        self._pass_heap = 0
+        self._totals = {}
+        self._msgs = 0
+        self._imgs = 0
+        self._tick_count = 0
+
+    def run(self):
+        sim = self.sim
+        sim.publish(2, "/aio/local_time", LOCAL_TIME)
+        sim.every(HOUR, lambda: sim.broker.publish("/aio/local_time", LOCAL_TIME), start=HOUR)
+        sim.every(MSG_EVERY, self.msg, start=11)
+        sim.every(IMG_EVERY, self.img, start=13)
+        sim.every(BURST_EVERY, self.burst, start=17.3)
+        sim.every(PING_EVERY, self.ping, start=29.1)
+        sim.every(HOUR, sim.broker.drop, start=HOUR / 2 + 0.7)
+        sim.every(HOUR, self.sample, start=HOUR)
+        sim.broker.on_publish = self.on_publish
+        sim.at(1, self.hook)
+        tracemalloc.start()
+        try:
+            # Stops at the last tick; ticks come a little over a second apart.
+            sim.run(until=self.ticks * 2 + HOUR)
+        finally:
+            tracemalloc.stop()
+        return self
+
+    # ---- load ---- #
+
+    def msg(self):
+        self.hook()
+        self.sim.broker.publish(f"{self.prefix}/msg", MESSAGES[self._msgs % len(MESSAGES)])
+        self._msgs += 1
+
+    def img(self):
+        name = self.images[self._imgs % len(self.images)]
+        self.sim.broker.publish(
+            f"{self.prefix}/img", f'{{"img": "{name}", "timeout": {IMG_TIMEOUT}}}'
+        )
+        self._imgs += 1
+
+    def burst(self):
+        for i in range(BURST):
+            self.sim.broker.publish(f"{self.prefix}/neopixel", str(0x010203 * i))
+
+    def ping(self):
+        self.hour.pings.append(self.sim.now)
+        self.sim.broker.publish(f"{self.prefix}/ping", "")
+
+    def on_publish(self, topic, _payload):
+        hour = self.hour
+        if topic == f"{self.prefix}/status" and len(hour.latencies) < len(hour.pings):
+            hour.latencies.append(self.sim.now - hour.pings[len(hour.latencies)])
+
+    # ---- measuring ---- #
+
+    def hook(self):
+        """Time the clock's main loop passes and count its one-second ticks (again,
+        after a reset)."""
+        module = self.sim.module
+        if module is self._module:
+            return
+        self._module = module
+        self._last_pass = None
+        crash_log = module.crash_log
+        pass_done = crash_log.pass_done
+        intervals = module.TS_INTERVALS
+        tick = intervals["1sec"]
+
+        def timed_pass_done():
+            now = time.perf_counter()
+            heap, peak = tracemalloc.get_traced_memory()
+            hour = self.hour
+            if self._last_pass is not None:
+                seconds = now - self._last_pass
+                hour.passes += 1
+                hour.pass_seconds += seconds
+                hour.pass_max = max(hour.pass_max, seconds)
+                hour.churn += peak - self._pass_heap
+            tracemalloc.reset_peak()
+            self._pass_heap = heap
+            pass_done()
+            self._last_pass = time.perf_counter()
+
+        def counted_tick():
+            self.hour.ticks += 1
+            self._tick_count += 1
+            tick.fun()
+            if self._tick_count >= self.ticks:
+                raise SimulationDone()
+
+        crash_log.pass_done = timed_pass_done
+        intervals["1sec"] = tick._replace(fun=counted_tick)
+
+    def _totals_now(self):
+        module = self.sim.module
+        return {
+            "dropped": module.presenter.dropped,
+            "collections": self.sim.heap.collections,
+            "connects": self.sim.broker.connects,
+        }
+
+    def sample(self):
+        """End of an hour: take the heap after a full collection, and start the next."""
+        self.hook()
+        hour = self.hour
+        # The broker's log of what the clock published would look like a leak.
+        self.sim.broker.published.clear()
+        host_gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        hour.heap = sum(
+            stat.size
+            for stat in snapshot.statistics("filename")
+            if not _harness(stat.traceback[0].filename)
+        )
+        totals = self._totals_now()
+        if self._totals:
+            hour.dropped = totals["dropped"] - self._totals["dropped"]
+            hour.collections = totals["collections"] - self._totals["collections"]
+            hour.reconnects = totals["connects"] - self._totals["connects"]
+        self._totals = totals
+        if len(self.done) == self.warmup:
+            self.first_snapshot = snapshot
+        self.last_snapshot = snapshot
+        self.done.append(hour)
+        print_hour(len(self.done), hour, self.out)
+        self.hour = Hour()
+        self._last_pass = None
+        tracemalloc.reset_peak()
+        self._pass_heap = tracemalloc.get_traced_memory()[0]
+
+
+def _harness(filename):
+    return filename == tracemalloc.__file__ or any(
+        fnmatch.fnmatch(filename, pattern) for pattern in HARNESS
+    )
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def print_header():
+    print(
+        f"{'hour':>4} {'passes':>7} {'pass us':>9} {'worst us':>9} {'churn B/s':>10}"
+        f" {'heap KiB':>9} {'ping ms':>8} {'tick ms':>8} {'dropped':>8} {'gcs':>5} {'reconn':>6}"
+    )
+
+
+def _tick_ms(hours):
+    return len(hours) * HOUR * 1000 / max(1, sum(hour.ticks for hour in hours))
+
+
+def print_hour(number, hour, out):
+    print(
+        f"{number:>4} {hour.passes:>7} {hour.pass_seconds / max(1, hour.passes) * 1e6:>9.0f}"
+        f" {hour.pass_max * 1e6:>9.0f} {hour.churn / HOUR:>10.0f} {hour.heap / 1024:>9.1f}"
+        f" {_mean(hour.latencies) * 1000:>8.0f} {_tick_ms([hour]):>8.1f} {hour.dropped:>8}"
+        f" {hour.collections:>5} {hour.reconnects:>6}",
+        file=out,
+        flush=True,
+    )
+
+
+def check(soak, heap_drift, latency_drift):
+    """The drift checks over the hours after the warmup. Returns the failures."""
+    failures = []
+    steady = soak.done[soak.warmup :]
+    if len(steady) < 3:
+        return [f"only {len(steady)} hours after the warmup, need 3"]
+    third = max(1, len(steady) // 3)
+    first, last = steady[:third], steady[-third:]
+
+    heap_first = _mean([hour.heap for hour in first])
+    heap_last = _mean([hour.heap for hour in last])
+    growth = heap_last - heap_first
+    print(f"heap: {heap_first / 1024:.1f} KiB -> {heap_last / 1024:.1f} KiB ({growth:+.0f} B)")
+    heaps = [hour.heap for hour in steady]
+    if growth > heap_drift:
+        failures.append(f"heap grew by {growth:.0f} B, more than {heap_drift} B")
+    elif (
+        len(heaps) >= 4
+        and all(b > a for a, b in zip(heaps, heaps[1:]))
+        and heaps[-1] - heaps[0] > HEAP_CREEP
+    ):
+        failures.append(f"heap went up every hour, by {heaps[-1] - heaps[0]} B in all")
+
+    def per_pass(hours):
+        return sum(hour.pass_seconds for hour in hours) / max(1, sum(hour.passes for hour in hours))
+
+    ratio = per_pass(last) / max(per_pass(first), 1e-9)
+    print(f"pass: {per_pass(first) * 1e6:.0f} us -> {per_pass(last) * 1e6:.0f} us (x{ratio:.2f})")
+    if ratio > latency_drift:
+        failures.append(f"time per pass went up x{ratio:.2f}, more than x{latency_drift}")
+
+    ping_first = _mean([latency for hour in first for latency in hour.latencies])
+    ping_last = _mean([latency for hour in last for latency in hour.latencies])
+    print(f"ping: {ping_first * 1000:.0f} ms -> {ping_last * 1000:.0f} ms")
+    # A frame's worth of slack: one ping landing on the other side of a frame
+    if ping_last > ping_first * latency_drift + 0.125:
+        failures.append(
+            f"ping latency went from {ping_first * 1000:.0f} ms to {ping_last * 1000:.0f} ms"
+        )
+
+    churn_first = _mean([hour.churn for hour in first]) / HOUR
+    churn_last = _mean([hour.churn for hour in last]) / HOUR
+    print(f"churn: {churn_first:.0f} B/s -> {churn_last:.0f} B/s")
+    if churn_last > churn_first * latency_drift:
+        failures.append(f"churn went from {churn_first:.0f} B/s to {churn_last:.0f} B/s")
+
+    tick_first, tick_last = _tick_ms(first), _tick_ms(last)
+    print(f"tick: {tick_first:.1f} ms -> {tick_last:.1f} ms")
+    if tick_last > tick_first * TICK_DRIFT:
+        failures.append(f"ticks went from {tick_first:.1f} ms to {tick_last:.1f} ms apart")
+
+    if failures and growth > 0 and soak.first_snapshot is not None:
+        print("kept since the warmup, by line:")
+        stats = soak.last_snapshot.compare_to(soak.first_snapshot, "lineno")
+        stats = [
+            stat
+            for stat in stats
+            if stat.size_diff > 0 and not _harness(stat.traceback[0].filename)
+        ]
+        for stat in stats[:TOP_LINES]:
+            print(f"  {stat}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--ticks", type=int, default=86400, help="one-second ticks to run")
+    parser.add_argument("--warmup", type=int, default=2, help="hours left out of the checks")
+    parser.add_argument("--heap-drift", type=int, default=16384, help="bytes the heap may grow")
+    parser.add_argument(
+        "--latency-drift", type=float, default=1.5, help="ratio pass time and ping may grow by"
+    )
+    args = parser.parse_args()
+
+    print(f"{args.ticks} one-second ticks, hours sampled after {args.warmup} of warmup")
+    print_header()
+    started = time.perf_counter()
+    soak = Soak(args.ticks, args.warmup).run()
+    print(f"{len(soak.done)} hours in {time.perf_counter() - started:.0f} s")
+    failures = check(soak, args.heap_drift, args.latency_drift)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("soak ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Upload images to kitchen_clock over MQTT in the simulator and check they arrive.
+
+Boots the clock in the simulator (tools/sim) with its image directory in a temp
+directory, then drives lib/asset_upload.py with the sender from
+tools/send_asset.py through the fake broker: an RLE animation uploaded while
+another one plays, with one chunk corrupted on the way, the connection dropped
+and the board reset partway through; an image replaced while it is showing; and
+uploads that have to fail (a bad name, a wrong CRC, a file that isn't a BMP).
+
+Run from the repo root (this is a host tool; it is not copied to the board):
+
+    python3 tools/sim_upload.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from send_asset import AssetSender
+from bmp_rle import read_bmp, write_rle
+from sim import Simulation
+
+LOCAL_TIME = "2021-05-18 23:23:36.339 138 2 -0500 EST"
+# Seconds without a status message after which the sender starts over, which
+# resumes the upload.
+SENDER_RETRY = 5
+
+
+class UploadRun:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, directory):
+        self.directory = directory
+        self.failures = []
+        self.sim = Simulation(secrets={"asset_dir": directory})
+        self.prefix = self.sim.secrets["topic_prefix"]
+        self.senders = {}
+        self.heard = {}
+        self.corrupt = set()
+        self.report = []
+        self.sim.broker.on_publish = self.on_publish
+
+    def check(self, what, ok, detail=""):
+        if not ok:
+            self.failures.append(f"{what} {detail}".rstrip())
+
+    def sender(self, name, data, chunk_size=1024, crc=None):
+        def publish(subtopic, payload):
+            if subtopic == "data" and sender.chunks in self.corrupt:
+                self.corrupt.discard(sender.chunks)
+                payload = payload[:-1] + bytes((payload[-1] ^ 0xFF,))
+            self.sim.broker.publish(f"{self.prefix}/asset/{subtopic}", payload)
+
+        sender = AssetSender(name, data, publish, chunk_size)
+        if crc is not None:
+            sender.crc = crc
+        self.senders[name] = sender
+        return sender
+
+    def start(self, sender):
+        self.heard[sender.name] = self.sim.now
+        sender.begin()
+
+    def on_publish(self, topic, payload):
+        if topic == f"{self.prefix}/asset/status":
+            for name in self.heard:
+                sender = self.senders[name]
+                if not sender.finished:
+                    self.heard[sender.name] = self.sim.now
+                    sender.on_status(payload)
+
+    def retry(self):
+        for name, heard in list(self.heard.items()):
+            sender = self.senders[name]
+            if not sender.finished and self.sim.now - heard > SENDER_RETRY:
+                self.start(sender)
+
+    def run(self, rle_data, parrot_data):
+        sim = self.sim
+        sim.publish(2, "/aio/local_time", LOCAL_TIME)
+        sim.every(1, self.retry, start=3)
+
+        # A new animation, while another one plays.
+        sim.publish(4, f"{self.prefix}/img", '{"img": "parrot", "timeout": 60}')
+        upload = self.sender("fireworks_rle", rle_data)
+        self.corrupt.add(3)
+        sim.at(5, lambda: self.start(upload))
+        sim.at(7.9, self.check_bad_chunk)
+        sim.at(8, self.sim.broker.drop)
+        sim.at(20, lambda: sim.module.microcontroller.reset())
+        sim.publish(23, f"{self.prefix}/img", '{"img": "parrot", "timeout": 60}')
+        sim.at(32, self.check_frames)
+        sim.at(120, lambda: self.check_upload(upload))
+        sim.publish(121, f"{self.prefix}/img", "fireworks_rle")
+        sim.at(123, self.check_playing)
+
+        # Replacing the image that is showing.
+        sim.publish(130, f"{self.prefix}/img", '{"img": "cat", "timeout": 60}')
+        replace = self.sender("cat", parrot_data)
+        sim.at(131, lambda: self.start(replace))
+        sim.at(150, lambda: self.check_replace(replace, parrot_data))
+
+        # Uploads that fail.
+        bad_name = self.sender("../boot", parrot_data)
+        sim.at(160, lambda: self.start(bad_name))
+        bad_crc = self.sender("bad_crc", parrot_data, crc=1)
+        sim.at(161, lambda: self.start(bad_crc))
+        not_bmp = self.sender("not_bmp", b"hello " * 200)
+        sim.at(175, lambda: self.start(not_bmp))
+        sim.at(190, lambda: self.check_failed(bad_name, bad_crc, not_bmp))
+
+        sim.run(until=200)
+        return self
+
+    def check_bad_chunk(self):
+        bad_chunks = self.sim.module.asset_receiver.bad_chunks
+        self.check("corrupted chunk caught", bad_chunks == 1, str(bad_chunks))
+
+    def check_frames(self):
+        mod = self.sim.module
+        uploading = mod.asset_receiver.name is not None
+        self.check("still uploading while the animation plays", uploading)
+        stats = mod.presenter.stats()
+        self.check("animation frames on time", stats["frames"] and not stats["dropped"], str(stats))
+        self.report.append(f"display while uploading: {stats}")
+
+    def check_upload(self, upload):
+        mod = self.sim.module
+        stats = mod.asset_receiver.stats()
+        self.check("upload done", upload.state == "done", f"{upload.state} {upload.error}")
+        self.check("rebooted during the upload", self.sim.boots == 2, str(self.sim.boots))
+        self.check("resumed after the reboot", stats["resumed"] >= 1, str(stats))
+        self.check("upload not started from scratch", upload.chunks < 2 * len(upload.data) // 1024)
+        path = os.path.join(self.directory, "fireworks_rle.bmp")
+        with open(path, "rb") as file:
+            self.check("file arrived intact", file.read() == upload.data)
+        leftovers = [name for name in os.listdir(self.directory) if name.startswith(".")]
+        self.check("temp files removed", not leftovers, str(leftovers))
+        self.check("indexed", mod.assets.lookup("fireworks_rle") is not None)
+        self.report.append(
+            f"fireworks_rle: {len(upload.data)} bytes in {upload.chunks} chunks, "
+            f"boots {self.sim.boots}, receiver after the reboot {stats}"
+        )
+
+    def check_playing(self):
+        mod = self.sim.module
+        path = os.path.join(self.directory, "fireworks_rle.bmp")
+        self.check("uploaded image showing", mod.img_state.get("path") == path)
+        self.check("played from a stream", mod.img_state.get("img_stream") is not None)
+
+    def check_replace(self, replace, data):
+        mod = self.sim.module
+        self.check("replace done", replace.state == "done", f"{replace.state} {replace.error}")
+        with open(os.path.join(self.directory, "cat.bmp"), "rb") as file:
+            self.check("replaced file", file.read() == data)
+        self.check("replaced image taken down", not mod.img_state, str(mod.img_state))
+        installed = "'asset_installed': 2" in str(mod.counters)
+        self.check("installed counted", installed, str(mod.counters))
+
+    def check_failed(self, bad_name, bad_crc, not_bmp):
+        for sender, error in (
+            (bad_name, "bad name"),
+            (bad_crc, "file CRC mismatch"),
+            (not_bmp, "not a BMP"),
+        ):
+            ok = sender.state == "failed" and (sender.error or "").startswith(error)
+            self.check(f"{sender.name} refused", ok, f"{sender.state} {sender.error}")
+            self.report.append(f"{sender.name}: {sender.state}: {sender.error}")
+        names = sorted(os.listdir(self.directory))
+        self.check("nothing left behind", not any(name.startswith(".") for name in names))
+        self.check("failed uploads not installed", "bad_crc.bmp" not in names, str(names))
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="sim_upload_")
+    try:
+        for name in os.listdir("bmps"):
+            shutil.copy(os.path.join("bmps", name), directory)
+        rle_path = os.path.join(directory, "rle.tmp")
+        write_rle(rle_path, *read_bmp("bmps/fireworks.bmp"))
+        with open(rle_path, "rb") as file:
+            rle_data = file.read()
+        os.remove(rle_path)
+        with open("bmps/parrot.bmp", "rb") as file:
+            parrot_data = file.read()
+        run = UploadRun(directory).run(rle_data, parrot_data)
+    finally:
+        shutil.rmtree(directory)
+
+    for line in run.report:
+        print(line)
+    for failure in run.failures:
+        print(f"FAIL {failure}")
+    if run.failures:
+        sys.exit(1)
+    print("all uploads ok")
+
+
+if __name__ == "__main__":
+    main()